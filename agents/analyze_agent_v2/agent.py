@@ -2,25 +2,49 @@
 Analyze Agent v2 — Analysis agent designed for search_agent_v2 output.
 
 Consumes the state keys set by ExhaustiveSearchAgent:
-  - mobius_logs     (JSON string: list of _source dicts)
-  - sse_mse_logs    (JSON string: list of _source dicts)
-  - wxcas_logs      (JSON string: list of _source dicts)
+  - all_logs        (JSON string: {category: list of _source dicts}, or artifact
+                      reference)
+  - sdk_logs        (uploaded SDK/client log text)
   - search_summary  (JSON string: {total_mobius_logs, total_sse_mse_logs,
                       total_wxcas_logs, max_depth_reached, total_ids_searched,
                       search_history})
 
-Routes to calling_agent or contact_center_agent based on serviceIndicator.
+Before analysis, `build_log_digest` (digest.py) condenses all_logs and sdk_logs
+into `log_digest`, a time-ordered, per-leg event timeline. The analysis agents
+read the digest and fetch raw entries on demand via `get_raw_log_entries`.
+
+Routes deterministically (no LLM call) to calling_agent or contact_center_agent
+based on the serviceIndicator values found in the logs. When the digest holds
+several substantial call legs, the matching map-reduce variant runs instead:
+per-leg analyses in parallel (map_reduce.py), then a reducer LlmAgent that
+stitches them into `analyze_results`.
+Instructions are built with `state_instruction`, so artifact references are
+loaded only when a prompt is rendered.
 """
 
+import json
+import logging
 import os
+from collections import Counter
 from pathlib import Path
+from typing import AsyncGenerator
+from typing_extensions import override
 
 from dotenv import load_dotenv
-from google.adk.agents import LlmAgent
-from google.adk.skills import load_skill_from_dir
-
+from google.adk.agents import BaseAgent, LlmAgent
+from google.adk.agents.invocation_context import InvocationContext
+from google.adk.events import Event
+from google.genai import types as genai_types
+
+from analyze_agent_v2.digest import build_log_digest, digest_text, load_all_logs, raw_log_tool, sdk_lines
+from analyze_agent_v2.map_reduce import LegMapReduceAgent, wants_map_reduce
+from analyze_agent_v2.reference_index import attach_mobius_error_refs, mobius_error_tool
+from analyze_agent_v2.section_index import reference_sections_tool
+from analyze_agent_v2.signatures import detect_known_issues
+from analyze_agent_v2.timeline_stats import attach_timeline_stats
+from artifact_store import artifact_store, state_instruction
 from oauth_context import SessionLiteLlm
-from google.adk.tools import skill_toolset
+from service_indicators import SERVICE_INDICATOR_PATTERN, find_service_indicators
 
 # ═══════════════════════════════════════════════════════════════════════════════
 # Setup
@@ -29,6 +53,8 @@ from google.adk.tools import skill_toolset
 env_path = Path(__file__).parent.parent / ".env"
 load_dotenv(dotenv_path=env_path)
 
+logger = logging.getLogger(__name__)
+
 
 def _make_model() -> SessionLiteLlm:
     return SessionLiteLlm(
@@ -58,9 +84,27 @@ retries, or related interactions that a single-ID search would have missed.
 Use the search_summary to understand the scope: how many IDs were searched,
 what depth the BFS reached, and what indexes were queried.
 
-**IMPORTANT: You must analyze EVERY log entry. Do NOT skip or summarize groups of logs.
-Read each log line, extract its meaning, and incorporate it into the analysis.
-If there are hundreds of logs, produce a correspondingly detailed analysis.**
+**IMPORTANT: You must analyze EVERY digest event. Do NOT skip or summarize groups of events.
+Read each event, extract its meaning, and incorporate it into the analysis.
+If there are hundreds of events, produce a correspondingly detailed analysis.**
+
+**Log digest (your primary input):**
+{log_digest}
+
+{known_issues}
+Known issues listed above (if any) were matched deterministically against a
+library of known root-cause signatures: confirm or refute each one against the
+digest, and keep the confirmed ones in the Root Cause Analysis.
+
+The digest was built deterministically from ALL collected logs (Mobius, SSE/MSE,
+WxCAS and uploaded SDK/client logs). Each line is
+`<timestamp> [service] event <ref>`; `!!` marks errors and `(xN)` marks N
+repeated lines collapsed into one. Events are grouped per call leg, after the
+error markers and HTTP request/response pairs.
+
+When you need a full message (SIP headers/SDP, HTTP payloads, stack traces,
+error bodies), call `get_raw_log_entries` with the refs from the digest, e.g.
+["mobius#12", "sse_mse#3"]. Fetch only what you need.
 """
 
 _ANALYSIS_POINTS = """
@@ -94,7 +138,12 @@ Your analysis MUST cover ALL of the following in full detail:
     - TURN/STUN server interactions
 
 4. **Timing Analysis**
-    - Calculate time deltas between key events (e.g., INVITE to 200 OK = call setup time)
+    - Timing metrics computed from the log timestamps (JSON: per-leg duration and gaps,
+      per SIP transaction first-response/final times and retransmissions, per INVITE
+      call setup time and post-dial delay, HTTP latency distribution and slowest exchanges):
+      {timeline_stats}
+    - Use these numbers as-is instead of recomputing them from digest timestamps; only
+      compute deltas the metrics do not cover
     - Identify any unusual delays (>2s between expected sequential events)
     - Note the total call duration if BYE is present
     - Flag any timeouts
@@ -161,6 +210,7 @@ List ALL unique identifiers found across all log sources:
 - **IDs searched**: (from search_summary.total_ids_searched)
 - **Indexes queried**: (list unique indexes from search_summary.search_history)
 - **Total logs analyzed**: Mobius: X, SSE/MSE: Y, WxCAS: Z
+- **Search truncated**: (only when search_summary.truncated is set: state that the logs are partial, its reason, and how many IDs were left unsearched)
 
 ---
 ### 🔗 Cross-Service Correlation
@@ -217,24 +267,28 @@ Include SDP summary when available (codec, media type, ICE candidates count).
 """
 
 
-# ═══════════════════════════════════════════════════════════════════════════════
-# Mobius Error ID Skill (for calling_agent)
-# ═══════════════════════════════════════════════════════════════════════════════
+_MOBIUS_ERROR_GUIDE = """
+**Mobius error reference (entries matching errors found in the logs):**
+{mobius_error_refs}
 
-mobius_error_skill = load_skill_from_dir(
-    Path(__file__).parent / "skills" / "mobius_error_id_skill"
-)
-mobius_skill_toolset = skill_toolset.SkillToolset(skills=[mobius_error_skill])
-
-architecture_endpoints_skill = load_skill_from_dir(
-    Path(__file__).parent / "skills" / "architecture_endpoints_skill"
-)
-architecture_skill_toolset = skill_toolset.SkillToolset(skills=[architecture_endpoints_skill])
+For Mobius error IDs and HTTP statuses not covered above, call
+`lookup_mobius_errors` with all of them in ONE batch, e.g.
+["mobius-error 112", "503 registration", "429"]. For each error, state what it
+means, the likely cause and the suggested fix from the reference entry. If an
+ID has no entry, say so and describe it from the log context.
+"""
 
-sip_flow_skill = load_skill_from_dir(
-    Path(__file__).parent / "skills" / "sip_flow_skill"
-)
-sip_flow_skill_toolset = skill_toolset.SkillToolset(skills=[sip_flow_skill])
+_REFERENCE_GUIDE = """
+**Reference sections (SIP flows, architecture and endpoints):**
+Call `lookup_reference_sections` with no arguments ONCE at the start: it returns
+the reference sections for the SIP response codes, SIP methods and endpoints
+observed in these logs (expected message sequences, response code meanings,
+SDP negotiation, SIP timers, failure patterns, service roles, signaling/media
+paths). Call it again with specific `sip_codes`, `sip_methods`, `endpoints` or
+`topics` (e.g. ["transfer"], ["timers"], ["{flow}"]) only for what is still missing.
+"""
+_CALLING_REFERENCE_GUIDE = _REFERENCE_GUIDE.replace("{flow}", "webrtc calling")
+_CONTACT_CENTER_REFERENCE_GUIDE = _REFERENCE_GUIDE.replace("{flow}", "contact center")
 
 
 # ═══════════════════════════════════════════════════════════════════════════════
@@ -245,19 +299,20 @@ calling_agent = LlmAgent(
     model=_make_model(),
     name="calling_agent",
     output_key="analyze_results",
-    tools=[mobius_skill_toolset, architecture_skill_toolset, sip_flow_skill_toolset],
-    instruction=f"""You are a senior VoIP/WebRTC debugging expert with deep expertise in HTTP, WebRTC, SIP, SDP, RTP, SRTP, DTLS, ICE, TCP, UDP, TLS, and related protocols. You produce EXHAUSTIVE, production-grade debug analyses that leave no log entry unexamined.
+    tools=[mobius_error_tool, reference_sections_tool, raw_log_tool],
+    instruction=state_instruction(f"""You are a senior VoIP/WebRTC debugging expert with deep expertise in HTTP, WebRTC, SIP, SDP, RTP, SRTP, DTLS, ICE, TCP, UDP, TLS, and related protocols. You produce EXHAUSTIVE, production-grade debug analyses that leave no log entry unexamined.
 
 {_SEARCH_CONTEXT_PREAMBLE}
 
-Use the **architecture_endpoints_skill** for service roles, signaling/media paths, and WebRTC Calling architecture (see references/architecture_and_endpoints.md — endpoints and WebRTC Calling sections).
-Use the **sip_flow_skill** for SIP message sequences, response code meanings, SDP negotiation details, SIP timers, and common failure patterns (see references/sip_flows.md).
+{_MOBIUS_ERROR_GUIDE}
 
-**Log Sources — Analyze ALL of them thoroughly:**
-1. **Mobius logs** from {{{{mobius_logs}}}} (logstash-wxm-app indexes) — HTTP/WebSocket signaling, SIP translation, device registration
-2. **SSE/MSE logs** from {{{{sse_mse_logs}}}} (logstash-wxcalling indexes) — SIP edge signaling, media relay
-3. **WxCAS logs** from {{{{wxcas_logs}}}} (logstash-wxcalling indexes) — Call routing, destination resolution, application server logic
-4. **SDK/Client logs** from {{{{sdk_logs}}}} (uploaded by user) — Client-side SDK perspective (browser/app WebRTC logs)
+{_CALLING_REFERENCE_GUIDE}
+
+**Log Sources (services in the digest) — Analyze ALL of them thoroughly:**
+1. **[Mobius]** (logstash-wxm-app indexes) — HTTP/WebSocket signaling, SIP translation, device registration
+2. **[SSE/MSE]** (logstash-wxcalling indexes) — SIP edge signaling, media relay
+3. **[WxCAS]** (logstash-wxcalling indexes) — Call routing, destination resolution, application server logic
+4. **[SDK]** (uploaded by user) — Client-side SDK perspective (browser/app WebRTC logs)
 
 When SDK/Client logs are present, these provide the browser/app perspective. Correlate with server-side logs when both are available.
 
@@ -278,7 +333,7 @@ then show how they connect.
 {_ANALYSIS_POINTS}
 
 {_OUTPUT_STRUCTURE}
-""",
+""", digester=digest_text),
 )
 
 
@@ -290,19 +345,18 @@ contact_center_agent = LlmAgent(
     model=_make_model(),
     name="contact_center_agent",
     output_key="analyze_results",
-    tools=[architecture_skill_toolset, sip_flow_skill_toolset],
-    instruction=f"""You are a senior VoIP/Contact Center debugging expert with deep expertise in HTTP, WebRTC, SIP, SDP, RTP, SRTP, DTLS, ICE, TCP, UDP, TLS, and related protocols. You produce EXHAUSTIVE, production-grade debug analyses that leave no log entry unexamined.
+    tools=[reference_sections_tool, raw_log_tool],
+    instruction=state_instruction(f"""You are a senior VoIP/Contact Center debugging expert with deep expertise in HTTP, WebRTC, SIP, SDP, RTP, SRTP, DTLS, ICE, TCP, UDP, TLS, and related protocols. You produce EXHAUSTIVE, production-grade debug analyses that leave no log entry unexamined.
 
 {_SEARCH_CONTEXT_PREAMBLE}
 
-Use the **architecture_endpoints_skill** for service roles and Contact Center architecture (see references/architecture_and_endpoints.md — endpoints and Contact Center sections).
-Use the **sip_flow_skill** for SIP message sequences, response code meanings, SDP negotiation details, SIP timers, and common failure patterns (see references/sip_flows.md).
+{_CONTACT_CENTER_REFERENCE_GUIDE}
 
-**Log Sources — Analyze ALL of them thoroughly:**
-1. **Mobius logs** from {{{{mobius_logs}}}} (logstash-wxm-app indexes) — HTTP/WebSocket signaling, SIP translation
-2. **SSE/MSE logs** from {{{{sse_mse_logs}}}} (logstash-wxcalling indexes) — SIP edge signaling, media relay
-3. **WxCAS logs** from {{{{wxcas_logs}}}} (logstash-wxcalling indexes) — Call routing logic
-4. **SDK/Client logs** from {{{{sdk_logs}}}} (uploaded by user) — Client-side SDK perspective
+**Log Sources (services in the digest) — Analyze ALL of them thoroughly:**
+1. **[Mobius]** (logstash-wxm-app indexes) — HTTP/WebSocket signaling, SIP translation
+2. **[SSE/MSE]** (logstash-wxcalling indexes) — SIP edge signaling, media relay
+3. **[WxCAS]** (logstash-wxcalling indexes) — Call routing logic
+4. **[SDK]** (uploaded by user) — Client-side SDK perspective
 
 When SDK/Client logs are present, these provide the browser/app perspective. Correlate with server-side logs when both are available.
 
@@ -317,7 +371,77 @@ forwarded sessions, or related interactions. Identify and correlate ALL of them.
 {_ANALYSIS_POINTS}
 
 {_OUTPUT_STRUCTURE}
-""",
+""", digester=digest_text),
+)
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# Map-reduce variants: per-leg analyses stitched by a reducer
+# ═══════════════════════════════════════════════════════════════════════════════
+
+_REDUCE_PREAMBLE = """
+**Search Context (from exhaustive BFS search):**
+Search summary: {search_summary}
+
+The collected logs span MULTIPLE call legs (forwards, transfers, retries or
+related interactions). Each leg was already analyzed on its own from the
+deterministic log digest. Your job is the REDUCE step: stitch the per-leg
+analyses below into ONE analysis of the whole investigation.
+
+**Per-leg analyses (your primary input):**
+{leg_analyses}
+
+{known_issues}
+
+- Work out how the legs relate (which leg forwarded/transferred/retried into which),
+  using shared IDs and timestamps, and present the end-to-end story in order
+- Carry EVERY error from every leg into the Root Cause Analysis; keep the refs
+- Merge identifiers, timing and outcome across legs rather than repeating each leg
+- When a leg analysis is ambiguous or you need a full message, call
+  `get_raw_log_entries` with the refs quoted in the leg analyses
+"""
+
+
+def _make_reducer(name: str, role: str, tools: list, guide: str = "") -> LlmAgent:
+    return LlmAgent(
+        model=_make_model(),
+        name=name,
+        output_key="analyze_results",
+        tools=tools,
+        instruction=state_instruction(f"""{role}
+
+{_REDUCE_PREAMBLE}
+{guide}
+
+{_ANALYSIS_POINTS}
+
+{_OUTPUT_STRUCTURE}
+""", digester=digest_text),
+    )
+
+
+calling_map_reduce_agent = LegMapReduceAgent(
+    name="calling_map_reduce_agent",
+    description="Per-leg parallel analysis of WebRTC Calling logs, reduced into one analysis.",
+    map_model=_make_model(),
+    sub_agents=[_make_reducer(
+        "calling_reduce_agent",
+        "You are a senior VoIP/WebRTC debugging expert with deep expertise in HTTP, WebRTC, SIP, SDP, RTP, SRTP, DTLS, ICE, TCP, UDP, TLS, and related protocols. You produce EXHAUSTIVE, production-grade debug analyses.",
+        [mobius_error_tool, reference_sections_tool, raw_log_tool],
+        guide=_MOBIUS_ERROR_GUIDE + _CALLING_REFERENCE_GUIDE,
+    )],
+)
+
+contact_center_map_reduce_agent = LegMapReduceAgent(
+    name="contact_center_map_reduce_agent",
+    description="Per-leg parallel analysis of Contact Center logs, reduced into one analysis.",
+    map_model=_make_model(),
+    sub_agents=[_make_reducer(
+        "contact_center_reduce_agent",
+        "You are a senior VoIP/Contact Center debugging expert with deep expertise in HTTP, WebRTC, SIP, SDP, RTP, SRTP, DTLS, ICE, TCP, UDP, TLS, and related protocols. You produce EXHAUSTIVE, production-grade debug analyses.",
+        [reference_sections_tool, raw_log_tool],
+        guide=_CONTACT_CENTER_REFERENCE_GUIDE,
+    )],
 )
 
 
@@ -329,31 +453,115 @@ forwarded sessions, or related interactions. Identify and correlate ALL of them.
 def _ensure_state_defaults(callback_context) -> None:
     """Guarantee optional state keys exist so {var} references don't KeyError."""
     callback_context.state.setdefault("sdk_logs", "")
-
-
-analyze_agent = LlmAgent(
+    callback_context.state.setdefault("log_digest", "")
+    callback_context.state.setdefault("leg_analyses", "")
+    callback_context.state.setdefault("mobius_error_refs", "")
+    callback_context.state.setdefault("known_issues", "")
+    callback_context.state.setdefault("timeline_stats", "")
+
+
+# serviceIndicator value → analysis sub-agent name
+SERVICE_INDICATOR_ROUTES = {
+    "calling": "calling_agent",
+    "guestcalling": "calling_agent",
+    "contactcenter": "contact_center_agent",
+}
+DEFAULT_ROUTE = "calling_agent"
+
+# Single-prompt sub-agent → its per-leg map-reduce variant
+MAP_REDUCE_ROUTES = {
+    "calling_agent": "calling_map_reduce_agent",
+    "contact_center_agent": "contact_center_map_reduce_agent",
+}
+
+
+def detect_service_indicators(state) -> Counter:
+    """
+    Count serviceIndicator values for this investigation: from the hit store
+    tally in search_summary when present, otherwise by scanning all_logs and
+    the uploaded SDK logs (upload-only analyses have no search summary).
+    """
+    try:
+        summary = json.loads(artifact_store.resolve(state.get("search_summary") or "") or "{}")
+    except ValueError:
+        summary = {}
+    counts: Counter = Counter()
+    if isinstance(summary, dict):
+        counts.update(summary.get("service_indicators") or {})
+    if counts:
+        return counts
+    for sources in load_all_logs(state).values():
+        for source in sources:
+            if isinstance(source, dict):
+                counts.update(find_service_indicators(source))
+    for line in sdk_lines(state):
+        if "serviceIndicator" in line:
+            counts.update(m.group(1) for m in SERVICE_INDICATOR_PATTERN.finditer(line))
+    return counts
+
+
+def route_for(counts: Counter) -> str:
+    """Sub-agent for the most frequent recognized serviceIndicator; calling by default."""
+    votes: Counter = Counter()
+    for value, count in counts.items():
+        route = SERVICE_INDICATOR_ROUTES.get(str(value).lower())
+        if route:
+            votes[route] += count
+    return votes.most_common(1)[0][0] if votes else DEFAULT_ROUTE
+
+
+class AnalyzeRouterAgent(BaseAgent):
+    """
+    Deterministic coordinator: reads serviceIndicator from the collected logs
+    and runs calling_agent or contact_center_agent directly — no LLM call.
+    Multi-leg investigations go to the map-reduce variant of that agent.
+    Known issues matched by signature are emitted first as a verdict event.
+    """
+
+    model_config = {"arbitrary_types_allowed": True}
+
+    @override
+    async def _run_async_impl(
+        self, ctx: InvocationContext
+    ) -> AsyncGenerator[Event, None]:
+        # Known-issue signatures matched before any LLM call: show them right away
+        known_issues = ctx.session.state.get("known_issues")
+        if known_issues:
+            yield Event(
+                author=self.name,
+                invocation_id=ctx.invocation_id,
+                content=genai_types.Content(
+                    parts=[genai_types.Part(text=known_issues)],
+                    role="model",
+                ),
+            )
+
+        counts = detect_service_indicators(ctx.session.state)
+        target_name = route_for(counts)
+        if wants_map_reduce(ctx.session.state):
+            target_name = MAP_REDUCE_ROUTES[target_name]
+        logger.info(
+            f"[{self.name}] serviceIndicator counts={dict(counts)} -> {target_name}"
+        )
+        target = next(a for a in self.sub_agents if a.name == target_name)
+        async for event in target.run_async(ctx):
+            yield event
+
+
+analyze_agent = AnalyzeRouterAgent(
     name="analyze_agent_v2",
-    output_key="analyze_results",
-    model=_make_model(),
-    before_agent_callback=_ensure_state_defaults,
-    instruction="""
-Context: You are analyzing logs from a WebRTC Calling or contact center flow,
-which involves talking to different endpoints using protocols like HTTP, SIP,
-WebRTC, SDP, RTP, TLS.
-
-You have access to the full search results from an exhaustive BFS search:
-- Search summary: {search_summary}
-- Mobius logs: {mobius_logs}
-- SSE/MSE logs: {sse_mse_logs}
-- WxCAS logs: {wxcas_logs}
-- SDK/Client logs: {sdk_logs}
-
-Use `serviceIndicator` from logs to classify the session:
-- `calling`, `guestCalling` → WebRTC Calling Flow, transfer to `calling_agent`
-- `contactCenter` → Contact Center Flow, transfer to `contact_center_agent`
-
-If no `serviceIndicator` is found, default to `calling_agent`.
-""",
+    before_agent_callback=[
+        _ensure_state_defaults,
+        build_log_digest,
+        attach_mobius_error_refs,
+        detect_known_issues,
+        attach_timeline_stats,
+    ],
     description="Routes analysis to Calling or ContactCenter agent based on serviceIndicator in logs.",
-    sub_agents=[calling_agent, contact_center_agent],
+    sub_agents=[
+        calling_agent,
+        contact_center_agent,
+        calling_map_reduce_agent,
+        contact_center_map_reduce_agent,
+    ],
 )
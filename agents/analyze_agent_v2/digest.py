@@ -0,0 +1,537 @@
+"""
+Deterministic pre-analysis digest of the collected logs.
+
+Runs in Python between search and analysis (analyze_agent's
+before_agent_callback) and condenses `all_logs` + `sdk_logs` into a compact,
+time-ordered event timeline for the analysis prompts. Entries arrive through
+the merged, deduplicated timeline (timeline.py), so nothing is re-sorted:
+- SIP requests/responses with Call-ID, CSeq and an SDP summary (sip_parser.py)
+- HTTP requests/responses, paired by tracking ID and path
+- error markers (log level, error keywords, 4xx-6xx codes)
+- events grouped per call leg: connected components of the SIP Call-ID,
+  call and correlation IDs each entry carries (legs.py)
+- repetitive plain log lines collapsed into one line with a count; over
+  DIGEST_MAX_EVENTS, repeated SIP/HTTP events are collapsed too and each leg
+  is sampled down to a fair share of the cap (errors, then SIP, then HTTP)
+
+Every digest line carries a `ref` like `mobius#12` (index into the
+stored category list) or `sdk#40` (SDK log line number); the
+`get_raw_log_entries` tool returns the raw entries for those refs.
+"""
+
+import json
+import logging
+import re
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Mapping, Optional
+
+from google.adk.tools import FunctionTool, ToolContext
+
+from analyze_agent_v2.legs import assign_legs
+from artifact_store import artifact_store
+from sip_parser import SipMessage, parse_sip
+from timeline import merge_timeline
+
+logger = logging.getLogger(__name__)
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# Tuning
+# ═══════════════════════════════════════════════════════════════════════════════
+
+# Upper bound on digest events (per-leg sections; error markers and HTTP pairs
+# are drawn from the kept events)
+DIGEST_MAX_EVENTS = 1500
+# Order in which a leg's events survive sampling: errors, SIP, HTTP, plain lines
+_SAMPLE_PRIORITY = {"sip": 1, "http": 2, "log": 3}
+# Characters of message text kept for error / plain-log lines
+DIGEST_EXCERPT_CHARS = 200
+# Raw entries returned per get_raw_log_entries call
+RAW_LOOKUP_MAX_REFS = 50
+
+SERVICE_LABELS = {
+    "mobius": "Mobius",
+    "sse_mse": "SSE/MSE",
+    "wxcas": "WxCAS",
+    "sdk": "SDK",
+}
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# Parsing
+# ═══════════════════════════════════════════════════════════════════════════════
+
+_HTTP_REQUEST = re.compile(
+    r"\b(GET|POST|PUT|PATCH|DELETE|HEAD)\s+(https?://[^\s\"',]+|/[^\s\"',]*)"
+)
+_HTTP_STATUS = re.compile(
+    r"(?:\bHTTP/\d(?:\.\d)?\s+|\bstatus(?:Code)?[\"']?\s*[:=]\s*[\"']?)([1-5]\d{2})\b",
+    re.IGNORECASE,
+)
+
+_ERROR_WORDS = re.compile(
+    r"\b(error|exception|failed|failure|timeout|timed out|refused|unreachable|rejected)\b",
+    re.IGNORECASE,
+)
+_ERROR_LEVELS = frozenset({"ERROR", "FATAL", "CRITICAL", "SEVERE", "WARN", "WARNING"})
+
+# Volatile tokens stripped to detect repetitive lines
+_TEMPLATE_NOISE = re.compile(r"[0-9a-fA-F]{8,}|\d+")
+
+# Correlation ID fields that join entries into legs: (path in _source, label).
+# A sipCallId field and a SIP Call-ID header share the "sip" label so the
+# Mobius and SSE views of one dialog land in the same leg. Session IDs only
+# place entries with no other ID (see legs.py).
+_LEG_FIELDS = (
+    (("fields", "sipCallId"), "sip"),
+    (("callId",), "call"),
+    (("fields", "mobiusCallId"), "mobius"),
+    (("fields", "correlationId"), "correlation"),
+    (("correlationId",), "correlation"),
+    (("fields", "localSessionId"), "session"),
+    (("fields", "remoteSessionId"), "session"),
+    (("sessionId",), "session"),
+)
+
+
+def _field(source: Mapping[str, Any], path: tuple[str, ...]) -> Optional[str]:
+    value: Any = source
+    for part in path:
+        if not isinstance(value, Mapping):
+            return None
+        value = value.get(part)
+    if isinstance(value, list):
+        value = value[0] if value else None
+    return str(value) if value else None
+
+
+def _level(source: Mapping[str, Any]) -> str:
+    level = source.get("level") or _field(source, ("fields", "level")) or ""
+    return str(level).upper()
+
+
+@dataclass
+class DigestEvent:
+    ts: str
+    service: str
+    kind: str  # sip | http | error | log
+    text: str
+    ref: str
+    leg: str = "unassigned"
+    is_error: bool = False
+    repeats: int = 1
+    tracking_id: Optional[str] = None
+    http_path: Optional[str] = None
+    http_status: Optional[int] = None
+    ids: tuple[str, ...] = ()  # "<label>:<value>" correlation IDs
+    sip: Optional[SipMessage] = None  # parsed SIP message (kind == "sip")
+
+    def render(self) -> str:
+        repeat = f" (x{self.repeats})" if self.repeats > 1 else ""
+        flag = "!! " if self.is_error else ""
+        return f"{self.ts} [{self.service}] {flag}{self.text}{repeat} <{self.ref}>"
+
+
+def parse_entry(
+    message: str,
+    ts: str,
+    service: str,
+    ref: str,
+    source: Mapping[str, Any] | None = None,
+) -> DigestEvent:
+    """Classify one log entry into a digest event."""
+    source = source or {}
+    level = _level(source)
+    tracking_id = _field(source, ("fields", "WEBEX_TRACKINGID"))
+
+    ids: list[str] = []
+    text = None
+    kind = "log"
+    is_error = level in _ERROR_LEVELS
+
+    sip = parse_sip(message)
+    if sip is not None:
+        kind = "sip"
+        if sip.call_id:
+            ids.append(f"sip:{sip.call_id}")
+        if sip.status is not None:
+            is_error = is_error or sip.status >= 400
+        text = sip.summary()
+
+    http_path = None
+    http_code = None
+    if text is None:
+        http_request = _HTTP_REQUEST.search(message)
+        http_status = _HTTP_STATUS.search(message)
+        if http_request or http_status:
+            kind = "http"
+            parts = []
+            if http_request:
+                http_path = http_request.group(2)[:160]
+                parts.append(f"HTTP {http_request.group(1)} {http_path}")
+            if http_status:
+                http_code = int(http_status.group(1))
+                parts.append(f"-> {http_code}")
+                is_error = is_error or http_code >= 400
+            text = " ".join(parts)
+
+    if text is None:
+        is_error = is_error or bool(_ERROR_WORDS.search(message))
+        kind = "error" if is_error else "log"
+        text = " ".join(message.split())[:DIGEST_EXCERPT_CHARS]
+        if level:
+            text = f"{level}: {text}"
+
+    for path, label in _LEG_FIELDS:
+        value = _field(source, path)
+        if value and f"{label}:{value}" not in ids:
+            ids.append(f"{label}:{value}")
+
+    return DigestEvent(
+        ts=ts,
+        service=service,
+        kind=kind,
+        text=text,
+        ref=ref,
+        # Entries with no call/session ID fall back to their tracking ID
+        leg=f"tracking:{tracking_id}" if tracking_id else "unassigned",
+        is_error=is_error,
+        tracking_id=tracking_id,
+        http_path=http_path,
+        http_status=http_code,
+        ids=tuple(ids),
+        sip=sip,
+    )
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# Sources
+# ═══════════════════════════════════════════════════════════════════════════════
+
+
+class _LruCache:
+    """
+    Small lock-protected LRU shared by concurrent sessions. Keys are state
+    values (usually content-addressed references), so sessions with
+    different logs never see each other's entries.
+    """
+
+    def __init__(self, max_entries: int):
+        self._max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[Any, Any] = OrderedDict()
+
+    def get(self, key: Any, default: Any = None) -> Any:
+        with self._lock:
+            if key not in self._entries:
+                return default
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def put(self, key: Any, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+
+
+# Decoded all_logs and built digests kept per distinct input (one per recent investigation)
+_CACHE_MAX_ENTRIES = 4
+
+_decoded_all_logs = _LruCache(_CACHE_MAX_ENTRIES)
+
+
+def load_all_logs(state: Mapping[str, Any]) -> dict[str, list[dict]]:
+    """Decode the canonical all_logs value ({category: [_source, ...]}). Read-only."""
+    stored = state.get("all_logs") or ""
+    if not stored:
+        return {}
+    cached = _decoded_all_logs.get(stored)
+    if cached is not None:
+        return cached
+    try:
+        parsed = json.loads(artifact_store.resolve(stored) or "{}")
+    except ValueError as e:
+        logger.warning(f"[digest] all_logs is not valid JSON: {e}")
+        return {}
+    if not isinstance(parsed, dict):
+        return {}
+    _decoded_all_logs.put(stored, parsed)
+    return parsed
+
+
+def sdk_lines(state: Mapping[str, Any]) -> list[str]:
+    sdk = artifact_store.resolve(state.get("sdk_logs") or "")
+    return sdk.splitlines() if isinstance(sdk, str) else []
+
+
+def _timeline_events(all_logs: dict[str, list[dict]], sdk: list[str]) -> list[DigestEvent]:
+    """Digest events for every entry, in merged time order (timeline.py)."""
+    return [
+        parse_entry(
+            event.message,
+            event.ts,
+            SERVICE_LABELS.get(event.source, event.source),
+            event.ref,
+            event.entry,
+        )
+        for event in merge_timeline(all_logs, sdk)
+    ]
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# Digest assembly
+# ═══════════════════════════════════════════════════════════════════════════════
+
+
+def _collapse_repeats(
+    events: list[DigestEvent], kinds: tuple[str, ...] = ("log",)
+) -> list[DigestEvent]:
+    """Fold non-error events of `kinds` that repeat the same template within a leg/service."""
+    kept: list[DigestEvent] = []
+    seen: dict[tuple, DigestEvent] = {}
+    for event in events:
+        if event.kind not in kinds or event.is_error:
+            kept.append(event)
+            continue
+        key = (event.leg, event.kind, event.service, _TEMPLATE_NOISE.sub("#", event.text)[:100])
+        first = seen.get(key)
+        if first is not None:
+            first.repeats += 1
+            continue
+        seen[key] = event
+        kept.append(event)
+    return kept
+
+
+def _spread(items: list, count: int) -> list:
+    """`count` items evenly spaced over `items`, first and last included."""
+    if count >= len(items):
+        return items
+    if count <= 1:
+        return items[len(items) // 2:][:count]
+    step = (len(items) - 1) / (count - 1)
+    return [items[round(i * step)] for i in range(count)]
+
+
+def _sample_legs(events: list[DigestEvent], budget: int) -> list[DigestEvent]:
+    """
+    Keep at most `budget` events. Legs get max-min fair shares (small legs
+    keep everything, large legs split the rest); within a leg, errors survive
+    first, then SIP, HTTP and plain lines, each tier sampled evenly over the
+    leg's timeline. Kept events stay in time order.
+    """
+    by_leg: dict[str, list[int]] = {}
+    for position, event in enumerate(events):
+        by_leg.setdefault(event.leg, []).append(position)
+
+    kept: list[int] = []
+    remaining, legs_left = budget, len(by_leg)
+    for positions in sorted(by_leg.values(), key=len):
+        quota = min(len(positions), remaining // legs_left)
+        remaining -= quota
+        legs_left -= 1
+        tiers: dict[int, list[int]] = {}
+        for position in positions:
+            event = events[position]
+            tiers.setdefault(0 if event.is_error else _SAMPLE_PRIORITY.get(event.kind, 3), []).append(position)
+        for tier in sorted(tiers):
+            if quota <= 0:
+                break
+            chosen = _spread(tiers[tier], quota)
+            kept.extend(chosen)
+            quota -= len(chosen)
+    return [events[position] for position in sorted(kept)]
+
+
+def _pair_http(events: list[DigestEvent]) -> list[str]:
+    """Pair HTTP requests with later responses sharing tracking ID (and path when known)."""
+    pending: dict[str, list[DigestEvent]] = {}
+    pairs = []
+    for event in events:
+        if event.kind != "http" or not event.tracking_id:
+            continue
+        has_status = "->" in event.text
+        if event.http_path and not has_status:
+            pending.setdefault(event.tracking_id, []).append(event)
+            continue
+        if not has_status:
+            continue
+        candidates = pending.get(event.tracking_id, [])
+        match = next(
+            (c for c in candidates if event.http_path in (None, c.http_path)), None
+        )
+        if match:
+            candidates.remove(match)
+            status = event.text.split("->", 1)[1].strip()
+            pairs.append(
+                f"{match.ts} → {event.ts} {match.text} -> {status} "
+                f"[{match.service}] <{match.ref}, {event.ref}>"
+            )
+    return pairs
+
+
+def _leg_header(leg: str, leg_events: list[DigestEvent]) -> str:
+    services = sorted({e.service for e in leg_events})
+    return (
+        f"== LEG {leg} | services: {', '.join(services)} | "
+        f"{leg_events[0].ts} .. {leg_events[-1].ts} =="
+    )
+
+
+def build_digest(all_logs: dict[str, list[dict]], sdk: list[str]) -> dict:
+    """
+    Build the digest from decoded logs. Returns {"text", "stats", "legs",
+    "ref_legs", "events"}; `text` is what the analysis prompts see, `legs`
+    maps each leg to its section text and event/error counts (input of the
+    per-leg map step), `ref_legs` maps every entry ref to its leg and
+    `events` is the full time-ordered event list (timeline_stats.py).
+    """
+    events = _timeline_events(all_logs, sdk)
+    raw_count = len(events)
+    assign_legs(events)
+    ref_legs = {e.ref: e.leg for e in events}
+    timeline = events
+    events = _collapse_repeats(events)
+
+    dropped = 0
+    if len(events) > DIGEST_MAX_EVENTS:
+        # Retransmissions, keepalives and polling fold into one line each
+        events = _collapse_repeats(events, kinds=("log", "sip", "http"))
+    if len(events) > DIGEST_MAX_EVENTS:
+        sampled = _sample_legs(events, DIGEST_MAX_EVENTS)
+        dropped = len(events) - len(sampled)
+        events = sampled
+
+    legs: "OrderedDict[str, list[DigestEvent]]" = OrderedDict()
+    for event in events:
+        legs.setdefault(event.leg, []).append(event)
+
+    counts = {kind: sum(1 for e in events if e.kind == kind) for kind in ("sip", "http", "error", "log")}
+    errors = [e for e in events if e.is_error]
+    http_pairs = _pair_http(events)
+
+    lines = [
+        f"LOG DIGEST: {raw_count} raw entries -> {len(events)} events across {len(legs)} leg(s); "
+        f"SIP={counts['sip']} HTTP={counts['http']} errors={len(errors)} "
+        f"collapsed_lines={sum(e.repeats - 1 for e in events)} dropped_events={dropped}",
+        "Format: <timestamp> [service] (!! = error) event (xN = repeated) <ref>. "
+        "Use get_raw_log_entries with refs to read raw entries.",
+    ]
+    if errors:
+        lines.append("")
+        lines.append("== ERROR MARKERS ==")
+        lines.extend(e.render() for e in errors)
+    if http_pairs:
+        lines.append("")
+        lines.append("== HTTP REQUEST/RESPONSE PAIRS ==")
+        lines.extend(http_pairs)
+    leg_sections = {}
+    for leg, leg_events in legs.items():
+        section = [_leg_header(leg, leg_events), *(e.render() for e in leg_events)]
+        leg_sections[leg] = {
+            "text": "\n".join(section),
+            "events": len(leg_events),
+            "errors": sum(1 for e in leg_events if e.is_error),
+        }
+        lines.append("")
+        lines.extend(section)
+
+    stats = {
+        "raw_entries": raw_count,
+        "events": len(events),
+        "legs": len(legs),
+        "errors": len(errors),
+        "http_pairs": len(http_pairs),
+        "dropped_events": dropped,
+        **counts,
+    }
+    return {
+        "text": "\n".join(lines),
+        "stats": stats,
+        "legs": leg_sections,
+        "ref_legs": ref_legs,
+        "events": timeline,
+    }
+
+
+def digest_text(all_logs: dict[str, list[dict]], sdk: list[str]) -> str:
+    """Digest text only: the token budget's last rung (`state_instruction(..., digester=)`)."""
+    return build_digest(all_logs, sdk)["text"]
+
+
+# Built digests, keyed by the (all_logs, sdk_logs) state values
+_digest_cache = _LruCache(_CACHE_MAX_ENTRIES)
+# Cached "no logs" digests are None
+_MISS = object()
+
+
+def digest_for_state(state: Mapping[str, Any]) -> Optional[dict]:
+    """
+    Digest of the current state's logs (None if there are none). Built once
+    per distinct input and shared by the digest callback and the router.
+    """
+    key = (state.get("all_logs") or "", state.get("sdk_logs") or "")
+    cached = _digest_cache.get(key, _MISS)
+    if cached is not _MISS:
+        return cached
+    all_logs = load_all_logs(state)
+    sdk = sdk_lines(state)
+    digest = build_digest(all_logs, sdk) if all_logs or sdk else None
+    if digest is not None:
+        logger.info(f"[digest] Built log digest: {json.dumps(digest['stats'])}")
+    _digest_cache.put(key, digest)
+    return digest
+
+
+def build_log_digest(callback_context) -> None:
+    """
+    before_agent_callback: compute `log_digest` from all_logs and sdk_logs.
+    The digest is stored through the artifact store when large.
+    """
+    digest = digest_for_state(callback_context.state)
+    callback_context.state["log_digest"] = (
+        artifact_store.offload(digest["text"]) if digest else ""
+    )
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# Raw entry lookup tool
+# ═══════════════════════════════════════════════════════════════════════════════
+
+
+def get_raw_log_entries(refs: list[str], tool_context: ToolContext) -> dict:
+    """Return raw log entries for digest refs.
+
+    Args:
+        refs: Digest refs such as "mobius#12", "sse_mse#3", "wxcas#0" or "sdk#40".
+
+    Returns:
+        {"entries": {ref: raw entry}, "missing": [refs not found]}.
+    """
+    state = tool_context.state
+    all_logs = load_all_logs(state)
+    sdk = None
+    entries: dict[str, Any] = {}
+    missing = []
+    for ref in refs[:RAW_LOOKUP_MAX_REFS]:
+        category, _, index = str(ref).partition("#")
+        if not index.isdigit():
+            missing.append(ref)
+            continue
+        position = int(index)
+        if category == "sdk":
+            if sdk is None:
+                sdk = sdk_lines(state)
+            if position < len(sdk):
+                entries[ref] = sdk[position]
+                continue
+        elif position < len(all_logs.get(category, [])):
+            entries[ref] = all_logs[category][position]
+            continue
+        missing.append(ref)
+    return {"entries": entries, "missing": missing}
+
+
+raw_log_tool = FunctionTool(get_raw_log_entries)
@@ -0,0 +1,114 @@
+"""
+Call-leg clustering for the log digest.
+
+A leg is a connected component of leg IDs: two log entries belong to the
+same leg when they share a SIP Call-ID, call ID or correlation ID, directly
+or through other entries (e.g. a Mobius line carrying both mobiusCallId and
+sipCallId joins the Mobius and SSE views of one SIP dialog).
+
+Session IDs (localSessionId/remoteSessionId, RFC 7989) are end-to-end: a
+forwarded or transferred call keeps them on its new Call-ID. They never join
+legs; an entry that carries only session IDs joins the one leg those IDs
+were seen on, or forms its own leg when they were seen on several.
+
+Tracking, user and device IDs are deliberately NOT used for joining: they
+span every leg of a session and would collapse forwards/transfers into one.
+"""
+
+from typing import Iterable, Protocol
+
+
+class _HasIds(Protocol):
+    ids: tuple[str, ...]
+    leg: str
+
+
+class UnionFind:
+    """Disjoint sets over hashable keys with path halving and union by size."""
+
+    def __init__(self):
+        self._parent: dict[str, str] = {}
+        self._size: dict[str, int] = {}
+
+    def add(self, key: str) -> None:
+        if key not in self._parent:
+            self._parent[key] = key
+            self._size[key] = 1
+
+    def find(self, key: str) -> str:
+        parent = self._parent
+        while parent[key] != key:
+            parent[key] = parent[parent[key]]
+            key = parent[key]
+        return key
+
+    def union(self, a: str, b: str) -> None:
+        root_a, root_b = self.find(a), self.find(b)
+        if root_a == root_b:
+            return
+        if self._size[root_a] < self._size[root_b]:
+            root_a, root_b = root_b, root_a
+        self._parent[root_b] = root_a
+        self._size[root_a] += self._size[root_b]
+
+
+# Label prefixes in order of preference for naming a leg
+_LABEL_PRIORITY = ("sip:", "call:", "mobius:", "correlation:", "session:")
+_SESSION = "session:"
+
+
+def _leg_keys(ids: tuple[str, ...]) -> tuple[str, ...]:
+    """The IDs that define an entry's leg: its leg IDs, else its session IDs."""
+    return tuple(key for key in ids if not key.startswith(_SESSION)) or ids
+
+
+def _label(keys: Iterable[str]) -> str:
+    return min(
+        keys,
+        key=lambda k: (
+            next((i for i, p in enumerate(_LABEL_PRIORITY) if k.startswith(p)), len(_LABEL_PRIORITY)),
+            k,
+        ),
+    )
+
+
+def assign_legs(events: Iterable[_HasIds]) -> int:
+    """
+    Set `event.leg` for every event from the connected components of their
+    `ids` (each id is "<label>:<value>"). Events without IDs keep their
+    current `leg`. Returns the number of legs found.
+    """
+    events = [event for event in events if event.ids]
+    uf = UnionFind()
+    for event in events:
+        keys = _leg_keys(event.ids)
+        for key in keys:
+            uf.add(key)
+        for key in keys[1:]:
+            uf.union(keys[0], key)
+
+    members: dict[str, set[str]] = {}
+    # Session ID → legs it was seen on next to a leg ID
+    session_legs: dict[str, set[str]] = {}
+    for event in events:
+        keys = _leg_keys(event.ids)
+        root = uf.find(keys[0])
+        members.setdefault(root, set()).update(keys)
+        if not keys[0].startswith(_SESSION):
+            for key in event.ids:
+                if key.startswith(_SESSION):
+                    session_legs.setdefault(key, set()).add(root)
+
+    # Session-only components join their single leg; shared ones stay apart
+    target = {}
+    for root, keys in members.items():
+        target[root] = root
+        if root.startswith(_SESSION):
+            legs = set().union(*(session_legs.get(key, ()) for key in keys))
+            if len(legs) == 1:
+                target[root] = legs.pop()
+
+    labels = {root: _label(keys) for root, keys in members.items() if target[root] == root}
+    for event in events:
+        event.leg = labels[target[uf.find(_leg_keys(event.ids)[0])]]
+    return len(labels)
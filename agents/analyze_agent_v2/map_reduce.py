@@ -0,0 +1,159 @@
+"""
+Per-leg map-reduce analysis for investigations spanning several call legs.
+
+Map: each substantial leg of the log digest (see legs.py) is analyzed by its
+own LLM call, all legs concurrently under a semaphore. Each call sees only
+that leg's digest section, so prompt size is bounded by the largest leg
+rather than the whole investigation. Calls go through the agent's `map_model`
+(the same SessionLiteLlm the other agents use: model selection, headers,
+OAuth token and token-budget refusal).
+
+Reduce: the leg summaries are written to `leg_analyses` and a reducer
+LlmAgent stitches them into the final `analyze_results`.
+"""
+
+import asyncio
+import json
+import logging
+from typing import AsyncGenerator
+from typing_extensions import override
+
+from google.adk.agents import BaseAgent
+from google.adk.agents.invocation_context import InvocationContext
+from google.adk.events import Event
+from google.adk.models.base_llm import BaseLlm
+from google.adk.models.llm_request import LlmRequest
+from google.genai import types as genai_types
+
+from analyze_agent_v2.digest import digest_for_state
+from artifact_store import artifact_store
+
+logger = logging.getLogger(__name__)
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# Tuning
+# ═══════════════════════════════════════════════════════════════════════════════
+
+# Legs with fewer events and no errors are pooled into one "other" group
+LEG_MIN_EVENTS = 5
+# Map-reduce is used only when at least this many substantial legs exist
+MAP_REDUCE_MIN_LEGS = 2
+# Largest legs analyzed individually; the rest join the "other" group
+MAP_MAX_LEGS = 12
+# Concurrent per-leg LLM calls
+MAP_CONCURRENCY = 6
+
+OTHER_GROUP = "other"
+
+LEG_MAP_INSTRUCTION = """You are a senior VoIP/WebRTC debugging expert. You receive the log digest section
+for ONE call leg of a larger investigation (other legs are analyzed separately).
+Each line is `<timestamp> [service] event <ref>`; `!!` marks errors and `(xN)`
+marks N repeated lines collapsed into one.
+
+Analyze EVERY event of this leg and report, concisely:
+1. **Leg identity**: call type, participants/services, all IDs seen (Call-ID, session IDs, call IDs, tracking IDs)
+2. **SIP flow**: the dialog in order with timestamps, response codes and CSeq; retransmissions or missing ACKs
+3. **HTTP flow**: requests and responses with status codes; flag non-2xx
+4. **Timing**: setup time (INVITE → 200 OK), duration, gaps > 2s
+5. **Errors**: each error with timestamp, service, code, likely root cause and the refs that show it
+6. **Outcome**: did this leg succeed, fail, or hand off (forward/transfer/retry) — and to what
+
+Quote digest refs (e.g. mobius#12) for every claim so they can be looked up later.
+Do not speculate about other legs."""
+
+
+def select_legs(legs: dict[str, dict]) -> list[tuple[str, list[str]]]:
+    """
+    Group digest legs into map units: `(name, [leg, ...])`. Substantial legs
+    (enough events, or any error) up to MAP_MAX_LEGS are units of their own,
+    largest first; everything else is pooled into OTHER_GROUP.
+    """
+    substantial = sorted(
+        (leg for leg, info in legs.items()
+         if leg != "unassigned" and (info["events"] >= LEG_MIN_EVENTS or info["errors"])),
+        key=lambda leg: (-legs[leg]["errors"], -legs[leg]["events"], leg),
+    )
+    units = [(leg, [leg]) for leg in substantial[:MAP_MAX_LEGS]]
+    chosen = set(substantial[:MAP_MAX_LEGS])
+    rest = [leg for leg in legs if leg not in chosen]
+    if rest:
+        units.append((OTHER_GROUP, rest))
+    return units
+
+
+def wants_map_reduce(state) -> bool:
+    """True when the digest has enough independent legs to analyze them separately."""
+    digest = digest_for_state(state)
+    if not digest:
+        return False
+    units = select_legs(digest["legs"])
+    return sum(1 for name, _ in units if name != OTHER_GROUP) >= MAP_REDUCE_MIN_LEGS
+
+
+async def _analyze_leg(model: BaseLlm, name: str, section: str, context: str) -> str:
+    """One map call: analyze a single leg's digest section."""
+    request = LlmRequest(
+        model=model.model,
+        contents=[genai_types.Content(
+            role="user", parts=[genai_types.Part(text=f"{context}\n\n{section}")]
+        )],
+        config=genai_types.GenerateContentConfig(
+            system_instruction=LEG_MAP_INSTRUCTION, temperature=0
+        ),
+    )
+    try:
+        texts = []
+        async for response in model.generate_content_async(request):
+            if response.error_code:
+                raise RuntimeError(f"{response.error_code}: {response.error_message}")
+            if response.content and response.content.parts:
+                texts.extend(part.text for part in response.content.parts if part.text)
+        return "".join(texts)
+    except Exception as e:
+        logger.error(f"[_analyze_leg] {name} failed: {e}")
+        return f"(analysis failed: {e}) Raw digest section follows.\n{section}"
+
+
+class LegMapReduceAgent(BaseAgent):
+    """
+    Runs the per-leg map step concurrently with `map_model`, stores
+    `leg_analyses`, then runs its single sub-agent (the reducer) to produce
+    `analyze_results`.
+    """
+
+    model_config = {"arbitrary_types_allowed": True}
+
+    map_model: BaseLlm
+
+    @override
+    async def _run_async_impl(
+        self, ctx: InvocationContext
+    ) -> AsyncGenerator[Event, None]:
+        state = ctx.session.state
+        digest = digest_for_state(state)
+        legs = digest["legs"] if digest else {}
+        units = select_legs(legs)
+        context = f"Investigation overview: {json.dumps(digest['stats']) if digest else '{}'}"
+
+        semaphore = asyncio.Semaphore(MAP_CONCURRENCY)
+
+        async def _map(name: str, members: list[str]) -> str:
+            section = "\n\n".join(legs[leg]["text"] for leg in members)
+            async with semaphore:
+                return await _analyze_leg(self.map_model, name, section, context)
+
+        logger.info(
+            f"[{self.name}] Map step: {len(units)} unit(s) over {len(legs)} leg(s), "
+            f"concurrency={MAP_CONCURRENCY}"
+        )
+        results = await asyncio.gather(*(_map(name, members) for name, members in units))
+
+        parts = []
+        for (name, members), analysis in zip(units, results):
+            title = name if name != OTHER_GROUP else f"{OTHER_GROUP} ({len(members)} minor legs)"
+            parts.append(f"### LEG {title}\n{analysis.strip()}")
+        state["leg_analyses"] = artifact_store.offload("\n\n".join(parts))
+
+        reducer = self.sub_agents[0]
+        async for event in reducer.run_async(ctx):
+            yield event
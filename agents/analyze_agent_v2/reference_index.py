@@ -0,0 +1,328 @@
+"""
+In-memory index over the Mobius error reference.
+
+`skills/mobius_error_id_skill/references/mobius_error_ids.md` is compiled
+once at import into entries keyed by mobius-error code (e.g. "101") and by
+HTTP status + context (e.g. "503 registration"). Instead of the model
+reading the whole document through a SkillToolset:
+- `lookup_mobius_errors` returns exactly the entries for a batch of IDs
+- `attach_mobius_error_refs` pre-scans the collected logs and writes the
+  matching entries to `mobius_error_refs` before analysis starts
+"""
+
+import json
+import logging
+import re
+from collections import Counter
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Iterable, Mapping, Optional
+
+from google.adk.tools import FunctionTool, ToolContext
+
+from analyze_agent_v2.digest import load_all_logs, sdk_lines
+
+logger = logging.getLogger(__name__)
+
+MOBIUS_ERROR_REFERENCE = (
+    Path(__file__).parent / "skills" / "mobius_error_id_skill" / "references" / "mobius_error_ids.md"
+)
+# IDs resolved per lookup_mobius_errors call
+LOOKUP_MAX_IDS = 40
+
+# "### 403 FORBIDDEN — mobius-error 101: Per-user device limit exceeded"
+# "### 503 SERVICE UNAVAILABLE (registration)"
+_ENTRY_HEADING = re.compile(
+    r"^###\s+(?P<status>\d{3})\s+(?P<reason>[A-Z][A-Z ]*?)\s*"
+    r"(?:—\s*mobius-error\s+(?P<code>\d{3}):\s*(?P<title>.+?)|\((?P<context>[^)]+)\))?\s*$"
+)
+_FIELD = re.compile(r"^\*\*(?P<label>[^*:]+):\*\*\s*(?P<text>.*)$")
+# Bold labels in the reference → entry attribute
+_FIELD_NAMES = {
+    "what it means": "meaning",
+    "user/call impact": "impact",
+    "root cause direction": "root_cause",
+    "what to check in logs": "check",
+    "log pattern": "log_pattern",
+    "log samples": "log_pattern",
+}
+# Context words in section headings/categories → canonical context
+_CONTEXTS = {
+    "registration": "registration",
+    "unregistration": "unregistration",
+    "call": "calls",
+    "calls": "calls",
+    "service not ready": "service",
+}
+# Whole-word context in a lookup ID; longest first so "unregistration" never
+# resolves as "registration"
+_CONTEXT_WORD = re.compile(
+    r"\b(" + "|".join(re.escape(k) for k in sorted(_CONTEXTS, key=len, reverse=True)) + r")\b"
+)
+
+
+@dataclass
+class MobiusErrorEntry:
+    status: int
+    reason: str
+    code: Optional[str] = None  # mobius-error code, when the entry has one
+    title: str = ""
+    context: str = ""  # registration | unregistration | calls | service | ""
+    meaning: str = ""
+    impact: str = ""
+    root_cause: str = ""
+    check: str = ""
+    log_pattern: str = ""
+
+    @property
+    def key(self) -> str:
+        if self.code:
+            return f"mobius-error {self.code}"
+        return f"{self.status} {self.context}".strip()
+
+    def render(self) -> str:
+        heading = f"{self.status} {self.reason}"
+        heading += f" — mobius-error {self.code}: {self.title}" if self.code else (
+            f" ({self.context})" if self.context else ""
+        )
+        parts = [f"**{heading}**"]
+        for label, text in (
+            ("Meaning", self.meaning),
+            ("Impact", self.impact),
+            ("Root cause", self.root_cause),
+            ("Check", self.check),
+        ):
+            if text:
+                parts.append(f"- {label}: {text}")
+        return "\n".join(parts)
+
+
+@dataclass
+class MobiusErrorIndex:
+    entries: list[MobiusErrorEntry] = field(default_factory=list)
+    by_code: dict[str, MobiusErrorEntry] = field(default_factory=dict)
+    by_status: dict[int, list[MobiusErrorEntry]] = field(default_factory=dict)
+    timers: str = ""
+
+    @classmethod
+    def from_markdown(cls, text: str) -> "MobiusErrorIndex":
+        index = cls()
+        section = ""
+        current: Optional[MobiusErrorEntry] = None
+        attr: Optional[str] = None
+        timer_lines: list[str] = []
+        for raw in text.splitlines():
+            line = raw.strip()
+            if raw.startswith("## "):
+                section = raw[3:].strip().lower()
+                current = attr = None
+                continue
+            if raw.startswith("### "):
+                current = attr = None
+                match = _ENTRY_HEADING.match(raw)
+                if match:
+                    context = (match.group("context") or "").lower()
+                    if not context:
+                        context = next((v for k, v in _CONTEXTS.items() if section.startswith(k)), "")
+                    current = MobiusErrorEntry(
+                        status=int(match.group("status")),
+                        reason=match.group("reason").strip(),
+                        code=match.group("code"),
+                        title=(match.group("title") or "").strip(),
+                        context=_CONTEXTS.get(context, context),
+                    )
+                    index._add(current)
+                continue
+            if section.startswith("timers"):
+                if line:
+                    timer_lines.append(line)
+                continue
+            if current is None or not line or line == "---":
+                continue
+            field_match = _FIELD.match(line)
+            if field_match:
+                attr = _FIELD_NAMES.get(field_match.group("label").strip().lower())
+                if attr:
+                    setattr(current, attr, field_match.group("text").strip())
+                continue
+            if attr:
+                # Continuation (e.g. the bullet list under Root cause direction)
+                setattr(current, attr, f"{getattr(current, attr)} {line}".strip())
+        index.timers = "\n".join(timer_lines)
+        return index
+
+    def _add(self, entry: MobiusErrorEntry) -> None:
+        self.entries.append(entry)
+        if entry.code:
+            self.by_code[entry.code] = entry
+        self.by_status.setdefault(entry.status, []).append(entry)
+
+    def lookup(self, error_id: str) -> list[MobiusErrorEntry]:
+        """
+        Entries for "101", "mobius-error 101", "503", "503 registration",
+        "HTTP 404 unregistration" and similar. Bare 3-digit numbers are
+        tried as mobius-error codes first, then as HTTP statuses.
+        """
+        text = str(error_id).strip().lower()
+        numbers = re.findall(r"\d{3}", text)
+        if not numbers:
+            return []
+        number = numbers[0]
+        if "mobius" in text or (number in self.by_code and not any(w in text for w in ("http", "status"))):
+            entry = self.by_code.get(number)
+            if entry:
+                return [entry]
+        entries = self.by_status.get(int(number), [])
+        context_word = _CONTEXT_WORD.search(text)
+        context = _CONTEXTS[context_word.group(1)] if context_word else ""
+        if context:
+            narrowed = [e for e in entries if e.context == context]
+            return narrowed or entries
+        return entries
+
+
+def _load_index() -> MobiusErrorIndex:
+    try:
+        index = MobiusErrorIndex.from_markdown(MOBIUS_ERROR_REFERENCE.read_text(encoding="utf-8"))
+    except OSError as e:
+        logger.error(f"[reference_index] Cannot read {MOBIUS_ERROR_REFERENCE}: {e}")
+        return MobiusErrorIndex()
+    logger.info(
+        f"[reference_index] Indexed {len(index.entries)} Mobius error entries "
+        f"({len(index.by_code)} mobius-error codes)"
+    )
+    return index
+
+
+# ── Built once at startup ──
+MOBIUS_ERROR_INDEX = _load_index()
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# Lookup tool
+# ═══════════════════════════════════════════════════════════════════════════════
+
+
+def lookup_mobius_errors(error_ids: list[str], tool_context: ToolContext) -> dict:
+    """Look up Mobius error reference entries for a batch of IDs.
+
+    Args:
+        error_ids: mobius-error codes and/or HTTP statuses seen in the logs,
+            e.g. ["101", "mobius-error 117", "503 registration", "429"]. Add
+            "registration", "unregistration" or "calls" to an HTTP status to
+            narrow it to that flow. "timers" returns the keepalive and
+            unregistration timer values.
+
+    Returns:
+        {"entries": {id: [{status, reason, code, title, context, meaning,
+        impact, root_cause, check, log_pattern}]}, "unknown": [ids with no
+        entry — describe these from the log context instead]}.
+    """
+    entries: dict[str, Any] = {}
+    unknown = []
+    for error_id in error_ids[:LOOKUP_MAX_IDS]:
+        if str(error_id).strip().lower() in ("timers", "keepalive"):
+            entries[str(error_id)] = MOBIUS_ERROR_INDEX.timers
+            continue
+        found = MOBIUS_ERROR_INDEX.lookup(error_id)
+        if found:
+            entries[str(error_id)] = [asdict(e) for e in found]
+        else:
+            unknown.append(error_id)
+    return {"entries": entries, "unknown": unknown}
+
+
+mobius_error_tool = FunctionTool(lookup_mobius_errors)
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# Log pre-scan
+# ═══════════════════════════════════════════════════════════════════════════════
+
+_MOBIUS_ERROR_CODE = re.compile(
+    r"(?:mobius[-_ ]?error|errorCode)[\"']?\s*[:=]?\s*[\"']?(\d{3})\b", re.IGNORECASE
+)
+_ERROR_STATUS = re.compile(r"\bError code:\s*(\d{3})\b|\b(\d{3}) [A-Z]{3,}(?: [A-Z]+)*\b")
+_UNREGISTER = re.compile(r"unregist", re.IGNORECASE)
+_REGISTER = re.compile(r"regist", re.IGNORECASE)
+_CALL = re.compile(r"\bcalls?\b|/call", re.IGNORECASE)
+
+
+def _message_context(message: str) -> str:
+    if _UNREGISTER.search(message):
+        return "unregistration"
+    if _REGISTER.search(message):
+        return "registration"
+    if _CALL.search(message):
+        return "calls"
+    return ""
+
+
+def scan_mobius_errors(
+    mobius_sources: Iterable[Mapping[str, Any]],
+    extra_lines: Iterable[str] = (),
+) -> Counter:
+    """Count lookup IDs ("mobius-error 101", "503 registration") found in Mobius logs."""
+    found: Counter = Counter()
+
+    def _scan(message: str, status: Any = None) -> None:
+        # HTTP statuses already explained by a mobius-error code are not repeated
+        explained = set()
+        for match in _MOBIUS_ERROR_CODE.finditer(message):
+            entry = MOBIUS_ERROR_INDEX.by_code.get(match.group(1))
+            if entry:
+                found[f"mobius-error {entry.code}"] += 1
+                explained.add(entry.status)
+        statuses = {int(status)} if str(status or "").isdigit() else set()
+        for match in _ERROR_STATUS.finditer(message):
+            statuses.add(int(match.group(1) or match.group(2)))
+        for code in statuses - explained:
+            if code >= 400 and code in MOBIUS_ERROR_INDEX.by_status:
+                found[f"{code} {_message_context(message)}".strip()] += 1
+
+    for source in mobius_sources:
+        if not isinstance(source, Mapping):
+            continue
+        message = source.get("message")
+        if not isinstance(message, str):
+            message = json.dumps(message, default=str) if message else ""
+        fields = source.get("fields")
+        status = fields.get("response_status") if isinstance(fields, Mapping) else None
+        _scan(message, status)
+    for line in extra_lines:
+        if "mobius" in line.lower() or "error" in line.lower():
+            _scan(line)
+    return found
+
+
+def render_mobius_error_refs(found: Counter) -> str:
+    """Reference entries for the scanned IDs, most frequent first, each entry once."""
+    # A bare status ("503") adds nothing when a narrower ID for it was found
+    narrowed = set()
+    for error_id in found:
+        entries = MOBIUS_ERROR_INDEX.lookup(error_id)
+        if " " in error_id and entries:
+            narrowed.add(str(entries[0].status))
+    seen: set[int] = set()
+    blocks = []
+    for error_id, count in found.most_common():
+        if error_id in narrowed:
+            continue
+        for entry in MOBIUS_ERROR_INDEX.lookup(error_id):
+            if id(entry) in seen:
+                continue
+            seen.add(id(entry))
+            blocks.append(f"{entry.render()}\n- Seen in logs: {error_id} (x{count})")
+    return "\n\n".join(blocks)
+
+
+def attach_mobius_error_refs(callback_context) -> None:
+    """
+    before_agent_callback: write `mobius_error_refs`, the reference entries
+    for every Mobius error found in all_logs/sdk_logs ("" when none).
+    """
+    state = callback_context.state
+    found = scan_mobius_errors(load_all_logs(state).get("mobius", []), sdk_lines(state))
+    state["mobius_error_refs"] = render_mobius_error_refs(found)
+    if found:
+        logger.info(f"[reference_index] Mobius errors in logs: {dict(found)}")
@@ -0,0 +1,268 @@
+"""
+Heading-level section index over the SIP flow and architecture references.
+
+The reference documents of `sip_flow_skill` and `architecture_endpoints_skill`
+are split once at import into sections (one per markdown heading, code
+fences respected) and kept in memory with the keys each section covers:
+SIP response codes and classes, SIP methods, endpoint/service names and
+heading words.
+
+`lookup_reference_sections` returns only the sections matching the codes,
+methods, endpoints and topics asked for — or, when called without
+arguments, those observed in the collected logs. Table sections keyed by
+response code return just the header and the matching rows.
+"""
+
+import logging
+import math
+import re
+from collections import Counter
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Mapping, Optional
+
+from google.adk.tools import FunctionTool, ToolContext
+
+from analyze_agent_v2.digest import digest_for_state
+
+logger = logging.getLogger(__name__)
+
+_SKILLS_DIR = Path(__file__).parent / "skills"
+REFERENCE_DOCUMENTS = (
+    _SKILLS_DIR / "sip_flow_skill" / "references" / "sip_flows.md",
+    _SKILLS_DIR / "architecture_endpoints_skill" / "references" / "architecture_and_endpoints.md",
+    _SKILLS_DIR / "architecture_endpoints_skill" / "references" / "calling_flow.md",
+    _SKILLS_DIR / "architecture_endpoints_skill" / "references" / "contact_center_flow.md",
+)
+# Sections returned per lookup, best matches first
+LOOKUP_MAX_SECTIONS = 8
+# Upper bound on returned text (characters)
+LOOKUP_MAX_CHARS = 12_000
+_TRUNCATED = "\n[... section truncated ...]"
+
+SIP_METHODS = frozenset({
+    "INVITE", "ACK", "BYE", "CANCEL", "OPTIONS", "REGISTER", "PRACK", "UPDATE",
+    "INFO", "REFER", "NOTIFY", "SUBSCRIBE", "MESSAGE",
+})
+ENDPOINTS = (
+    "Mobius", "SSE", "MSE", "WxCAS", "CPAPI", "CXAPI", "U2C", "WDM", "Mercury",
+    "Kamailio", "RTMS", "RAS", "OCI Router", "Control Hub", "SDK",
+)
+
+_HEADING = re.compile(r"^(#{1,6})\s+(.+?)\s*$")
+_CODE = re.compile(r"(?<![\d.:/-])([1-6]\d{2})(?![\d.:/-])")
+_CODE_CLASS = re.compile(r"\b([1-6])xx\b")
+_TABLE_CODE_ROW = re.compile(r"^\|\s*([1-6]\d{2})\s*\|")
+_WORD = re.compile(r"[a-z0-9]+")
+_ENDPOINT_PATTERNS = {
+    name: re.compile(rf"(?<![A-Za-z]){re.escape(name)}(?![A-Za-z])", re.IGNORECASE)
+    for name in ENDPOINTS
+}
+
+# Relative weight of each key kind in ranking
+_KIND_WEIGHTS = {"code": 3.0, "class": 1.5, "method": 2.0, "topic": 3.0, "endpoint": 1.0}
+
+
+@dataclass
+class Section:
+    source: str  # document file name
+    heading: str  # "Parent > Child" heading path
+    text: str
+    keys: set[str] = field(default_factory=set)  # "<kind>:<value>"
+    words: set[str] = field(default_factory=set)  # heading words, for topics
+
+    def excerpt(self, codes: set[str]) -> str:
+        """Section text; code tables are narrowed to their header and matching rows."""
+        lines = self.text.splitlines()
+        rows = [line for line in lines if _TABLE_CODE_ROW.match(line)]
+        if not codes or not rows:
+            return self.text
+        kept = [
+            line for line in lines
+            if not _TABLE_CODE_ROW.match(line) or _TABLE_CODE_ROW.match(line).group(1) in codes
+        ]
+        return "\n".join(kept)
+
+
+def _section_keys(heading: str, body: str) -> tuple[set[str], set[str]]:
+    text = f"{heading}\n{body}"
+    keys = {f"code:{code}" for code in _CODE.findall(text)}
+    keys |= {f"class:{digit}xx" for digit in _CODE_CLASS.findall(text)}
+    keys |= {f"method:{word}" for word in re.findall(r"\b[A-Z]{3,9}\b", text) if word in SIP_METHODS}
+    keys |= {f"endpoint:{name.lower()}" for name, pattern in _ENDPOINT_PATTERNS.items() if pattern.search(text)}
+    return keys, set(_WORD.findall(heading.lower()))
+
+
+def split_sections(source: str, markdown: str) -> list[Section]:
+    """One section per heading (text up to the next heading); fenced code stays in its section."""
+    sections: list[Section] = []
+    path: list[tuple[int, str]] = []
+    body: list[str] = []
+    in_fence = False
+
+    def _flush() -> None:
+        text = "\n".join(body).strip()
+        if path and text:
+            heading = " > ".join(title for _, title in path)
+            keys, words = _section_keys(heading, text)
+            sections.append(Section(source, heading, f"{'#' * path[-1][0]} {path[-1][1]}\n{text}", keys, words))
+
+    for line in markdown.splitlines():
+        if line.lstrip().startswith("```"):
+            in_fence = not in_fence
+        match = None if in_fence else _HEADING.match(line)
+        if match:
+            _flush()
+            body = []
+            level = len(match.group(1))
+            while path and path[-1][0] >= level:
+                path.pop()
+            path.append((level, match.group(2)))
+            continue
+        body.append(line)
+    _flush()
+    return sections
+
+
+@dataclass
+class SectionIndex:
+    sections: list[Section] = field(default_factory=list)
+    by_key: dict[str, list[int]] = field(default_factory=dict)
+
+    def add_document(self, source: str, markdown: str) -> None:
+        for section in split_sections(source, markdown):
+            position = len(self.sections)
+            self.sections.append(section)
+            for key in section.keys:
+                self.by_key.setdefault(key, []).append(position)
+
+    def search(
+        self,
+        codes: set[str],
+        methods: set[str],
+        endpoints: set[str],
+        topics: set[str],
+    ) -> list[tuple[Section, float]]:
+        """Sections ranked by matched keys; rarer keys weigh more (IDF)."""
+        total = max(1, len(self.sections))
+        scores: Counter = Counter()
+
+        def _credit(key: str, kind: str) -> None:
+            positions = self.by_key.get(key, [])
+            if positions:
+                weight = _KIND_WEIGHTS[kind] * math.log(1 + total / len(positions))
+                for position in positions:
+                    scores[position] += weight
+
+        for code in codes:
+            _credit(f"code:{code}", "code")
+            _credit(f"class:{code[0]}xx", "class")
+        for method in methods:
+            _credit(f"method:{method}", "method")
+        for endpoint in endpoints:
+            _credit(f"endpoint:{endpoint}", "endpoint")
+        for topic in topics:
+            words = set(_WORD.findall(topic.lower()))
+            for position, section in enumerate(self.sections):
+                overlap = len(words & section.words)
+                if overlap:
+                    scores[position] += _KIND_WEIGHTS["topic"] * overlap / len(words)
+        return [(self.sections[p], score) for p, score in scores.most_common()]
+
+
+def _load_index() -> SectionIndex:
+    index = SectionIndex()
+    for path in REFERENCE_DOCUMENTS:
+        try:
+            index.add_document(path.name, path.read_text(encoding="utf-8"))
+        except OSError as e:
+            logger.error(f"[section_index] Cannot read {path}: {e}")
+    logger.info(
+        f"[section_index] Indexed {len(index.sections)} sections, {len(index.by_key)} keys "
+        f"from {len(REFERENCE_DOCUMENTS)} reference documents"
+    )
+    return index
+
+
+# ── Built once at startup ──
+REFERENCE_SECTION_INDEX = _load_index()
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# Observed keys and lookup tool
+# ═══════════════════════════════════════════════════════════════════════════════
+
+_DIGEST_SIP_STATUS = re.compile(r"\bSIP ([1-6]\d{2})\b")
+_DIGEST_SIP_METHOD = re.compile(r"\bSIP ([A-Z]+)\b")
+_DIGEST_SERVICES = {"[Mobius]": "mobius", "[SSE/MSE]": "sse", "[WxCAS]": "wxcas", "[SDK]": "sdk"}
+
+
+def observed_reference_keys(state: Mapping[str, Any]) -> dict[str, set[str]]:
+    """SIP codes, methods and endpoints present in the log digest of this investigation."""
+    digest = digest_for_state(state)
+    text = digest["text"] if digest else ""
+    endpoints = {key for label, key in _DIGEST_SERVICES.items() if label in text}
+    endpoints |= {name.lower() for name, pattern in _ENDPOINT_PATTERNS.items() if pattern.search(text)}
+    return {
+        "codes": set(_DIGEST_SIP_STATUS.findall(text)),
+        "methods": {m for m in _DIGEST_SIP_METHOD.findall(text) if m in SIP_METHODS},
+        "endpoints": endpoints,
+    }
+
+
+def lookup_reference_sections(
+    tool_context: ToolContext,
+    sip_codes: Optional[list[str]] = None,
+    sip_methods: Optional[list[str]] = None,
+    endpoints: Optional[list[str]] = None,
+    topics: Optional[list[str]] = None,
+) -> dict:
+    """Return the SIP flow / architecture reference sections relevant to the analysis.
+
+    Call with no arguments to get the sections for the SIP response codes,
+    SIP methods and endpoints observed in the collected logs. Pass arguments
+    to ask for something specific instead.
+
+    Args:
+        sip_codes: SIP response codes, e.g. ["486", "488"].
+        sip_methods: SIP methods, e.g. ["INVITE", "REFER"].
+        endpoints: Services, e.g. ["Mobius", "SSE", "WxCAS", "Kamailio"].
+        topics: Heading words, e.g. ["hold", "transfer", "timers", "sdp",
+            "contact center", "one-way audio", "dialog correlation"].
+
+    Returns:
+        {"query": {...}, "sections": [{"source", "heading", "text"}]}.
+    """
+    codes = {str(c).strip() for c in sip_codes or [] if str(c).strip().isdigit()}
+    methods = {str(m).strip().upper() for m in sip_methods or []} & SIP_METHODS
+    wanted_endpoints = {str(e).strip().lower() for e in endpoints or []}
+    wanted_topics = {str(t).strip() for t in topics or [] if str(t).strip()}
+    if not (codes or methods or wanted_endpoints or wanted_topics):
+        observed = observed_reference_keys(tool_context.state)
+        codes, methods, wanted_endpoints = observed["codes"], observed["methods"], observed["endpoints"]
+
+    results = []
+    used = 0
+    for section, _score in REFERENCE_SECTION_INDEX.search(codes, methods, wanted_endpoints, wanted_topics):
+        text = section.excerpt(codes)
+        if used + len(text) > LOOKUP_MAX_CHARS:
+            if results:
+                continue
+            # The best match alone is over the cap: return its head
+            text = text[:LOOKUP_MAX_CHARS - len(_TRUNCATED)] + _TRUNCATED
+        results.append({"source": section.source, "heading": section.heading, "text": text})
+        used += len(text)
+        if len(results) >= LOOKUP_MAX_SECTIONS:
+            break
+    return {
+        "query": {
+            "sip_codes": sorted(codes),
+            "sip_methods": sorted(methods),
+            "endpoints": sorted(wanted_endpoints),
+            "topics": sorted(wanted_topics),
+        },
+        "sections": results,
+    }
+
+
+reference_sections_tool = FunctionTool(lookup_reference_sections)
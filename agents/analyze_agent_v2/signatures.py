@@ -0,0 +1,461 @@
+"""
+Known-issue signature engine.
+
+Matches a library of known root causes against every collected log entry
+before any LLM call:
+- all signature literals are compiled into one Aho-Corasick automaton, so
+  each entry (message + small structured fields, normalized) is scanned once
+  regardless of the number of signatures
+- a signature is one or more ordered steps (each "any of these literals");
+  multi-step signatures must match in timestamp order, within a time window
+  and, by default, on the same call leg (legs from the digest)
+- `unless` literals suppress a signature anywhere in the investigation
+
+`detect_known_issues` (before_agent_callback) renders matches into
+`known_issues`; the analysis router emits it as an immediate verdict and
+the analysis prompts receive it as a hint to confirm or refute.
+"""
+
+import json
+import logging
+import math
+import re
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Iterable, Iterator, Mapping, Optional
+
+from analyze_agent_v2.digest import digest_for_state, load_all_logs, sdk_lines
+from analyze_agent_v2.reference_index import MOBIUS_ERROR_INDEX
+from timeline import merge_timeline
+
+logger = logging.getLogger(__name__)
+
+# Characters of each entry scanned (start line, headers and error bodies
+# come first; long SDP/payload tails are skipped)
+SCAN_MAX_CHARS = 8192
+# Evidence refs kept per known issue
+EVIDENCE_MAX_REFS = 6
+# Structured values longer than this are not added to the scanned text
+FIELD_MAX_CHARS = 120
+# Window for final responses that only come after the callee rang out: the
+# no-answer / ring timers (typically 60-120s) end in 480, 408 or 603
+NO_ANSWER_WITHIN_SECS = 180.0
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# Aho-Corasick automaton
+# ═══════════════════════════════════════════════════════════════════════════════
+
+
+class AhoCorasick:
+    """Multi-literal matcher: reports every pattern occurring in a text in one pass."""
+
+    def __init__(self, patterns: Iterable[str]):
+        self._goto: list[dict[str, int]] = [{}]
+        self._fail: list[int] = [0]
+        self._out: list[tuple[int, ...]] = [()]
+        for index, pattern in enumerate(patterns):
+            state = 0
+            for ch in pattern:
+                nxt = self._goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append(())
+                    self._goto[state][ch] = nxt
+                state = nxt
+            self._out[state] += (index,)
+
+        queue = list(self._goto[0].values())
+        for state in queue:
+            for ch, nxt in self._goto[state].items():
+                fail = self._fail[state]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                target = self._goto[fail].get(ch, 0)
+                self._fail[nxt] = target if target != nxt else 0
+                self._out[nxt] += self._out[self._fail[nxt]]
+                queue.append(nxt)
+
+    def search(self, text: str) -> set[int]:
+        goto, fail, out = self._goto, self._fail, self._out
+        state = 0
+        found: set[int] = set()
+        for ch in text:
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if out[state]:
+                found.update(out[state])
+        return found
+
+
+_QUOTES = re.compile(r"[\"'`]")
+_SEPARATOR = re.compile(r"\s*([:=])\s*")
+_SPACES = re.compile(r"\s+")
+
+
+def normalize(text: str) -> str:
+    """Lowercase, drop quotes, tighten `key : value` and collapse whitespace."""
+    text = _QUOTES.sub("", text.lower())
+    return _SPACES.sub(" ", _SEPARATOR.sub(r"\1", text))
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# Signature library
+# ═══════════════════════════════════════════════════════════════════════════════
+
+
+@dataclass(frozen=True)
+class Signature:
+    id: str
+    title: str
+    severity: str  # critical | major | minor
+    verdict: str
+    remediation: str
+    # Ordered steps; each step matches an entry containing any of its literals
+    steps: tuple[tuple[str, ...], ...]
+    within_secs: float = 60.0
+    same_leg: bool = True
+    unless: tuple[str, ...] = ()
+
+
+def _after_invite(*literals: str) -> tuple[tuple[str, ...], ...]:
+    return (("invite sip:",), literals)
+
+
+SIGNATURES: tuple[Signature, ...] = (
+    Signature(
+        id="sip-480-unavailable",
+        title="Callee temporarily unavailable (SIP 480)",
+        severity="major",
+        verdict="INVITE answered with 480 Temporarily Unavailable: the destination is offline or not reachable.",
+        remediation="Check the destination's registration on WxCAS (Location Service), device status and REGISTER flow.",
+        steps=_after_invite("sip/2.0 480"),
+        within_secs=NO_ANSWER_WITHIN_SECS,
+    ),
+    Signature(
+        id="sip-486-busy",
+        title="Callee busy (SIP 486)",
+        severity="minor",
+        verdict="INVITE answered with 486 Busy Here: the callee was busy; signaling behaved as expected.",
+        remediation="No fix needed unless the callee was not actually busy; then check call-waiting and device state.",
+        steps=_after_invite("sip/2.0 486", "sip/2.0 600"),
+    ),
+    Signature(
+        id="sip-488-sdp",
+        title="SDP negotiation failure (SIP 488)",
+        severity="major",
+        verdict="488 Not Acceptable Here: the offered media/codecs were not acceptable to the far end.",
+        remediation="Compare offered vs answered codecs (a=rtpmap), media directions and crypto/DTLS attributes in the SDP.",
+        steps=(("sip/2.0 488",),),
+    ),
+    Signature(
+        id="sip-503-unavailable",
+        title="Downstream service unavailable (SIP 503)",
+        severity="critical",
+        verdict="INVITE answered with 503 Service Unavailable: a downstream SIP element (SSE/WxCAS/gateway) was overloaded or down.",
+        remediation="Check SSE and WxCAS health and load at the failure time; look for the element that generated the 503 (Server/Via headers).",
+        steps=_after_invite("sip/2.0 503"),
+    ),
+    Signature(
+        id="sip-408-timer-b",
+        title="INVITE timed out (SIP 408 / Timer B)",
+        severity="critical",
+        verdict="INVITE got no final response within Timer B (32s) or the no-answer timer and failed with 408 Request Timeout.",
+        remediation="Check SSE→WxCAS and WxCAS→destination connectivity and the destination's registration.",
+        steps=_after_invite("sip/2.0 408"),
+        within_secs=NO_ANSWER_WITHIN_SECS,
+    ),
+    Signature(
+        id="sip-403-forbidden",
+        title="Call forbidden (SIP 403)",
+        severity="major",
+        verdict="INVITE rejected with 403 Forbidden: the caller is not authorized for this call.",
+        remediation="Check the user's calling entitlements and policies (CPAPI/Control Hub) and dial-plan restrictions.",
+        steps=_after_invite("sip/2.0 403"),
+    ),
+    Signature(
+        id="sip-603-declined",
+        title="Call declined by the callee (SIP 603)",
+        severity="minor",
+        verdict="INVITE answered with 603 Decline: the callee (user, device or their call settings) rejected the call; signaling behaved as expected.",
+        remediation="No fix needed if the callee declined; otherwise check the callee's call rejection / do-not-disturb settings and device-side decline handling.",
+        steps=_after_invite("sip/2.0 603"),
+        within_secs=NO_ANSWER_WITHIN_SECS,
+    ),
+    Signature(
+        id="sip-481-dialog",
+        title="Dialog/transaction does not exist (SIP 481)",
+        severity="minor",
+        verdict="481 Call/Transaction Does Not Exist: a request referenced a dialog the peer no longer has (state mismatch or race).",
+        remediation="Check for BYE/CANCEL races, failover between nodes, or requests sent after the dialog ended.",
+        steps=(("sip/2.0 481",),),
+    ),
+    Signature(
+        id="ice-failure",
+        title="ICE connectivity failure",
+        severity="critical",
+        verdict="ICE connectivity checks failed: no media path could be established between client and MSE.",
+        remediation="Check ICE candidates (relay/TURN availability), firewall/NAT rules for UDP media ports and MSE reachability.",
+        steps=((
+            "iceconnectionstate:failed", "ice connection state:failed", "ice connection failed",
+            "ice failed", "ice_failed", "icestate:failed",
+        ),),
+        same_leg=False,
+    ),
+    Signature(
+        id="dtls-failure",
+        title="DTLS-SRTP handshake failure",
+        severity="critical",
+        verdict="The DTLS handshake for SRTP failed: media keys were never negotiated, so no audio flows.",
+        remediation="Compare a=fingerprint/a=setup in offer and answer; check MSE logs for the handshake and certificate errors.",
+        steps=(("dtls handshake failed", "dtls failed", "dtls_failed", "dtls timeout"),),
+        same_leg=False,
+    ),
+    Signature(
+        id="registration-obp-resolution",
+        title="Outbound proxy resolution failed",
+        severity="critical",
+        verdict="Mobius could not resolve the outbound proxy (SSE address), so registration failed with 503.",
+        remediation="Check DNS/SRV records and the OBP configuration for the user's region.",
+        steps=(("obp resolution failed",),),
+        same_leg=False,
+    ),
+    Signature(
+        id="registration-cpapi-exception",
+        title="CPAPI failure during registration",
+        severity="major",
+        verdict="The CPAPI query for the browser client ID timed out or failed, so Mobius could not register the device.",
+        remediation="Check CPAPI availability and latency at the failure time, and the user's provisioning.",
+        steps=(("received client exception from provisioning client",),),
+        same_leg=False,
+    ),
+    Signature(
+        id="registration-keepalive-loss",
+        title="Registration lost after missed keepalives",
+        severity="major",
+        verdict="The client stopped sending keepalives (5 missed at 30s) and Mobius unregistered the device.",
+        remediation="Check client network stability, sleep/suspend events and WebSocket/Mercury connectivity.",
+        steps=(("missed keepalive", "keepalive failed", "keepalive timeout"),),
+        same_leg=False,
+    ),
+    Signature(
+        id="rate-limited",
+        title="Requests rate limited (HTTP 429)",
+        severity="minor",
+        verdict="Ingress rate limiting rejected requests with 429 Too Many Requests.",
+        remediation="Identify the noisy client or retry loop driving the request rate.",
+        steps=(("429 too many requests", "status:429", "response_status:429"),),
+        same_leg=False,
+    ),
+) + tuple(
+    # One signature per documented mobius-error code
+    Signature(
+        id=f"mobius-error-{entry.code}",
+        title=f"Mobius error {entry.code}: {entry.title}",
+        severity="major",
+        verdict=f"{entry.status} {entry.reason} with mobius-error {entry.code} ({entry.title}). {entry.meaning}",
+        remediation=entry.root_cause,
+        steps=((
+            f"mobius-error:{entry.code}", f"mobius-error {entry.code}", f"mobiuserror:{entry.code}",
+        ),),
+        same_leg=False,
+    )
+    for entry in MOBIUS_ERROR_INDEX.by_code.values()
+)
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# Matching
+# ═══════════════════════════════════════════════════════════════════════════════
+
+
+@dataclass
+class _Entry:
+    ts: Optional[float]
+    ts_text: str
+    ref: str
+    leg: str
+    position: int
+
+
+class SignatureEngine:
+    """All signatures compiled into one automaton; `match` runs over log entries."""
+
+    def __init__(self, signatures: Iterable[Signature] = SIGNATURES):
+        self.signatures = tuple(signatures)
+        literals: dict[str, int] = {}
+        # literal index → [(signature index, step index)]; step -1 = unless
+        self._targets: list[list[tuple[int, int]]] = []
+
+        def _literal(text: str) -> int:
+            key = normalize(text)
+            if key not in literals:
+                literals[key] = len(literals)
+                self._targets.append([])
+            return literals[key]
+
+        for sig_index, signature in enumerate(self.signatures):
+            for step_index, step in enumerate(signature.steps):
+                for text in step:
+                    self._targets[_literal(text)].append((sig_index, step_index))
+            for text in signature.unless:
+                self._targets[_literal(text)].append((sig_index, -1))
+        self._automaton = AhoCorasick(literals)
+
+    def match(self, entries: Iterable[tuple[str, str, str, str]]) -> list[dict]:
+        """
+        `entries`: (scan text, timestamp, ref, leg). Returns the known issues,
+        most severe first.
+        """
+        hits: dict[tuple[int, int], list[_Entry]] = {}
+        suppressed: set[int] = set()
+        for position, (text, ts_text, ref, leg) in enumerate(entries):
+            found = self._automaton.search(normalize(text[:SCAN_MAX_CHARS]))
+            if not found:
+                continue
+            entry = _Entry(_epoch(ts_text), ts_text, ref, leg, position)
+            for literal in found:
+                for sig_index, step_index in self._targets[literal]:
+                    if step_index < 0:
+                        suppressed.add(sig_index)
+                    else:
+                        step_hits = hits.setdefault((sig_index, step_index), [])
+                        if not step_hits or step_hits[-1] is not entry:
+                            step_hits.append(entry)
+
+        issues = []
+        for sig_index, signature in enumerate(self.signatures):
+            if sig_index in suppressed or (sig_index, 0) not in hits:
+                continue
+            chains = self._chains(signature, [hits.get((sig_index, s), []) for s in range(len(signature.steps))])
+            if not chains:
+                continue
+            evidence = []
+            for chain in chains:
+                for entry in chain:
+                    if entry.ref not in evidence:
+                        evidence.append(entry.ref)
+            first = chains[0][-1]
+            issues.append({
+                "id": signature.id,
+                "title": signature.title,
+                "severity": signature.severity,
+                "verdict": signature.verdict,
+                "remediation": signature.remediation,
+                "occurrences": len(chains),
+                "first_seen": first.ts_text,
+                "legs": sorted({chain[-1].leg for chain in chains})[:5],
+                "evidence": evidence[:EVIDENCE_MAX_REFS],
+            })
+        rank = {"critical": 0, "major": 1, "minor": 2}
+        issues.sort(key=lambda i: (rank.get(i["severity"], 3), i["first_seen"] or "9999"))
+        return issues
+
+    @staticmethod
+    def _chains(signature: Signature, step_hits: list[list[_Entry]]) -> list[list[_Entry]]:
+        """Greedy ordered chains: each step's earliest entry after the previous one."""
+        if not all(step_hits):
+            return []
+        if len(step_hits) == 1:
+            return [[entry] for entry in step_hits[0]]
+        ordered = [sorted(h, key=_order_key) for h in step_hits]
+        chains = []
+        used_last: set[int] = set()
+        for start in ordered[0]:
+            chain = [start]
+            for later in ordered[1:]:
+                nxt = next((e for e in later if _follows(signature, chain, e)), None)
+                if nxt is None:
+                    break
+                chain.append(nxt)
+            if len(chain) == len(ordered) and chain[-1].position not in used_last:
+                used_last.add(chain[-1].position)
+                chains.append(chain)
+        return chains
+
+
+def _order_key(entry: _Entry) -> tuple:
+    return (entry.ts if entry.ts is not None else math.inf, entry.position)
+
+
+def _follows(signature: Signature, chain: list[_Entry], entry: _Entry) -> bool:
+    prev, start = chain[-1], chain[0]
+    if entry.position == prev.position:
+        return False
+    if signature.same_leg and entry.leg != start.leg:
+        return False
+    if entry.ts is None or prev.ts is None or start.ts is None:
+        return entry.position > prev.position
+    return prev.ts <= entry.ts <= start.ts + signature.within_secs
+
+
+def _epoch(ts: str) -> Optional[float]:
+    if not ts:
+        return None
+    try:
+        return datetime.fromisoformat(ts.replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        return None
+
+
+# ── Compiled once at startup ──
+SIGNATURE_ENGINE = SignatureEngine()
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# State integration
+# ═══════════════════════════════════════════════════════════════════════════════
+
+
+def _scan_text(source: Mapping[str, Any]) -> str:
+    """Message plus short structured values as `key=value` (top level and `fields`)."""
+    message = source.get("message") or ""
+    if not isinstance(message, str):
+        message = json.dumps(message, default=str)
+    parts = [message]
+    for scope in (source, source.get("fields")):
+        if not isinstance(scope, Mapping):
+            continue
+        for key, value in scope.items():
+            if key != "message" and isinstance(value, (str, int)) and len(str(value)) <= FIELD_MAX_CHARS:
+                parts.append(f"{key}={value}")
+    return " ".join(parts)
+
+
+def iter_scan_entries(state: Mapping[str, Any]) -> Iterator[tuple[str, str, str, str]]:
+    """(scan text, timestamp, ref, leg) for every server entry and SDK line, in time order."""
+    digest = digest_for_state(state)
+    ref_legs = digest["ref_legs"] if digest else {}
+    for event in merge_timeline(load_all_logs(state), sdk_lines(state)):
+        text = _scan_text(event.entry) if event.entry is not None else event.message
+        yield text, event.ts, event.ref, ref_legs.get(event.ref, "unassigned")
+
+
+def render_verdict(issues: list[dict]) -> str:
+    """Short markdown verdict for the UI and the analysis prompts."""
+    if not issues:
+        return ""
+    lines = ["**Known issues detected (signature match):**"]
+    for issue in issues:
+        lines.append(
+            f"- [{issue['severity'].upper()}] **{issue['title']}** — {issue['verdict']} "
+            f"(x{issue['occurrences']}, first {issue['first_seen'] or 'n/a'}; refs: {', '.join(issue['evidence'])})"
+        )
+        if issue["remediation"]:
+            lines.append(f"  - Next step: {issue['remediation']}")
+    return "\n".join(lines)
+
+
+def detect_known_issues(callback_context) -> None:
+    """before_agent_callback: write the rendered verdict for matched signatures to `known_issues` ("" when none)."""
+    state = callback_context.state
+    started = time.monotonic()
+    issues = SIGNATURE_ENGINE.match(iter_scan_entries(state))
+    state["known_issues"] = render_verdict(issues)
+    logger.info(
+        f"[signatures] {len(issues)} known issue(s) in {(time.monotonic() - started) * 1000:.1f}ms: "
+        f"{[i['id'] for i in issues]}"
+    )
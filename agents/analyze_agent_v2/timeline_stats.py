@@ -0,0 +1,343 @@
+"""
+Vectorized timing analytics over the digest's event timeline.
+
+Call setup time, post-dial delay, SIP transaction response times, HTTP
+latencies, gaps and retransmissions are computed here in NumPy rather than
+by the analysis/chat LLM reading timestamps out of text. The digest events
+(see digest.py; SIP messages already parsed by sip_parser.py, legs assigned
+by legs.py) are encoded once into columns, and every metric is a grouped
+reduction over those columns:
+
+- per leg: first/last event, duration, largest gap and gaps over
+  GAP_THRESHOLD_SECS
+- per SIP transaction (Call-ID, CSeq, method): first response time, final
+  status and time, retransmissions (the same request or response seen again
+  by the same service; its sent and received log copies count once)
+- per INVITE: call setup time (→ 200) and post-dial delay (→ 180/183)
+- per HTTP exchange (tracking ID): request → first later response latency
+
+`attach_timeline_stats` (before_agent_callback) writes the result as JSON to
+`timeline_stats` for the analysis and chat prompts.
+"""
+
+import json
+import logging
+import math
+import time
+import warnings
+from datetime import datetime
+from typing import Iterable, Optional
+
+import numpy as np
+
+from analyze_agent_v2.digest import DigestEvent, digest_for_state
+
+logger = logging.getLogger(__name__)
+
+# Silences between consecutive events of one leg longer than this are reported
+GAP_THRESHOLD_SECS = 2.0
+# Rows kept per list in the output (largest/slowest/failing first)
+MAX_LEGS = 20
+MAX_TRANSACTIONS = 40
+MAX_SLOW_HTTP = 10
+# Responses that mark the callee alerting (post-dial delay)
+RINGING_STATUSES = (180, 183)
+# SipMessage.direction → column code ("" when the log line does not say)
+_DIRECTION_CODES = {"": 0, "sent": 1, "received": 2}
+
+
+class _Codes:
+    """Dense integer codes for hashable keys (first seen → 0, 1, ...)."""
+
+    def __init__(self):
+        self.values: list = []
+        self._index: dict = {}
+
+    def __call__(self, value) -> int:
+        code = self._index.get(value)
+        if code is None:
+            code = self._index[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+
+def _epochs(timestamps: list[str]) -> np.ndarray:
+    """ISO timestamps → float64 epoch seconds (NaN when missing/unparseable)."""
+    cleaned = [ts[:-1] if ts.endswith("Z") else ts for ts in timestamps]
+    try:
+        with warnings.catch_warnings():
+            # Offsets like "+02:00" are applied, with a deprecation-style warning
+            warnings.simplefilter("ignore")
+            parsed = np.array(cleaned, dtype="datetime64[us]")
+        epochs = parsed.astype("int64").astype("float64") / 1e6
+        epochs[np.isnat(parsed)] = np.nan
+        return epochs
+    except ValueError:
+        return np.array([_epoch(ts) for ts in timestamps], dtype="float64")
+
+
+def _epoch(ts: str) -> float:
+    try:
+        return datetime.fromisoformat(ts.replace("Z", "+00:00")).timestamp() if ts else math.nan
+    except ValueError:
+        return math.nan
+
+
+def _iso(epoch: float) -> Optional[str]:
+    if math.isnan(epoch):
+        return None
+    return np.datetime64(int(round(epoch * 1e6)), "us").astype(str) + "Z"
+
+
+def _ms(seconds: float) -> Optional[int]:
+    return None if math.isnan(seconds) else int(round(seconds * 1000))
+
+
+def _first_per_group(groups: np.ndarray, ts: np.ndarray, size: int) -> np.ndarray:
+    """Index of the earliest row of each group (-1 for groups without rows)."""
+    first = np.full(size, -1, dtype="int64")
+    if len(groups):
+        order = np.lexsort((ts, groups))
+        unique, index = np.unique(groups[order], return_index=True)
+        first[unique] = order[index]
+    return first
+
+
+def _first_rows(mask: np.ndarray, groups: np.ndarray, ts: np.ndarray, size: int) -> np.ndarray:
+    """Row of the earliest `mask` row of each group (-1 for groups without one)."""
+    rows = np.flatnonzero(mask)
+    first = _first_per_group(groups[rows], ts[rows], size)
+    found = first >= 0
+    first[found] = rows[first[found]]
+    return first
+
+
+def _distribution(values: np.ndarray) -> dict:
+    values = values[~np.isnan(values)]
+    if not len(values):
+        return {"count": 0}
+    p50, p95 = np.percentile(values, [50, 95])
+    return {
+        "count": int(len(values)),
+        "p50_ms": _ms(float(p50)),
+        "p95_ms": _ms(float(p95)),
+        "max_ms": _ms(float(values.max())),
+    }
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# Metrics
+# ═══════════════════════════════════════════════════════════════════════════════
+
+
+def _leg_metrics(ts: np.ndarray, legs: np.ndarray, leg_codes: _Codes) -> list[dict]:
+    n_legs = len(leg_codes)
+    valid = ~np.isnan(ts)
+    ts, legs = ts[valid], legs[valid]
+    counts = np.bincount(legs, minlength=n_legs)
+    start = np.full(n_legs, np.inf)
+    end = np.full(n_legs, -np.inf)
+    np.minimum.at(start, legs, ts)
+    np.maximum.at(end, legs, ts)
+
+    order = np.lexsort((ts, legs))
+    ts_sorted, legs_sorted = ts[order], legs[order]
+    same_leg = legs_sorted[1:] == legs_sorted[:-1]
+    gaps = np.diff(ts_sorted)[same_leg]
+    gap_legs = legs_sorted[1:][same_leg]
+    gap_starts = ts_sorted[:-1][same_leg]
+    long_gaps = np.bincount(gap_legs[gaps > GAP_THRESHOLD_SECS], minlength=n_legs)
+    largest = _first_per_group(gap_legs, -gaps, n_legs)
+
+    rows = []
+    for code in np.argsort(-counts, kind="stable")[:MAX_LEGS]:
+        if not counts[code]:
+            continue
+        gap_index = largest[code]
+        rows.append({
+            "leg": leg_codes.values[code],
+            "events": int(counts[code]),
+            "start": _iso(float(start[code])),
+            "end": _iso(float(end[code])),
+            "duration_ms": _ms(float(end[code] - start[code])),
+            "max_gap_ms": _ms(float(gaps[gap_index])) if gap_index >= 0 else 0,
+            "max_gap_after": _iso(float(gap_starts[gap_index])) if gap_index >= 0 else None,
+            "gaps_over_threshold": int(long_gaps[code]),
+        })
+    return rows
+
+
+def _sip_metrics(events: list[DigestEvent], ts: np.ndarray) -> dict:
+    rows = [(i, e.sip) for i, e in enumerate(events) if e.sip is not None and e.sip.transaction_method]
+    if not rows:
+        return {"transactions": [], "response_ms": {}, "call_setup": [], "retransmissions": 0}
+
+    txn_codes, service_codes = _Codes(), _Codes()
+    index = np.array([i for i, _ in rows], dtype="int64")
+    txn = np.array([txn_codes((sip.call_id, sip.cseq, sip.transaction_method)) for _, sip in rows], dtype="int64")
+    service = np.array([service_codes(events[i].service) for i, _ in rows], dtype="int64")
+    status = np.array([sip.status or 0 for _, sip in rows], dtype="int64")
+    sip_ts = ts[index]
+    n_txn = len(txn_codes)
+    is_request = status == 0
+    known = ~np.isnan(sip_ts)
+
+    def _first_where(mask: np.ndarray) -> np.ndarray:
+        return _first_rows(mask & known, txn, sip_ts, n_txn)
+
+    # Earliest request, first response, first ringing and first final response per transaction
+    request_first = _first_where(is_request)
+    response_first = _first_where(~is_request)
+    ringing_first = _first_where(np.isin(status, RINGING_STATUSES))
+    final_first = _first_where(status >= 200)
+
+    def _delay(rows_index: np.ndarray) -> np.ndarray:
+        ok = (rows_index >= 0) & (request_first >= 0)
+        delay = np.full(n_txn, np.nan)
+        delay[ok] = sip_ts[rows_index[ok]] - sip_ts[request_first[ok]]
+        return delay
+
+    response_delay = _delay(response_first)
+    ringing_delay = _delay(ringing_first)
+    final_delay = _delay(final_first)
+    final_status = np.where(final_first >= 0, status[np.maximum(final_first, 0)], 0)
+
+    # Retransmissions: the same message (request or response code, top Via branch) seen again by
+    # the same service. A service logging one message both as sent and as received is one copy:
+    # copies are counted per direction, and the busier direction is taken.
+    message_codes = _Codes()
+    message = np.array([
+        message_codes((int(txn[row]), int(service[row]), int(status[row]), next(iter(sip.via_branches), None)))
+        for row, (_, sip) in enumerate(rows)
+    ], dtype="int64")
+    direction = np.array([_DIRECTION_CODES.get(sip.direction, 0) for _, sip in rows], dtype="int64")
+    copy_keys, copy_counts = np.unique(message * len(_DIRECTION_CODES) + direction, return_counts=True)
+    copies = np.zeros(len(message_codes), dtype="int64")
+    np.maximum.at(copies, copy_keys // len(_DIRECTION_CODES), copy_counts)
+    message_txn = np.array([key[0] for key in message_codes.values], dtype="int64")
+    retransmissions = np.bincount(message_txn, weights=copies - 1, minlength=n_txn).astype("int64")
+
+    methods = np.array([key[2] for key in txn_codes.values], dtype=object)
+    response_ms = {
+        str(method): _distribution(response_delay[methods == method])
+        for method in sorted(set(methods.tolist()))
+        if method != "ACK"
+    }
+
+    transactions = []
+    for code in range(n_txn):
+        call_id, cseq, method = txn_codes.values[code]
+        if method == "ACK":
+            continue
+        first = request_first[code] if request_first[code] >= 0 else final_first[code]
+        transactions.append({
+            "call_id": call_id,
+            "cseq": f"{cseq} {method}",
+            "leg": events[index[first]].leg if first >= 0 else None,
+            "request_at": _iso(float(sip_ts[request_first[code]])) if request_first[code] >= 0 else None,
+            "first_response_ms": _ms(float(response_delay[code])),
+            "final_status": int(final_status[code]) or None,
+            "final_ms": _ms(float(final_delay[code])),
+            "retransmissions": int(retransmissions[code]),
+        })
+    # Failures, then retransmitted, then slowest first
+    transactions.sort(key=lambda t: (
+        -((t["final_status"] or 0) >= 300 or (t["final_status"] is None and t["request_at"] is not None)),
+        -t["retransmissions"],
+        -(t["final_ms"] or 0),
+    ))
+
+    call_setup = []
+    for code in np.flatnonzero(methods == "INVITE"):
+        call_id, cseq, _ = txn_codes.values[code]
+        call_setup.append({
+            "call_id": call_id,
+            "cseq": cseq,
+            "final_status": int(final_status[code]) or None,
+            "setup_ms": _ms(float(final_delay[code])) if final_status[code] == 200 else None,
+            "post_dial_delay_ms": _ms(float(ringing_delay[code])),
+        })
+
+    return {
+        "transactions": transactions[:MAX_TRANSACTIONS],
+        "response_ms": response_ms,
+        "call_setup": call_setup[:MAX_TRANSACTIONS],
+        "retransmissions": int(retransmissions.sum()),
+    }
+
+
+def _http_metrics(events: list[DigestEvent], ts: np.ndarray) -> dict:
+    rows = [i for i, e in enumerate(events) if e.kind == "http" and e.tracking_id and not math.isnan(ts[i])]
+    if not rows:
+        return {"exchanges": 0, "latency": {"count": 0}, "slowest": []}
+
+    tracking_codes = _Codes()
+    index = np.array(rows, dtype="int64")
+    tracking = np.array([tracking_codes(events[i].tracking_id) for i in rows], dtype="int64")
+    http_ts = ts[index]
+    is_request = np.array([events[i].http_status is None and events[i].http_path is not None for i in rows])
+    is_response = np.array([events[i].http_status is not None for i in rows])
+    n_keys = len(tracking_codes)
+
+    request_rows = _first_rows(is_request, tracking, http_ts, n_keys)
+    request_ts = np.where(request_rows >= 0, http_ts[np.maximum(request_rows, 0)], np.inf)
+
+    # First response at or after the request of the same tracking ID
+    answered = is_response & (http_ts >= request_ts[tracking])
+    response_rows = _first_rows(answered, tracking, http_ts, n_keys)
+
+    paired = np.flatnonzero((request_rows >= 0) & (response_rows >= 0))
+    latency = http_ts[response_rows[paired]] - http_ts[request_rows[paired]]
+    slowest = []
+    for position in np.argsort(-latency, kind="stable")[:MAX_SLOW_HTTP]:
+        request = events[index[request_rows[paired[position]]]]
+        response = events[index[response_rows[paired[position]]]]
+        slowest.append({
+            "request": request.text,
+            "status": response.http_status,
+            "latency_ms": _ms(float(latency[position])),
+            "service": request.service,
+            "refs": [request.ref, response.ref],
+        })
+    return {"exchanges": int(len(paired)), "latency": _distribution(latency), "slowest": slowest}
+
+
+def compute_timeline_stats(events: Iterable[DigestEvent]) -> dict:
+    """All timing metrics for a time-ordered digest event list."""
+    events = list(events)
+    if not events:
+        return {
+            "gap_threshold_ms": _ms(GAP_THRESHOLD_SECS),
+            "legs": [],
+            "sip": _sip_metrics([], np.empty(0)),
+            "http": _http_metrics([], np.empty(0)),
+        }
+    ts = _epochs([e.ts for e in events])
+    leg_codes = _Codes()
+    legs = np.array([leg_codes(e.leg) for e in events], dtype="int64")
+    return {
+        "gap_threshold_ms": _ms(GAP_THRESHOLD_SECS),
+        "legs": _leg_metrics(ts, legs, leg_codes),
+        "sip": _sip_metrics(events, ts),
+        "http": _http_metrics(events, ts),
+    }
+
+
+def attach_timeline_stats(callback_context) -> None:
+    """before_agent_callback: write `timeline_stats` (JSON; "" when there are no logs)."""
+    state = callback_context.state
+    digest = digest_for_state(state)
+    if not digest or not digest["events"]:
+        state["timeline_stats"] = ""
+        return
+    started = time.monotonic()
+    stats = compute_timeline_stats(digest["events"])
+    state["timeline_stats"] = json.dumps(stats, separators=(",", ":"))
+    logger.info(
+        f"[timeline_stats] {len(digest['events'])} events in "
+        f"{(time.monotonic() - started) * 1000:.1f}ms: {len(stats['legs'])} legs, "
+        f"{len(stats['sip']['transactions'])} SIP transactions, {stats['http']['exchanges']} HTTP exchanges"
+    )
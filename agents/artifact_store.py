@@ -0,0 +1,345 @@
+"""
+Content-addressed store for large session-state values.
+
+Multi-MB values (raw log JSON) are written once to compressed files under
+ARTIFACT_STORE_DIR and session state holds only a short reference:
+
+    artifact://sha256/<hex>
+
+so state saves and reads stay small. Consumers resolve references lazily:
+LlmAgents use `state_instruction(...)`, which injects `{var}` placeholders
+like ADK's built-in templating but expands references to their content and
+can compute derived views (see log_views.py) that are never stored. Values
+are measured and, if the prompt would not fit the model window, degraded
+before injection (see token_budget.py).
+"""
+
+import hashlib
+import logging
+import os
+import re
+import threading
+import time
+import zlib
+from collections import Counter, OrderedDict
+from itertools import chain
+from pathlib import Path
+from typing import Any, Callable, Iterable, Mapping, Optional
+
+from google.adk.agents.readonly_context import ReadonlyContext
+
+from token_budget import DEFAULT_MODEL, LogDigester, estimate_tokens, fit_values, instruction_budget
+
+logger = logging.getLogger(__name__)
+
+ARTIFACT_REF_PREFIX = "artifact://sha256/"
+ARTIFACT_STORE_DIR = Path(
+    os.getenv("ARTIFACT_STORE_DIR", Path(__file__).parent / ".artifacts")
+)
+# Values smaller than this stay inline in state
+ARTIFACT_INLINE_MAX_BYTES = 16 * 1024
+# Decoded artifacts kept in memory for repeated reads within the process
+ARTIFACT_CACHE_MAX_ENTRIES = 32
+# Eviction: artifacts not written or read for this long are deleted, then the
+# least recently used ones until the store fits the size cap. Runs on the
+# first write in the process and at most once per interval after that.
+ARTIFACT_MAX_AGE_SECS = float(os.getenv("ARTIFACT_STORE_MAX_AGE_DAYS", "7")) * 86400
+ARTIFACT_MAX_TOTAL_BYTES = int(os.getenv("ARTIFACT_STORE_MAX_MB", "2048")) * 1024 * 1024
+ARTIFACT_GC_INTERVAL_SECS = 3600
+
+_REF_PATTERN = re.compile(r"^artifact://sha256/([0-9a-f]{64})$")
+
+
+def is_artifact_ref(value: Any) -> bool:
+    return isinstance(value, str) and bool(_REF_PATTERN.match(value))
+
+
+class ArtifactStore:
+    """zlib-compressed files addressed by the SHA-256 of their content. Thread-safe."""
+
+    def __init__(
+        self,
+        root: Path = ARTIFACT_STORE_DIR,
+        max_age_secs: float = ARTIFACT_MAX_AGE_SECS,
+        max_total_bytes: int = ARTIFACT_MAX_TOTAL_BYTES,
+    ):
+        self._root = Path(root)
+        self._max_age_secs = max_age_secs
+        self._max_total_bytes = max_total_bytes
+        self._lock = threading.Lock()
+        self._cache: OrderedDict[str, str] = OrderedDict()
+        self._gc_at: Optional[float] = None
+
+    def _path(self, digest: str) -> Path:
+        return self._root / digest[:2] / f"{digest}.zz"
+
+    def put(self, text: str) -> str:
+        """Store `text` (idempotent) and return its reference."""
+        data = text.encode()
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._path(digest)
+        if not self._touch(path):
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_suffix(f".tmp{threading.get_ident()}")
+            tmp.write_bytes(zlib.compress(data, 6))
+            os.replace(tmp, path)
+            logger.info(
+                f"[ArtifactStore] Stored {len(data)} bytes as {digest[:12]} "
+                f"({path.stat().st_size} compressed)"
+            )
+        self._remember(digest, text)
+        self._maybe_gc()
+        return f"{ARTIFACT_REF_PREFIX}{digest}"
+
+    def put_chunks(self, chunks: Iterable[bytes]) -> str:
+        """
+        Store the concatenation of `chunks` without holding it in memory:
+        each chunk is hashed and compressed as it arrives. Not cached for
+        reads, unlike `put`.
+        """
+        self._root.mkdir(parents=True, exist_ok=True)
+        tmp = self._root / f"incoming.tmp{os.getpid()}.{threading.get_ident()}"
+        hasher = hashlib.sha256()
+        compressor = zlib.compressobj(6)
+        size = 0
+        try:
+            with open(tmp, "wb") as f:
+                for chunk in chunks:
+                    hasher.update(chunk)
+                    size += len(chunk)
+                    f.write(compressor.compress(chunk))
+                f.write(compressor.flush())
+            digest = hasher.hexdigest()
+            path = self._path(digest)
+            if self._touch(path):
+                tmp.unlink()
+            else:
+                path.parent.mkdir(parents=True, exist_ok=True)
+                os.replace(tmp, path)
+                logger.info(
+                    f"[ArtifactStore] Streamed {size} bytes as {digest[:12]} "
+                    f"({path.stat().st_size} compressed)"
+                )
+        except BaseException:
+            tmp.unlink(missing_ok=True)
+            raise
+        self._maybe_gc()
+        return f"{ARTIFACT_REF_PREFIX}{digest}"
+
+    def get(self, ref: str) -> str:
+        """Content of a reference. Raises KeyError if the artifact is missing."""
+        match = _REF_PATTERN.match(ref)
+        if not match:
+            raise KeyError(f"not an artifact reference: {ref[:80]}")
+        digest = match.group(1)
+        with self._lock:
+            cached = self._cache.get(digest)
+            if cached is not None:
+                self._cache.move_to_end(digest)
+                return cached
+        path = self._path(digest)
+        try:
+            text = zlib.decompress(path.read_bytes()).decode()
+        except FileNotFoundError:
+            raise KeyError(f"artifact not found: {digest}") from None
+        self._touch(path)
+        self._remember(digest, text)
+        return text
+
+    @staticmethod
+    def _touch(path: Path) -> bool:
+        """Mark an artifact as used (eviction is by mtime). False if it doesn't exist."""
+        try:
+            os.utime(path)
+            return True
+        except FileNotFoundError:
+            return False
+
+    def _maybe_gc(self) -> None:
+        now = time.monotonic()
+        with self._lock:
+            if self._gc_at is not None and now - self._gc_at < ARTIFACT_GC_INTERVAL_SECS:
+                return
+            self._gc_at = now
+        try:
+            self.gc()
+        except OSError as e:
+            logger.warning(f"[ArtifactStore] Eviction failed: {e}")
+
+    def gc(self) -> tuple[int, int]:
+        """
+        Delete artifacts unused for longer than the max age, then the least
+        recently used until the store fits the size cap. Leftover temp files
+        from interrupted writes are deleted once past the max age too.
+        Returns (files deleted, bytes freed).
+        """
+        if not self._root.is_dir():
+            return 0, 0
+        cutoff = time.time() - self._max_age_secs
+        files = []
+        deleted = freed = 0
+        for path in self._root.rglob("*"):
+            try:
+                if not path.is_file():
+                    continue
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            if stat.st_mtime < cutoff:
+                if self._unlink(path):
+                    deleted += 1
+                    freed += stat.st_size
+            elif path.suffix == ".zz":
+                # Younger temp files may be writes in progress
+                files.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self._max_total_bytes:
+                break
+            total -= size
+            if self._unlink(path):
+                deleted += 1
+                freed += size
+        if deleted:
+            logger.info(f"[ArtifactStore] Evicted {deleted} file(s), {freed} bytes")
+        return deleted, freed
+
+    @staticmethod
+    def _unlink(path: Path) -> bool:
+        try:
+            path.unlink()
+            return True
+        except FileNotFoundError:
+            return False
+
+    def _remember(self, digest: str, text: str) -> None:
+        with self._lock:
+            self._cache[digest] = text
+            self._cache.move_to_end(digest)
+            while len(self._cache) > ARTIFACT_CACHE_MAX_ENTRIES:
+                self._cache.popitem(last=False)
+
+    def offload(self, text: str) -> str:
+        """Reference for large values, the value itself for small ones."""
+        if len(text) < ARTIFACT_INLINE_MAX_BYTES:
+            return text
+        return self.put(text)
+
+    def offload_chunks(self, chunks: Iterable[bytes]) -> str:
+        """`offload` for a value produced as UTF-8 chunks, streamed to disk when large."""
+        chunks = iter(chunks)
+        head: list[bytes] = []
+        size = 0
+        for chunk in chunks:
+            head.append(chunk)
+            size += len(chunk)
+            if size >= ARTIFACT_INLINE_MAX_BYTES:
+                return self.put_chunks(chain(head, chunks))
+        return b"".join(head).decode()
+
+    def resolve(self, value: Any) -> Any:
+        """Expand a reference to its content; any other value is returned unchanged."""
+        if not is_artifact_ref(value):
+            return value
+        try:
+            return self.get(value)
+        except KeyError as e:
+            logger.warning(f"[ArtifactStore] Unresolvable reference: {e}")
+            return ""
+
+
+# ── Singleton shared by writers and readers in the process ──
+artifact_store = ArtifactStore()
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# Instruction templating with lazy reference resolution
+# ═══════════════════════════════════════════════════════════════════════════════
+
+# Same placeholder grammar as ADK's inject_session_state: any run of braces
+# around a state key, optionally suffixed with `?` for "empty if missing".
+_PLACEHOLDER = re.compile(r"{+[^{}]*}+")
+_STATE_KEY = re.compile(r"^(?:(?:app|user|temp):)?[A-Za-z_][A-Za-z0-9_]*$")
+
+
+StateView = Callable[[Mapping[str, Any]], str]
+
+
+def render_state_template(
+    template: str,
+    state: Mapping[str, Any],
+    views: Optional[Mapping[str, StateView]] = None,
+    budget: Optional[int] = None,
+    label: str = "",
+    digester: Optional[LogDigester] = None,
+) -> str:
+    """
+    Substitute `{key}` / `{key?}` placeholders from state, resolving artifact
+    references. Keys in `views` are computed from state instead of read.
+    With a token `budget`, oversized values are degraded to fit it first
+    (log values down to `digester`'s digest when one is given).
+    """
+    values: dict[str, str] = {}
+
+    def _name(match: re.Match) -> Optional[str]:
+        name = match.group().lstrip("{").rstrip("}").strip()
+        optional = name.endswith("?")
+        if optional:
+            name = name[:-1]
+        if not _STATE_KEY.match(name):
+            return None
+        if name in values:
+            return name
+        if views and name in views:
+            values[name] = views[name](state)
+        elif name in state:
+            value = artifact_store.resolve(state[name])
+            values[name] = "" if value is None else str(value)
+        elif optional:
+            values[name] = ""
+        else:
+            raise KeyError(f"Context variable not found: `{name}`.")
+        return name
+
+    names = [_name(match) for match in _PLACEHOLDER.finditer(template)]
+
+    if budget is not None and values:
+        fixed_tokens = estimate_tokens(_PLACEHOLDER.sub("", template))
+        categories = {
+            name: view.category
+            for name, view in (views or {}).items()
+            if getattr(view, "category", None)
+        }
+        values = fit_values(
+            values, fixed_tokens, budget, label,
+            uses=Counter(names), digester=digester, categories=categories,
+        )
+
+    def _replace(match: re.Match) -> str:
+        name = match.group().lstrip("{").rstrip("}").strip().rstrip("?")
+        return values[name] if name in values else match.group()
+
+    return _PLACEHOLDER.sub(_replace, template)
+
+
+def state_instruction(
+    template: str,
+    views: Optional[Mapping[str, StateView]] = None,
+    model: str = DEFAULT_MODEL,
+    digester: Optional[LogDigester] = None,
+) -> Callable[[ReadonlyContext], str]:
+    """
+    InstructionProvider for LlmAgent: ADK-style `{var}` injection where
+    artifact references in state are loaded only when the prompt is built,
+    and the result is held to the model's instruction token budget. Agents
+    that inject raw logs pass a `digester` (analyze_agent_v2.digest.digest_text)
+    as the budget's last resort.
+    """
+    budget = instruction_budget(model)
+
+    def _provider(ctx: ReadonlyContext) -> str:
+        return render_state_template(
+            template, ctx.state, views, budget=budget, label=ctx.agent_name, digester=digester
+        )
+
+    return _provider
@@ -3,6 +3,9 @@ from pathlib import Path
 from dotenv import load_dotenv
 from google.adk.agents import LlmAgent
 
+from analyze_agent_v2.digest import digest_text
+from artifact_store import state_instruction
+from log_views import LOG_VIEWS
 from oauth_context import SessionLiteLlm
 
 env_path = Path(__file__).parent.parent / ".env"
@@ -18,7 +21,7 @@ chat_agent = LlmAgent(
     description="Conversational assistant for the Webex Calling Log Analyzer.",
     name="chat_agent",
     output_key="chat_response",
-    instruction="""You are a conversational assistant for the Webex Calling Log Analyzer.
+    instruction=state_instruction("""You are a conversational assistant for the Webex Calling Log Analyzer.
 You help engineers explore and understand analysis results produced by the
 log-analysis pipeline. You are READ-ONLY — you never run searches, never
 re-analyze logs, and never trigger pipeline behavior.
@@ -32,6 +35,7 @@ They may be EMPTY if no search has been run yet.
 
   Analysis (primary source of truth) : {analyze_results}
   Search statistics                  : {search_summary}
+  Timing metrics (computed, JSON)    : {timeline_stats}
   Sequence diagram (PlantUML)        : {sequence_diagram}
   Raw Mobius logs                     : {mobius_logs}
   Raw SSE/MSE logs                   : {sse_mse_logs}
@@ -173,7 +177,10 @@ Use {search_summary} for log counts, BFS depth, environments, IDs.
 
 ── TIMING ("how long did the call take?", "setup time?") ──
 
-Extract timestamps from analysis. Calculate and present durations.
+Use {timeline_stats} first: call setup time, post-dial delay, SIP response
+times, retransmissions, per-leg durations/gaps and HTTP latencies are already
+computed from the log timestamps. Only calculate durations from timestamps in
+the analysis for what it does not cover.
 
 ── TELECOM CONCEPTS ("what is ICE?", "what is SIP 480?") ──
 
@@ -205,5 +212,5 @@ WHAT YOU MUST NEVER DO
 - Never paste raw log JSON unless explicitly asked
 - Never paste full state verbatim
 - Never speculate beyond what the analysis states
-""",
+""", views=LOG_VIEWS, digester=digest_text),
 )
\ No newline at end of file
@@ -0,0 +1,151 @@
+"""
+Per-category log views derived from the canonical `all_logs` state value.
+
+search_agent_v2 stores every retained `_source` once, as the JSON object
+`{"mobius": [...], "sse_mse": [...], "wxcas": [...]}` in `all_logs` (usually
+an artifact reference). `mobius_logs`, `sse_mse_logs` and `wxcas_logs` are
+not stored; instruction templates compute them on demand via `LOG_VIEWS`.
+
+`sip_ladder` is a derived view too: every SIP message in all_logs, parsed by
+sip_parser.py into one time-ordered line each (for the diagram generator).
+"""
+
+import json
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Mapping
+
+from artifact_store import StateView, artifact_store
+from sip_parser import parse_sip
+from timeline import merge_timeline
+
+try:
+    import orjson
+except ImportError:  # optional speedup
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+# View state key → category inside all_logs
+LOG_VIEW_CATEGORIES = {
+    "mobius_logs": "mobius",
+    "sse_mse_logs": "sse_mse",
+    "wxcas_logs": "wxcas",
+}
+
+# Parsed all_logs and SIP ladders kept per distinct value (one per recent investigation)
+_PARSED_CACHE_MAX_ENTRIES = 4
+
+_lock = threading.Lock()
+_parsed: OrderedDict[str, dict[str, str]] = OrderedDict()
+
+
+def _split_categories(all_logs: str) -> dict[str, str]:
+    """Parse the canonical object once and re-encode each category as its own array."""
+    try:
+        parsed = orjson.loads(all_logs) if orjson is not None else json.loads(all_logs)
+    except ValueError as e:
+        logger.warning(f"[log_views] all_logs is not valid JSON: {e}")
+        return {}
+    if not isinstance(parsed, dict):
+        return {}
+    if orjson is not None:
+        return {category: orjson.dumps(hits).decode() for category, hits in parsed.items()}
+    return {
+        category: json.dumps(hits, separators=(",", ":"), ensure_ascii=False)
+        for category, hits in parsed.items()
+    }
+
+
+def category_logs(state: Mapping[str, Any], category: str) -> str:
+    """JSON array of one category's `_source` documents ("" if no logs)."""
+    stored = state.get("all_logs") or ""
+    if not stored:
+        return ""
+    with _lock:
+        views = _parsed.get(stored)
+        if views is not None:
+            _parsed.move_to_end(stored)
+    if views is None:
+        views = _split_categories(artifact_store.resolve(stored))
+        with _lock:
+            _parsed[stored] = views
+            while len(_parsed) > _PARSED_CACHE_MAX_ENTRIES:
+                _parsed.popitem(last=False)
+    return views.get(category, "[]")
+
+
+class _CategoryView:
+    """StateView of one category; `category` lets the token budget digest it as such."""
+
+    def __init__(self, category: str):
+        self.category = category
+
+    def __call__(self, state: Mapping[str, Any]) -> str:
+        return category_logs(state, self.category)
+
+
+# Pass as `state_instruction(..., views=LOG_VIEWS)` wherever a template
+# references {mobius_logs}, {sse_mse_logs} or {wxcas_logs}.
+LOG_VIEWS: dict[str, StateView] = {
+    key: _CategoryView(category) for key, category in LOG_VIEW_CATEGORIES.items()
+}
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# SIP ladder view
+# ═══════════════════════════════════════════════════════════════════════════════
+
+# Category inside all_logs → service label on ladder lines
+SIP_LADDER_SERVICES = {"mobius": "Mobius", "sse_mse": "SSE/MSE", "wxcas": "WxCAS"}
+# Lines kept in the ladder (earliest first)
+SIP_LADDER_MAX_LINES = 500
+
+# Rendered ladders, keyed by the stored all_logs value like `_parsed`
+_ladders: OrderedDict[str, str] = OrderedDict()
+
+
+def sip_ladder(state: Mapping[str, Any]) -> str:
+    """
+    Time-ordered SIP messages across categories, one line each:
+    `<timestamp> [service] SIP INVITE <uri> | Call-ID=... | CSeq=... | SDP ...`.
+    The same message logged twice in a row (sent/received) is shown once.
+    """
+    stored = state.get("all_logs") or ""
+    if not stored:
+        return ""
+    with _lock:
+        text = _ladders.get(stored)
+        if text is not None:
+            _ladders.move_to_end(stored)
+            return text
+    text = _render_ladder(state)
+    with _lock:
+        _ladders[stored] = text
+        while len(_ladders) > _PARSED_CACHE_MAX_ENTRIES:
+            _ladders.popitem(last=False)
+    return text
+
+
+def _render_ladder(state: Mapping[str, Any]) -> str:
+    streams = {}
+    for category in SIP_LADDER_SERVICES:
+        try:
+            streams[category] = json.loads(category_logs(state, category))
+        except ValueError:
+            continue
+    lines = []
+    previous = None
+    for event in merge_timeline(streams):
+        sip = parse_sip(event.message)
+        if sip is None:
+            continue
+        key = (sip.call_id, sip.cseq, sip.label(), tuple(sip.via_branches[:1]))
+        if key != previous:
+            lines.append(f"{event.ts} [{SIP_LADDER_SERVICES[event.source]}] {sip.summary()}")
+        previous = key
+    if len(lines) > SIP_LADDER_MAX_LINES:
+        omitted = len(lines) - SIP_LADDER_MAX_LINES
+        lines = lines[:SIP_LADDER_MAX_LINES] + [f"[... {omitted} later SIP messages omitted ...]"]
+    return "\n".join(lines)
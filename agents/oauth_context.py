@@ -1,5 +1,6 @@
 """Per-request OAuth token using contextvars for async-safe isolation."""
 
+import logging
 from contextvars import ContextVar
 from typing import AsyncGenerator
 
@@ -7,6 +8,10 @@ from google.adk.models.lite_llm import LiteLlm
 from google.adk.models.llm_request import LlmRequest
 from google.adk.models.llm_response import LlmResponse
 
+from token_budget import estimate_request_tokens, prompt_limit
+
+logger = logging.getLogger(__name__)
+
 # One ContextVar per async task — no cross-request bleed
 oauth_token_var: ContextVar[str] = ContextVar("oauth_token", default="")
 
@@ -26,11 +31,29 @@ class SessionLiteLlm(LiteLlm):
 
     Always overwrites _additional_args["api_key"] from the contextvar so that
     a stale token from a previous request never leaks to a different user.
+
+    Requests estimated to exceed the model's context window are refused
+    before they are sent (see token_budget.py).
     """
 
     async def generate_content_async(
         self, llm_request: LlmRequest, stream: bool = False
     ) -> AsyncGenerator[LlmResponse, None]:
+        tokens = estimate_request_tokens(llm_request)
+        limit = prompt_limit(self.model)
+        if tokens > limit:
+            logger.error(
+                f"[SessionLiteLlm] Refusing request: ~{tokens} prompt tokens exceeds "
+                f"the {limit}-token limit for {self.model}"
+            )
+            yield LlmResponse(
+                error_code="CONTEXT_BUDGET_EXCEEDED",
+                error_message=(
+                    f"Prompt is ~{tokens} tokens, over the {limit}-token limit for "
+                    f"{self.model}. Narrow the search or start a new session."
+                ),
+            )
+            return
         # Always overwrite — clears stale tokens when contextvar is empty
         self._additional_args["api_key"] = oauth_token_var.get()
         async for chunk in super().generate_content_async(llm_request, stream):
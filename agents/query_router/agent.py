@@ -21,12 +21,15 @@ from visualAgent.agent import sequence_diagram_agent
 
 logger = logging.getLogger(__name__)
 
+# mobius_logs / sse_mse_logs / wxcas_logs are derived from all_logs (log_views.py)
 STATE_DEFAULTS = {
-    "mobius_logs": "",
-    "sse_mse_logs": "",
-    "wxcas_logs": "",
     "all_logs": "",
     "search_summary": "",
+    "log_digest": "",
+    "leg_analyses": "",
+    "mobius_error_refs": "",
+    "known_issues": "",
+    "timeline_stats": "",
     "parsed_query": "",
     "extracted_ids": "",
     "latest_search_results": "",
@@ -36,10 +39,9 @@ STATE_DEFAULTS = {
 }
 
 PIPELINE_STATE_KEYS = [
-    "mobius_logs", "sse_mse_logs", "wxcas_logs", "all_logs",
-    "search_summary", "parsed_query", "extracted_ids",
-    "latest_search_results", "analyze_results", "sequence_diagram",
-    "sdk_logs",
+    "all_logs", "search_summary", "log_digest", "leg_analyses", "mobius_error_refs",
+    "known_issues", "timeline_stats", "parsed_query", "extracted_ids",
+    "latest_search_results", "analyze_results", "sequence_diagram", "sdk_logs",
 ]
 
 # ── Intent parser (LlmAgent used internally, output never shown to user) ─────
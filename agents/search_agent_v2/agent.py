@@ -19,6 +19,7 @@ import threading
 import time
 import requests
 from collections import deque
+from itertools import chain
 from pathlib import Path
 from typing import Any, AsyncGenerator, Optional
 from typing_extensions import override
@@ -31,7 +32,20 @@ from google.adk.agents.invocation_context import InvocationContext
 from google.adk.events import Event
 from opensearchpy import OpenSearch, RequestsHttpConnection
 
+from artifact_store import artifact_store
+from sip_parser import parse_sip
 from oauth_context import SessionLiteLlm, get_oauth_token
+from search_agent_v2.hit_spool import HIT_FILTER_PATH, FastJSONSerializer
+from search_agent_v2.hit_store import HitStore
+from search_agent_v2.resilience import (
+    REQUEST_TIMEOUT_SECS,
+    DeadlineExceeded,
+    call_hedged,
+    call_with_resilience,
+    cluster_registry,
+    start_investigation_deadline,
+)
+from search_agent_v2.response_cache import negative_cache, response_cache
 
 # ═══════════════════════════════════════════════════════════════════════════════
 # Setup
@@ -375,6 +389,8 @@ ID_TYPE_SEARCH_CONFIG = {
             "category": "wxcas",
         },
     ],
+    # user_id / device_id span many calls — discovered values are expanded in
+    # bounded mode (aggregation only, see BOUNDED_EXPANSION_* below).
     "user_id": [
         {
             "service": "wxm_app",
@@ -382,6 +398,7 @@ ID_TYPE_SEARCH_CONFIG = {
             "field": "fields.USER_ID.keyword",
             "tag_filter": "mobius",
             "category": "mobius",
+            "bounded": True,
         },
     ],
     "device_id": [
@@ -391,6 +408,7 @@ ID_TYPE_SEARCH_CONFIG = {
             "field": "fields.DEVICE_ID.keyword",
             "tag_filter": "mobius",
             "category": "mobius",
+            "bounded": True,
         },
     ],
     "trace_id": [
@@ -443,17 +461,50 @@ EXTRACTOR_KEY_TO_ID_TYPE = {
     "sip_call_ids": "sip_call_id",
     "sse_call_ids": "sse_call_id",
     "call_ids": "call_id",
-    # TODO: re-enable once we add time-range filters to avoid massive result sets
-    # "user_ids": "user_id",
-    # "device_ids": "device_id",
+    "user_ids": "user_id",
+    "device_ids": "device_id",
     "trace_ids": "trace_id",
 }
 
+# Bounded expansion for broad IDs (configs with "bounded": True) discovered
+# during BFS: instead of downloading every hit, run a size:0 terms
+# aggregation inside the ID's own time window to discover call/session IDs.
+# Agg field → extractor key the discovered values are merged under.
+BOUNDED_EXPANSION_AGG_FIELDS = {
+    "fields.mobiusCallId.keyword": "mobius_call_ids",
+    "fields.localSessionId.keyword": "session_ids",
+    "fields.remoteSessionId.keyword": "session_ids",
+    "fields.sipCallId.keyword": "sip_call_ids",
+}
+# Skip expansion entirely if the ID matches more hits than this in its window
+BOUNDED_EXPANSION_MAX_HITS = 5000
+# Max distinct values discovered per aggregated field
+BOUNDED_EXPANSION_MAX_TERMS = 20
+
 # Regex for SSE Call-ID pattern in SIP message bodies
 SSE_CALLID_PATTERN = re.compile(r"SSE\d+@[\d.]+")
 
 # Pagination
 PAGE_SIZE = 100
+# Paged searches per BFS depth streamed at once (per-cluster rate limits are
+# enforced separately by the scheduler in resilience.py)
+MAX_CONCURRENT_SEARCH_TASKS = 16
+# Pages handed to the LLM ID extractor at once, across all search tasks
+MAX_CONCURRENT_EXTRACTIONS = 4
+
+# Time windows: padding applied around observed activity
+TIME_PADDING_HOURS = 2
+# Windows are rounded outward to this granularity so follow-up queries share
+# identical range filters (shard request cache / filter cache reuse)
+QUERY_WINDOW_ROUNDING_MINUTES = 15
+# Unsearched frontier IDs listed in search_summary when the budget runs out
+MAX_UNSEARCHED_IDS_REPORTED = 20
+# Bucket size of the pre-flight date_histogram activity probe
+PROBE_HISTOGRAM_INTERVAL_HOURS = 1
+# Activity clusters with fewer docs than this (besides the busiest) are stray
+# logs and don't widen a seed's window; larger ones (a retried call hours
+# later) are kept in it
+PROBE_CLUSTER_MIN_DOCS = 3
 
 # ═══════════════════════════════════════════════════════════════════════════════
 # Helper Functions
@@ -549,6 +600,103 @@ def resolve_indexes(
     return indexes
 
 
+def resolve_target_indexes(
+    service: str, targets: list[tuple[str, str]]
+) -> list[str]:
+    """Resolve index names for explicit (env, region) pairs rather than a cross product."""
+    mapping = REGION_INDEX_MAPPING.get(service, {})
+    indexes = []
+    for env, region in targets:
+        idx = mapping.get(env, {}).get(region)
+        if idx:
+            indexes.append(idx)
+    logger.debug(f"[resolve_target_indexes] service={service}, targets={targets} → {indexes}")
+    return indexes
+
+
+def shape_time_range(
+    time_range: tuple[str, str] | None,
+    rounding_minutes: int = QUERY_WINDOW_ROUNDING_MINUTES,
+) -> tuple[str, str] | None:
+    """
+    Round a (gte, lte) window outward to cache-friendly boundaries.
+
+    Raw windows carry sub-second precision from log timestamps, so two
+    follow-up queries almost never share a range filter. Flooring gte and
+    ceiling lte to `rounding_minutes` makes nearby windows identical, which
+    lets OpenSearch reuse cached filter bitsets and request-cache entries.
+    Unparseable windows are returned unchanged.
+    """
+    from datetime import datetime, timedelta, timezone
+
+    if not time_range:
+        return None
+    try:
+        start = datetime.fromisoformat(time_range[0].replace("Z", "+00:00"))
+        end = datetime.fromisoformat(time_range[1].replace("Z", "+00:00"))
+    except (ValueError, AttributeError):
+        return time_range
+    if start.tzinfo is None:
+        start = start.replace(tzinfo=timezone.utc)
+    if end.tzinfo is None:
+        end = end.replace(tzinfo=timezone.utc)
+
+    step = rounding_minutes * 60
+    start_ts = int(start.timestamp()) // step * step
+    end_ts = -(-int(end.timestamp() + 0.999999) // step) * step
+    fmt = "%Y-%m-%dT%H:%M:%SZ"
+    return (
+        datetime.fromtimestamp(start_ts, tz=timezone.utc).strftime(fmt),
+        datetime.fromtimestamp(end_ts, tz=timezone.utc).strftime(fmt),
+    )
+
+
+def normalize_search_key(
+    index: str,
+    query_type: str,
+    field: str | None,
+    value: str,
+    tag_filter: str | None,
+    time_range: tuple[str, str] | None,
+    mode: str = "fetch",
+) -> tuple:
+    """
+    Canonical identity of a planned search, independent of which ID-type label
+    produced it. Mirrors build_query's defaults so equivalent configs collapse:
+    `call_id`/`sse_call_id` both → term on callId.keyword, `trace_id`/`unknown`
+    both → match_phrase on message.
+    """
+    if query_type == "match_phrase":
+        field = field or "message"
+    elif query_type == "session_id":
+        field = None
+    elif query_type != "term":
+        query_type, field = "match_phrase", "message"
+    return (
+        index,
+        query_type,
+        field or "",
+        str(value).strip(),
+        tag_filter or "",
+        tuple(time_range) if time_range else None,
+        mode,
+    )
+
+
+def negative_search_key(
+    index: str,
+    query_type: str,
+    field: str | None,
+    value: str,
+    tag_filter: str | None,
+    time_range: tuple[str, str] | None,
+) -> tuple:
+    """Negative-cache key of a search: its normalized identity, fetch mode aside."""
+    return negative_cache.make_key(
+        *normalize_search_key(index, query_type, field, value, tag_filter, time_range)[:-1]
+    )
+
+
 def build_query(
     id_value: str,
     query_type: str,
@@ -628,6 +776,23 @@ def build_query(
     return query
 
 
+def _make_client(url: str, token: str) -> OpenSearch:
+    """
+    OpenSearch client for one cluster. Transport-level retries are disabled:
+    timeouts, retries and circuit breaking are owned by the resilience layer.
+    """
+    return OpenSearch(
+        hosts=[url],
+        use_ssl=True,
+        verify_certs=True,
+        connection_class=RequestsHttpConnection,
+        headers={"Authorization": f"Bearer {token}"},
+        timeout=REQUEST_TIMEOUT_SECS,
+        max_retries=0,
+        serializer=FastJSONSerializer(),
+    )
+
+
 async def search_opensearch(index: str, query: dict) -> dict:
     """
     Execute an OpenSearch search with search_after pagination.
@@ -652,14 +817,7 @@ async def search_opensearch(index: str, query: dict) -> dict:
         return {"hits": {"hits": [], "total": {"value": 0}}}
 
     def _do_paginated_search() -> dict:
-        client = OpenSearch(
-            hosts=[url],
-            use_ssl=True,
-            verify_certs=True,
-            connection_class=RequestsHttpConnection,
-            headers={"Authorization": f"Bearer {token}"},
-            timeout=3000,
-        )
+        client = _make_client(url, token)
 
         all_hits = []
         total_value = 0
@@ -726,11 +884,29 @@ async def search_opensearch(index: str, query: dict) -> dict:
 async def search_opensearch_pages(
     index: str,
     query: dict,
+    outcome: dict | None = None,
+    preference: str | None = None,
 ) -> AsyncGenerator[list[dict], None]:
     """
     Streaming paginated search — yields each page of hits as it arrives.
     Used by the progressive staged search to process batches incrementally.
+
+    Pages are served through `response_cache`: identical (index, DSL, cursor)
+    requests within the TTL never reach the cluster, and concurrent identical
+    requests share a single fetch.
+
+    Each page goes through `call_with_resilience` (deadline, retries, circuit
+    breaker); the first page is optionally hedged against tail latency. If
+    `outcome` is given it is filled with {"pages", "failed",
+    "error"} so callers can tell a genuinely empty result from a failed or
+    truncated search. `preference` pins the
+    request to the same shard copies for the whole investigation so repeat and
+    follow-up queries hit warm caches.
     """
+    if outcome is None:
+        outcome = {}
+    outcome.update({"pages": 0, "failed": False, "error": None})
+
     is_int = index.endswith("-int")
     token = get_opensearch_token(is_int)
     url = OPENSEARCH_INDEX_URL_MAP.get(index)
@@ -747,18 +923,20 @@ async def search_opensearch_pages(
             f"[search_opensearch_pages] Missing URL or token for {index} "
             f"(url={'set' if url else 'MISSING'}, token={'set' if token else 'MISSING'})"
         )
+        outcome["failed"] = True
+        outcome["error"] = "missing URL or token"
         return
 
-    def _fetch_page(page_query: dict) -> dict:
-        client = OpenSearch(
-            hosts=[url],
-            use_ssl=True,
-            verify_certs=True,
-            connection_class=RequestsHttpConnection,
-            headers={"Authorization": f"Bearer {token}"},
-            timeout=3000,
+    client = _make_client(url, token)
+
+    def _fetch_page(page_query: dict, timeout: float) -> dict:
+        return client.search(
+            index=index,
+            body=page_query,
+            preference=preference,
+            filter_path=HIT_FILTER_PATH,
+            request_timeout=timeout,
         )
-        return client.search(index=index, body=page_query)
 
     page_query = dict(query)
     page_num = 0
@@ -770,11 +948,28 @@ async def search_opensearch_pages(
             f"search_after={page_query.get('search_after', 'none')}"
         )
         try:
-            result = await asyncio.to_thread(_fetch_page, page_query)
+            result = await response_cache.get_or_fetch(
+                index,
+                page_query,
+                lambda q=page_query, n=page_num: (
+                    call_hedged if n == 1 else call_with_resilience
+                )(
+                    url,
+                    lambda timeout: _fetch_page(q, timeout),
+                    label=f"{index} page {n}",
+                ),
+            )
         except Exception as e:
-            logger.error(f"[search_opensearch_pages] Page {page_num} failed: {e}")
+            logger.error(
+                f"[search_opensearch_pages] Page {page_num} of {index} failed after retries; "
+                f"remaining pages are unavailable: {type(e).__name__}: {e}"
+            )
+            outcome["failed"] = True
+            outcome["error"] = f"{type(e).__name__}: {e}"[:300]
             break
 
+        outcome["pages"] = page_num
+
         total_info = result.get("hits", {}).get("total", {})
         total_value = total_info.get("value", 0) if isinstance(total_info, dict) else total_info
         hits = result.get("hits", {}).get("hits", [])
@@ -806,6 +1001,165 @@ async def search_opensearch_pages(
         page_query["search_after"] = sort_values
 
 
+async def probe_opensearch(
+    index: str, body: dict, preference: str | None = None
+) -> dict | None:
+    """
+    Run a single `size:0` request (count / aggregation probe) against an index.
+    Opts into the shard request cache, which only caches size:0 responses.
+    Returns the raw response, or None if the probe could not be executed.
+    """
+    is_int = index.endswith("-int")
+    token = get_opensearch_token(is_int)
+    url = OPENSEARCH_INDEX_URL_MAP.get(index)
+
+    if not url or not token:
+        logger.error(
+            f"[probe_opensearch] Missing URL or token for {index} "
+            f"(url={'set' if url else 'MISSING'}, token={'set' if token else 'MISSING'})"
+        )
+        return None
+
+    client = _make_client(url, token)
+
+    def _do_probe(timeout: float) -> dict:
+        return client.search(
+            index=index,
+            body=body,
+            preference=preference,
+            request_cache=True,
+            request_timeout=timeout,
+        )
+
+    try:
+        return await call_with_resilience(url, _do_probe, label=f"{index} probe")
+    except Exception as e:
+        logger.error(f"[probe_opensearch] Probe failed for {index}: {type(e).__name__}: {e}")
+        return None
+
+
+def build_probe(query: dict) -> dict:
+    """
+    Turn a search DSL body into a cheap pre-flight probe: no hits are fetched,
+    only the total count and an hourly date_histogram of matching activity.
+    """
+    return {
+        "query": query["query"],
+        "size": 0,
+        "track_total_hits": True,
+        "aggs": {
+            "activity": {
+                "date_histogram": {
+                    "field": "@timestamp",
+                    "fixed_interval": f"{PROBE_HISTOGRAM_INTERVAL_HOURS}h",
+                    "min_doc_count": 1,
+                }
+            }
+        },
+    }
+
+
+def activity_window_from_buckets(
+    buckets: dict[int, int],
+    interval_hours: float = PROBE_HISTOGRAM_INTERVAL_HOURS,
+    padding_hours: float = TIME_PADDING_HOURS,
+    min_cluster_docs: int = PROBE_CLUSTER_MIN_DOCS,
+) -> tuple[str, str] | None:
+    """
+    Derive a tight (gte, lte) ISO window from date_histogram buckets.
+
+    Args:
+        buckets: bucket start (epoch ms) → doc_count, merged across indexes.
+
+    Buckets are grouped into clusters separated by gaps wider than the padding.
+    The window spans every cluster holding at least `min_cluster_docs` docs
+    (and always the busiest), so separate real activity such as a call retried
+    hours later stays searchable while one stray old log doesn't widen it.
+    """
+    from datetime import datetime, timedelta, timezone
+
+    keys = sorted(k for k, count in buckets.items() if count > 0)
+    if not keys:
+        return None
+    interval_ms = interval_hours * 3600 * 1000
+    max_gap_ms = interval_ms + padding_hours * 3600 * 1000
+
+    clusters: list[list[int]] = [[keys[0]]]
+    for key in keys[1:]:
+        if key - clusters[-1][-1] > max_gap_ms:
+            clusters.append([key])
+        else:
+            clusters[-1].append(key)
+    counts = [sum(buckets[k] for k in cluster) for cluster in clusters]
+    busiest = max(counts)
+    kept = [c for c, n in zip(clusters, counts) if n == busiest or n >= min_cluster_docs]
+    if len(kept) < len(clusters):
+        logger.debug(
+            f"[activity_window_from_buckets] Ignoring {len(clusters) - len(kept)} stray "
+            f"cluster(s) under {min_cluster_docs} docs"
+        )
+
+    pad = timedelta(hours=padding_hours)
+    start = datetime.fromtimestamp(kept[0][0] / 1000, tz=timezone.utc) - pad
+    end = datetime.fromtimestamp((kept[-1][-1] + interval_ms) / 1000, tz=timezone.utc) + pad
+    return start.isoformat(), end.isoformat()
+
+
+def pad_time_span(
+    span: tuple[str, str], padding_hours: float = TIME_PADDING_HOURS
+) -> tuple[str, str] | None:
+    """Widen an observed (min, max) @timestamp span by the padding. None if unparseable."""
+    from datetime import datetime, timedelta
+
+    try:
+        t_min = datetime.fromisoformat(span[0].replace("Z", "+00:00"))
+        t_max = datetime.fromisoformat(span[1].replace("Z", "+00:00"))
+    except (ValueError, AttributeError) as e:
+        logger.warning(f"[pad_time_span] Failed to parse span {span}: {e}")
+        return None
+    pad = timedelta(hours=padding_hours)
+    return (t_min - pad).isoformat(), (t_max + pad).isoformat()
+
+
+def build_expansion_probe(query: dict) -> dict:
+    """
+    Turn a search DSL body into a bounded-expansion probe: a size:0 terms
+    aggregation over the call/session ID fields, with each term's first/last
+    @timestamp so the discovered IDs get their own time windows.
+    """
+    return {
+        "query": query["query"],
+        "size": 0,
+        "track_total_hits": True,
+        "aggs": {
+            field: {
+                "terms": {"field": field, "size": BOUNDED_EXPANSION_MAX_TERMS},
+                "aggs": {
+                    "first_seen": {"min": {"field": "@timestamp"}},
+                    "last_seen": {"max": {"field": "@timestamp"}},
+                },
+            }
+            for field in BOUNDED_EXPANSION_AGG_FIELDS
+        },
+    }
+
+
+# ID fields copied into each condensed entry: Mobius nests them under
+# _source.fields.<name>, wxcalling logs carry them at _source.<name>
+NESTED_ID_FIELDS = (
+    "localSessionId",
+    "remoteSessionId",
+    "mobiusCallId",
+    "sipCallId",
+    "WEBEX_TRACKINGID",
+    "USER_ID",
+    "DEVICE_ID",
+)
+TOP_LEVEL_ID_FIELDS = ("callId", "traceId", "sessionId")
+# IDs in a condensed entry's parsed SIP record (see sip_parser.SipMessage.to_record)
+SIP_RECORD_ID_KEYS = ("call_id", "session_id", "remote_session_id")
+
+
 def extract_id_fields_for_llm(hits: list[dict]) -> list[dict]:
     """
     Extract only ID-relevant fields from search hits for LLM consumption.
@@ -818,29 +1172,27 @@ def extract_id_fields_for_llm(hits: list[dict]) -> list[dict]:
     for hit in hits:
         source = hit.get("_source", {})
         fields = source.get("fields", {})
+        message = source.get("message") or ""
         entry: dict[str, Any] = {
             "timestamp": source.get("@timestamp"),
             "tags": source.get("tags"),
-            # Truncate long SIP messages — SSE Call-IDs are in headers (first ~500 chars)
-            "message": source.get("message") or "",
+            "message": message,
         }
+        # SIP messages: IDs come pre-parsed; the SDP body carries none and is
+        # dropped, while headers and any log suffix after the body are kept
+        sip = parse_sip(message) if isinstance(message, str) else None
+        if sip is not None:
+            entry["sip"] = sip.to_record()
+            entry["message"] = sip.without_sdp(message)
         # Nested ID fields (Mobius log structure: _source.fields.<name>)
-        for id_field in (
-            "localSessionId",
-            "remoteSessionId",
-            "mobiusCallId",
-            "sipCallId",
-            "WEBEX_TRACKINGID",
-            "USER_ID",
-            "DEVICE_ID",
-        ):
+        for id_field in NESTED_ID_FIELDS:
             val = fields.get(id_field)
             if isinstance(val, list):
                 val = val[0] if val else None
             if val and str(val) not in DUMMY_ID_VALUES:
                 entry[id_field] = val
         # Top-level ID fields (wxcalling log structure: _source.<name>)
-        for id_field in ("callId", "traceId", "sessionId"):
+        for id_field in TOP_LEVEL_ID_FIELDS:
             val = source.get(id_field)
             if isinstance(val, list):
                 val = val[0] if val else None
@@ -995,8 +1347,11 @@ Analyze the search results in {latest_search_results} and extract ALL unique ide
 **Where to Look:**
 - Structured fields: `localSessionId`, `remoteSessionId`, `mobiusCallId`, `sipCallId`,
   `WEBEX_TRACKINGID`, `USER_ID`, `DEVICE_ID`, `traceId`, `callId`, `sessionId`
-- Inside `message` content: SIP headers contain `Call-ID:` values (look for SSE pattern),
-  tracking IDs, session IDs embedded in log text
+- `sip` (present when `message` is a SIP message, SDP body already removed): pre-parsed
+  `call_id` (check for the SSE pattern), `session_id` / `remote_session_id` (Session-ID
+  header, session IDs), `cseq`, `from_tag`, `to_tag`, `via_branches` (tags and branches
+  are NOT IDs to extract)
+- Inside `message` content: tracking IDs, session IDs embedded in log text
 - ⚠️ DO NOT just grab random UUIDs from message text — only extract values you can
   confidently classify into one of the above categories
 
@@ -1058,23 +1413,19 @@ class ExhaustiveSearchAgent(BaseAgent):
     async def _process_hits_progressive(
         self,
         hits: list[dict],
-        all_logs: dict[str, list[dict]],
-        seen_hit_ids: set[str],
+        all_logs: HitStore,
         category: str,
         id_extractor_instruction: str,
-    ) -> tuple[dict, int]:
+    ) -> tuple[dict, int, list[dict]]:
         """
-        Process a page of hits: deduplicate, extract IDs.
-        Returns (extracted_ids, new_unique_count).
+        Process a page of hits: deduplicate into the hit store, extract IDs.
+        Returns (extracted_ids, new_unique_count, condensed_entries).
         """
         # Deduplicate
         new_hits = []
         dupes = 0
         for hit in hits:
-            hid = hit.get("_id", "")
-            if hid and hid not in seen_hit_ids:
-                seen_hit_ids.add(hid)
-                all_logs[category].append(hit)
+            if all_logs.add(category, hit):
                 new_hits.append(hit)
             else:
                 dupes += 1
@@ -1082,13 +1433,13 @@ class ExhaustiveSearchAgent(BaseAgent):
         logger.info(
             f"[_process_hits_progressive] category={category}: "
             f"{len(hits)} hits in, {len(new_hits)} new, {dupes} dupes, "
-            f"seen_hit_ids total={len(seen_hit_ids)}, "
-            f"all_logs[{category}] total={len(all_logs[category])}"
+            f"stored hits total={len(all_logs)}, "
+            f"all_logs[{category}] total={all_logs.count(category)}"
         )
 
         if not new_hits:
             logger.info(f"[_process_hits_progressive] All dupes for {category}, skipping")
-            return {}, 0
+            return {}, 0, []
 
         condensed = extract_id_fields_for_llm(new_hits)
         logger.info(
@@ -1102,7 +1453,214 @@ class ExhaustiveSearchAgent(BaseAgent):
             f"extracted_ids={json.dumps({k: len(v) for k, v in extracted.items() if v}, default=str)}"
         )
 
-        return extracted, len(new_hits)
+        return extracted, len(new_hits), condensed
+
+    # ── Helper: pre-flight probe to pick env/regions and time windows ──
+    async def _preflight_probe(
+        self,
+        seeds: list[tuple[str, str]],
+        environments: list[str],
+        regions: list[str],
+        preference: str | None = None,
+    ) -> tuple[list[tuple[str, str]], dict[str, tuple[str, str]], dict]:
+        """
+        Send `size:0` count + date_histogram probes for the seed IDs to every
+        candidate index in parallel, before any hits are downloaded.
+
+        Returns (selected_targets, seed_windows, probe_report):
+        - selected_targets: (env, region) pairs whose indexes hold hits. Falls
+          back to all candidates when the probe is inconclusive.
+        - seed_windows: seed ID → tight (gte, lte) activity window.
+        """
+        candidates = [(env, region) for env in environments for region in regions]
+        report: dict = {
+            "candidates": [f"{env}/{region}" for env, region in candidates],
+            "selected": [f"{env}/{region}" for env, region in candidates],
+            "index_counts": {},
+            "failed_indexes": [],
+            "applied": False,
+        }
+
+        # Negative-cache key of each probed search → (seed value, probe body),
+        # plus which targets each index serves
+        probes: dict[tuple, tuple[str, dict]] = {}
+        index_targets: dict[str, set[tuple[str, str]]] = {}
+        for id_val, id_type in seeds:
+            configs = ID_TYPE_SEARCH_CONFIG.get(id_type, ID_TYPE_SEARCH_CONFIG["unknown"])
+            for config in configs:
+                body = build_probe(build_query(
+                    id_val, config["query_type"], config.get("field"), config["tag_filter"],
+                ))
+                for env, region in candidates:
+                    idx = REGION_INDEX_MAPPING.get(config["service"], {}).get(env, {}).get(region)
+                    if not idx:
+                        continue
+                    index_targets.setdefault(idx, set()).add((env, region))
+                    key = negative_search_key(
+                        idx, config["query_type"], config.get("field"), id_val, config["tag_filter"], None,
+                    )
+                    probes.setdefault(key, (id_val, body))
+
+        keys = list(probes)
+        logger.info(
+            f"[{self.name}] Pre-flight probe: {len(keys)} request(s) "
+            f"across {len(index_targets)} index(es)"
+        )
+        responses = await asyncio.gather(*(
+            probe_opensearch(k[0], probes[k][1], preference=preference) for k in keys
+        ))
+
+        index_counts: dict[str, int] = {}
+        failed_indexes: set[str] = set()
+        seed_buckets: dict[str, dict[int, int]] = {}
+        empty_probes: list[tuple] = []
+        for key, response in zip(keys, responses):
+            idx, id_val = key[0], probes[key][0]
+            if response is None:
+                failed_indexes.add(idx)
+                continue
+            total = response.get("hits", {}).get("total", {})
+            count = total.get("value", 0) if isinstance(total, dict) else (total or 0)
+            index_counts[idx] = index_counts.get(idx, 0) + count
+            if count == 0:
+                empty_probes.append(key)
+            buckets = response.get("aggregations", {}).get("activity", {}).get("buckets", [])
+            merged = seed_buckets.setdefault(id_val, {})
+            for bucket in buckets:
+                merged[bucket["key"]] = merged.get(bucket["key"], 0) + bucket.get("doc_count", 0)
+
+        seed_windows: dict[str, tuple[str, str]] = {}
+        for id_val, buckets in seed_buckets.items():
+            window = shape_time_range(activity_window_from_buckets(buckets))
+            if window:
+                seed_windows[id_val] = window
+        report["seed_windows"] = seed_windows
+        report["index_counts"] = index_counts
+        report["failed_indexes"] = sorted(failed_indexes)
+
+        # Empty over the default 7-day range ⇒ empty within any narrower window
+        for key in empty_probes:
+            negative_cache.record_empty(key)
+
+        # Failed probes keep their targets — a failed probe is not evidence of absence
+        selected = {
+            target
+            for idx in index_targets
+            if index_counts.get(idx) or idx in failed_indexes
+            for target in index_targets[idx]
+        }
+        if len(candidates) < 2 or not selected or selected == set(candidates):
+            logger.info(
+                f"[{self.name}] Pre-flight probe kept targets {report['selected']}"
+            )
+            return candidates, seed_windows, report
+
+        targets = [t for t in candidates if t in selected]
+        report["selected"] = [f"{env}/{region}" for env, region in targets]
+        report["applied"] = True
+        logger.info(
+            f"[{self.name}] Pre-flight probe restricted targets "
+            f"{report['candidates']} → {report['selected']}"
+        )
+        return targets, seed_windows, report
+
+    # ── Helper: bounded user_id/device_id expansion via aggregations ──
+    async def _run_bounded_expansion(
+        self,
+        task: dict,
+        id_time_spans: dict[str, tuple[str, str]],
+        preference: str | None = None,
+    ) -> tuple[dict, int, str | None]:
+        """
+        Discover call/session IDs for a broad ID without downloading its hits.
+
+        Returns (extracted_ids, total_hits, skip_reason). Nothing is extracted
+        when the probe fails or the ID exceeds BOUNDED_EXPANSION_MAX_HITS.
+        """
+        response = await probe_opensearch(
+            task["index"], build_expansion_probe(task["query"]), preference=preference
+        )
+        if response is None:
+            return {}, 0, "probe_failed"
+
+        total = response.get("hits", {}).get("total", {})
+        total_hits = total.get("value", 0) if isinstance(total, dict) else (total or 0)
+        if total_hits > BOUNDED_EXPANSION_MAX_HITS:
+            logger.warning(
+                f"[{self.name}] Bounded expansion skipped for {task['id_val']} on "
+                f"{task['index']}: {total_hits} hits > cap {BOUNDED_EXPANSION_MAX_HITS}"
+            )
+            return {}, total_hits, "hit_cap"
+
+        extracted: dict[str, list[str]] = {}
+        aggregations = response.get("aggregations", {})
+        for field, extract_key in BOUNDED_EXPANSION_AGG_FIELDS.items():
+            for bucket in aggregations.get(field, {}).get("buckets", []):
+                val = str(bucket.get("key", "")).strip()
+                if not val or val in DUMMY_ID_VALUES:
+                    continue
+                extracted.setdefault(extract_key, []).append(val)
+                first = bucket.get("first_seen", {}).get("value_as_string")
+                last = bucket.get("last_seen", {}).get("value_as_string")
+                if first and last:
+                    prev = id_time_spans.get(val)
+                    id_time_spans[val] = (
+                        (min(prev[0], first), max(prev[1], last)) if prev else (first, last)
+                    )
+
+        logger.info(
+            f"[{self.name}] Bounded expansion {task['id_val']} on {task['index']}: "
+            f"{total_hits} hits → "
+            f"{json.dumps({k: len(v) for k, v in extracted.items()}, default=str)}"
+        )
+        return extracted, total_hits, None
+
+    # ── Helper: per-ID time spans from the hits that produced each ID ──
+    @staticmethod
+    def _record_id_time_spans(
+        entries: list[dict],
+        extracted: dict,
+        id_time_spans: dict[str, tuple[str, str]],
+    ) -> None:
+        """
+        Widen each extracted ID's (min, max) @timestamp span using the condensed
+        entries (extract_id_fields_for_llm) that carry it. One pass maps every
+        decoded ID value — structured fields and parsed SIP IDs — to its span;
+        values found only in message text (or normalized by the LLM) fall back
+        to the whole page's span.
+        """
+        value_spans: dict[str, tuple[str, str]] = {}
+        page_span: tuple[str, str] | None = None
+        for entry in entries:
+            ts = entry.get("timestamp")
+            if not ts:
+                continue
+            ts = str(ts)
+            page_span = (min(page_span[0], ts), max(page_span[1], ts)) if page_span else (ts, ts)
+            sip = entry.get("sip") or {}
+            for val in chain(
+                (entry.get(k) for k in NESTED_ID_FIELDS + TOP_LEVEL_ID_FIELDS),
+                (sip.get(k) for k in SIP_RECORD_ID_KEYS),
+            ):
+                if not val:
+                    continue
+                val = str(val).strip()
+                prev = value_spans.get(val)
+                value_spans[val] = (min(prev[0], ts), max(prev[1], ts)) if prev else (ts, ts)
+        if page_span is None:
+            return
+        for values in extracted.values():
+            if isinstance(values, str):
+                values = [values]
+            for val in values:
+                val = str(val).strip()
+                if not val:
+                    continue
+                span = value_spans.get(val, page_span)
+                prev = id_time_spans.get(val)
+                if prev:
+                    span = (min(prev[0], span[0]), max(prev[1], span[1]))
+                id_time_spans[val] = span
 
     # ── Helper: merge extracted IDs into accumulated set ──
     @staticmethod
@@ -1222,13 +1780,17 @@ class ExhaustiveSearchAgent(BaseAgent):
         # ══════════════════════════════════════════════════════════════════════
         all_seen_ids: set[str] = set()
         frontier: deque[tuple[str, str, int]] = deque()
-        all_logs: dict[str, list[dict]] = {"mobius": [], "sse_mse": [], "wxcas": []}
-        seen_hit_ids: set[str] = set()
+        # Retained hits (deduped by _id), columnar, memory-bounded with spill-to-disk
+        all_logs = HitStore(("mobius", "sse_mse", "wxcas"))
         search_history: list[dict] = []
         all_extracted_ids: dict = {}
         max_depth_reached = 0
-        TIME_PADDING_HOURS = 2
         derived_time_range: tuple[str, str] | None = None
+        # Per-ID (min, max) @timestamp of the hits each discovered ID came from
+        id_time_spans: dict[str, tuple[str, str]] = {}
+        # Canonical keys of every search planned so far (whole traversal)
+        planned_search_keys: set[tuple] = set()
+        duplicate_searches_skipped = 0
 
         for ident in identifiers:
             id_val = ident["value"]
@@ -1238,6 +1800,30 @@ class ExhaustiveSearchAgent(BaseAgent):
                 all_seen_ids.add(id_val)
                 logger.info(f"[{self.name}] Seeded frontier: {id_type}={id_val} at depth 0")
 
+        # Pin shard copies per investigation for cache locality across all requests
+        search_preference = f"investigation-{ctx.invocation_id}"
+        # Every OpenSearch request below derives its timeout from this budget
+        deadline = start_investigation_deadline()
+        deadline_exceeded = False
+        unsearched_ids: list[str] = []
+
+        # ── Pre-flight: restrict env/region fan-out and locate the activity window ──
+        active_targets, seed_windows, environment_probe = await self._preflight_probe(
+            [(ident["value"], ident.get("type", "unknown")) for ident in identifiers],
+            environments,
+            regions,
+            preference=search_preference,
+        )
+        if seed_windows:
+            derived_time_range = (
+                min(w[0] for w in seed_windows.values()),
+                max(w[1] for w in seed_windows.values()),
+            )
+            logger.info(
+                f"[{self.name}] Probe-derived time range: "
+                f"{derived_time_range[0]} -> {derived_time_range[1]}"
+            )
+
         logger.info(
             f"[{self.name}] BFS initialized: frontier={len(frontier)}, "
             f"all_seen_ids={all_seen_ids}, derived_time_range={derived_time_range}"
@@ -1254,6 +1840,15 @@ class ExhaustiveSearchAgent(BaseAgent):
                 logger.info(f"[{self.name}] Reached max depth {self.max_depth}, stopping")
                 break
 
+            if deadline.expired:
+                deadline_exceeded = True
+                unsearched_ids = [id_val for id_val, _, _ in frontier]
+                logger.warning(
+                    f"[{self.name}] Investigation budget of {deadline.budget_secs:.0f}s "
+                    f"exhausted at depth {current_depth}; {len(frontier)} ID(s) left unsearched"
+                )
+                break
+
             # ── 3a: Collect all IDs at current depth ──
             current_batch: list[tuple[str, str]] = []
             while frontier and frontier[0][2] == current_depth:
@@ -1274,19 +1869,29 @@ class ExhaustiveSearchAgent(BaseAgent):
             print(f"{'='*60}")
 
             # ── 3b: Build search tasks ──
-            search_tasks: list[tuple[str, dict, str, str]] = []
+            search_tasks: list[dict] = []
 
             for id_val, id_type in current_batch:
                 configs = ID_TYPE_SEARCH_CONFIG.get(
                     id_type, ID_TYPE_SEARCH_CONFIG["unknown"]
                 )
+                # Narrowest known window for this ID: its own hits, then the
+                # probe window for seeds, then the global derived range.
+                time_range = derived_time_range
+                if id_val in id_time_spans:
+                    time_range = pad_time_span(id_time_spans[id_val]) or derived_time_range
+                elif id_val in seed_windows:
+                    time_range = seed_windows[id_val]
+                time_range = shape_time_range(time_range)
+                has_own_window = id_val in id_time_spans or id_val in seed_windows
                 logger.info(
                     f"[{self.name}] ID: {id_type}={id_val} -> "
-                    f"{len(configs)} config(s) from ID_TYPE_SEARCH_CONFIG"
+                    f"{len(configs)} config(s) from ID_TYPE_SEARCH_CONFIG, "
+                    f"time_range={time_range}"
                 )
                 for config in configs:
-                    indexes = resolve_indexes(
-                        config["service"], environments, regions
+                    indexes = resolve_target_indexes(
+                        config["service"], active_targets
                     )
                     logger.info(
                         f"[{self.name}]   Config: service={config['service']}, "
@@ -1299,14 +1904,74 @@ class ExhaustiveSearchAgent(BaseAgent):
                         config["query_type"],
                         config.get("field"),
                         config["tag_filter"],
-                        time_range=derived_time_range,
+                        time_range=time_range,
                     )
                     logger.info(
                         f"[{self.name}]   Built DSL: {json.dumps(query, default=str)}"
                     )
                     category = config["category"]
+                    # Discovered broad IDs (user/device) are aggregated, never
+                    # paginated, and only inside their own time window.
+                    bounded = bool(config.get("bounded")) and current_depth > 0
+                    if bounded and not has_own_window:
+                        logger.info(
+                            f"[{self.name}]   SKIP bounded {id_type}={id_val}: no per-ID time window"
+                        )
+                        search_history.append({
+                            "depth": current_depth,
+                            "id_searched": id_val,
+                            "category": category,
+                            "hits_found": 0,
+                            "skipped": "no_time_window",
+                        })
+                        continue
                     for index in indexes:
-                        search_tasks.append((index, query, id_val, category))
+                        plan_key = normalize_search_key(
+                            index,
+                            config["query_type"],
+                            config.get("field"),
+                            id_val,
+                            config["tag_filter"],
+                            time_range,
+                            mode="bounded" if bounded else "fetch",
+                        )
+                        if plan_key in planned_search_keys:
+                            duplicate_searches_skipped += 1
+                            logger.info(
+                                f"[{self.name}]   SKIP duplicate plan: {index} | {id_type}={id_val}"
+                            )
+                            continue
+                        planned_search_keys.add(plan_key)
+                        negative_key = negative_search_key(
+                            index,
+                            config["query_type"],
+                            config.get("field"),
+                            id_val,
+                            config["tag_filter"],
+                            time_range,
+                        )
+                        if negative_cache.is_known_empty(negative_key):
+                            logger.info(
+                                f"[{self.name}]   SKIP known-empty: {index} | {id_type}={id_val}"
+                            )
+                            search_history.append({
+                                "depth": current_depth,
+                                "index": index,
+                                "id_searched": id_val,
+                                "category": category,
+                                "hits_found": 0,
+                                "skipped": "negative_cache",
+                            })
+                            continue
+                        search_tasks.append({
+                            "index": index,
+                            "query": query,
+                            "id_val": id_val,
+                            "category": category,
+                            "time_range": time_range,
+                            "negative_key": negative_key,
+                            "bounded": bounded,
+                        })
                         logger.info(f"[{self.name}]   Queued: {index} | {id_type}={id_val} -> {category}")
 
             if not search_tasks:
@@ -1320,78 +1985,160 @@ class ExhaustiveSearchAgent(BaseAgent):
 
             depth_new_hits = 0
 
-            for task_idx, (index, query, id_val, category) in enumerate(search_tasks):
-                task_hits = 0
-                logger.info(
-                    f"[{self.name}] Search task {task_idx+1}/{len(search_tasks)}: "
-                    f"index={index}, id_val={id_val}, category={category}"
+            # Bounded expansions are single size:0 requests — run them in parallel
+            bounded_tasks = [t for t in search_tasks if t["bounded"]]
+            search_tasks = [t for t in search_tasks if not t["bounded"]]
+            expansions = await asyncio.gather(*(
+                self._run_bounded_expansion(t, id_time_spans, preference=search_preference)
+                for t in bounded_tasks
+            ))
+            for task, (expanded, total_hits, skip_reason) in zip(bounded_tasks, expansions):
+                all_extracted_ids = self._merge_extracted_ids(all_extracted_ids, expanded)
+                if total_hits == 0 and skip_reason is None:
+                    negative_cache.record_empty(task["negative_key"])
+                entry = {
+                    "depth": current_depth,
+                    "index": task["index"],
+                    "id_searched": task["id_val"],
+                    "category": task["category"],
+                    "hits_found": total_hits,
+                    "time_range": task["time_range"],
+                    "mode": "bounded_aggregation",
+                    "ids_discovered": sum(len(v) for v in expanded.values()),
+                }
+                if skip_reason:
+                    entry["skipped"] = skip_reason
+                search_history.append(entry)
+
+            # Paged searches run concurrently; each cluster's scheduler admits
+            # them at its sustainable rate, so a wide depth queues here instead
+            # of flooding a regional endpoint.
+            task_slots = asyncio.Semaphore(MAX_CONCURRENT_SEARCH_TASKS)
+            # Page extraction calls the LLM; bounded separately from the fetches
+            extraction_slots = asyncio.Semaphore(MAX_CONCURRENT_EXTRACTIONS)
+
+            async def _run_search_task(task_idx: int, task: dict) -> tuple[int, int, dict, dict]:
+                """Stream one search's pages through ID extraction.
+
+                Returns (task_hits, new_unique_hits, extracted_ids, fetch_outcome).
+                """
+                index, query, id_val, category = (
+                    task["index"], task["query"], task["id_val"], task["category"]
                 )
+                task_hits = 0
+                task_new_hits = 0
+                task_extracted: dict = {}
                 page_count = 0
 
-                # Prefetch pages: fetch page N+1 from OpenSearch while
-                # the LLM processes page N.  The fetch only needs the
-                # sort cursor from the previous *fetch*, not from LLM
-                # processing, so it can safely run ahead by one page.
-                prefetch_queue: asyncio.Queue[list[dict] | None] = asyncio.Queue(maxsize=1)
-
-                async def _prefetch_pages(idx: str, q: dict, out: asyncio.Queue) -> None:
-                    async for page in search_opensearch_pages(idx, q):
-                        await out.put(page)
-                    await out.put(None)
-
-                prefetch_task = asyncio.create_task(_prefetch_pages(index, query, prefetch_queue))
-
-                while True:
-                    page_hits = await prefetch_queue.get()
-                    if page_hits is None:
-                        break
-
-                    page_count += 1
-                    task_hits += len(page_hits)
+                async with task_slots:
                     logger.info(
-                        f"[{self.name}]   Task {task_idx+1} page {page_count}: "
-                        f"{len(page_hits)} hits (task cumulative: {task_hits})"
+                        f"[{self.name}] Search task {task_idx+1}/{len(search_tasks)}: "
+                        f"index={index}, id_val={id_val}, category={category}"
                     )
 
-                    # Process this page while the next page is being fetched
-                    page_extracted, new_count = await self._process_hits_progressive(
-                        hits=page_hits,
-                        all_logs=all_logs,
-                        seen_hit_ids=seen_hit_ids,
-                        category=category,
-                        id_extractor_instruction=self.id_extractor.instruction,
+                    # Prefetch pages: fetch page N+1 from OpenSearch while
+                    # the LLM processes page N.  The fetch only needs the
+                    # sort cursor from the previous *fetch*, not from LLM
+                    # processing, so it can safely run ahead by one page.
+                    prefetch_queue: asyncio.Queue[list[dict] | None] = asyncio.Queue(maxsize=1)
+                    fetch_outcome: dict = {}
+
+                    async def _prefetch_pages(
+                        idx: str, q: dict, out: asyncio.Queue, result: dict
+                    ) -> None:
+                        async for page in search_opensearch_pages(
+                            idx, q, outcome=result, preference=search_preference
+                        ):
+                            await out.put(page)
+                        await out.put(None)
+
+                    prefetch_task = asyncio.create_task(
+                        _prefetch_pages(index, query, prefetch_queue, fetch_outcome)
                     )
-                    depth_new_hits += new_count
 
-                    logger.info(
-                        f"[{self.name}]   After processing: new_unique={new_count}, "
-                        f"depth_new_hits={depth_new_hits}, "
-                        f"extracted_ids={json.dumps(page_extracted, default=str)}"
-                    )
-
-                    # Merge extracted IDs
-                    all_extracted_ids = self._merge_extracted_ids(all_extracted_ids, page_extracted)
-
-                    logger.info(
-                        f"[{self.name}]   Cumulative extracted IDs: "
-                        f"{json.dumps({k: len(v) for k, v in all_extracted_ids.items() if v}, default=str)}"
-                    )
+                    try:
+                        while True:
+                            page_hits = await prefetch_queue.get()
+                            if page_hits is None:
+                                break
+
+                            page_count += 1
+                            task_hits += len(page_hits)
+                            logger.info(
+                                f"[{self.name}]   Task {task_idx+1} page {page_count}: "
+                                f"{len(page_hits)} hits (task cumulative: {task_hits})"
+                            )
+
+                            # Process this page while the next page is being fetched
+                            async with extraction_slots:
+                                page_extracted, new_count, condensed = await self._process_hits_progressive(
+                                    hits=page_hits,
+                                    all_logs=all_logs,
+                                    category=category,
+                                    id_extractor_instruction=self.id_extractor.instruction,
+                                )
+                            task_new_hits += new_count
+                            self._record_id_time_spans(condensed, page_extracted, id_time_spans)
+                            task_extracted = self._merge_extracted_ids(task_extracted, page_extracted)
+
+                            logger.info(
+                                f"[{self.name}]   Task {task_idx+1} after processing: "
+                                f"new_unique={new_count}, "
+                                f"extracted_ids={json.dumps(page_extracted, default=str)}"
+                            )
+
+                        await prefetch_task
+                    finally:
+                        # The page consumer raised or was cancelled: don't leave
+                        # the fetcher running, blocked on the full queue
+                        if not prefetch_task.done():
+                            prefetch_task.cancel()
+                            try:
+                                await prefetch_task
+                            except asyncio.CancelledError:
+                                pass
 
                 logger.info(
                     f"[{self.name}] Task {task_idx+1} complete: index={index}, "
                     f"total_hits={task_hits}, pages={page_count}"
                 )
+                return task_hits, task_new_hits, task_extracted, fetch_outcome
+
+            task_results = await asyncio.gather(*(
+                _run_search_task(task_idx, task)
+                for task_idx, task in enumerate(search_tasks)
+            ))
+
+            for task, (task_hits, task_new_hits, task_extracted, fetch_outcome) in zip(
+                search_tasks, task_results
+            ):
+                depth_new_hits += task_new_hits
+                all_extracted_ids = self._merge_extracted_ids(all_extracted_ids, task_extracted)
 
-                search_history.append({
+                history_entry = {
                     "depth": current_depth,
-                    "index": index,
-                    "id_searched": id_val,
-                    "category": category,
+                    "index": task["index"],
+                    "id_searched": task["id_val"],
+                    "category": task["category"],
                     "hits_found": task_hits,
-                })
+                    "time_range": task["time_range"],
+                }
+                if fetch_outcome.get("failed"):
+                    history_entry["error"] = fetch_outcome.get("error")
+                search_history.append(history_entry)
 
                 if task_hits > 0:
-                    print(f"  {index}: {task_hits} hit(s) for {id_val} -> {category}")
+                    print(
+                        f"  {task['index']}: {task_hits} hit(s) for {task['id_val']} "
+                        f"-> {task['category']}"
+                    )
+                elif not fetch_outcome.get("failed"):
+                    negative_cache.record_empty(task["negative_key"])
+
+            logger.info(
+                f"[{self.name}]   Cumulative extracted IDs: "
+                f"{json.dumps({k: len(v) for k, v in all_extracted_ids.items() if v}, default=str)}"
+            )
 
             _search_elapsed = _time.monotonic() - _search_start
             logger.info(
@@ -1399,45 +2146,32 @@ class ExhaustiveSearchAgent(BaseAgent):
                 f"in {_search_elapsed:.2f}s"
             )
 
-            all_logs_counts = {k: len(v) for k, v in all_logs.items()}
+            all_logs_counts = all_logs.counts()
             logger.info(
                 f"[{self.name}] Depth {current_depth} search phase done: "
                 f"depth_new_hits={depth_new_hits}, derived_time_range={derived_time_range}, "
                 f"all_logs counts={all_logs_counts}, "
-                f"seen_hit_ids={len(seen_hit_ids)}"
+                f"stored hits={len(all_logs)}"
             )
 
-            # ── Derive time range from first results ──
-            if derived_time_range is None and depth_new_hits > 0:
-                from datetime import datetime, timedelta, timezone
-                timestamps: list[str] = []
-                for cat_hits in all_logs.values():
-                    for hit in cat_hits:
-                        ts = hit.get("_source", {}).get("@timestamp")
-                        if ts:
-                            timestamps.append(str(ts))
-                if timestamps:
-                    timestamps.sort()
-                    try:
-                        t_min = datetime.fromisoformat(timestamps[0].replace("Z", "+00:00"))
-                        t_max = datetime.fromisoformat(timestamps[-1].replace("Z", "+00:00"))
-                        pad = timedelta(hours=TIME_PADDING_HOURS)
-                        derived_time_range = (
-                            (t_min - pad).isoformat(),
-                            (t_max + pad).isoformat(),
-                        )
-                        logger.info(
-                            f"[{self.name}] Derived time range: "
-                            f"{derived_time_range[0]} -> {derived_time_range[1]}"
-                        )
-                    except (ValueError, IndexError) as e:
-                        logger.warning(f"[{self.name}] Failed to parse timestamps: {e}")
+            # ── Fallback: derive time range from first results if the probe couldn't ──
+            if derived_time_range is None and depth_new_hits > 0 and all_logs.time_span:
+                derived_time_range = pad_time_span(all_logs.time_span)
+                if derived_time_range:
+                    logger.info(
+                        f"[{self.name}] Derived time range: "
+                        f"{derived_time_range[0]} -> {derived_time_range[1]}"
+                    )
 
             # ── Store latest state ──
             ctx.session.state["extracted_ids"] = json.dumps(all_extracted_ids, default=str)
             ctx.session.state["latest_search_results"] = json.dumps(
                 extract_id_fields_for_llm(
-                    [h for cat in all_logs.values() for h in cat[-100:]]  # last 100 per cat
+                    [
+                        {"_source": source}
+                        for category in all_logs.categories
+                        for source in all_logs.tail(category, 100)  # last 100 per cat
+                    ]
                 ),
                 default=str,
             )
@@ -1473,49 +2207,68 @@ class ExhaustiveSearchAgent(BaseAgent):
         # ══════════════════════════════════════════════════════════════════════
         logger.info(f"[{self.name}] Step 4: Storing final results in session state")
 
-        ctx.session.state["all_logs"] = json.dumps(
-            {
-                category: [hit.get("_source", {}) for hit in hits]
-                for category, hits in all_logs.items()
-            },
-            default=str,
+        # Single canonical copy of the raw logs, kept in the artifact store.
+        # Per-category views (mobius_logs etc.) are derived on demand, see log_views.py.
+        ctx.session.state["all_logs"] = artifact_store.offload_chunks(all_logs.render_all_chunks())
+        log_counts = all_logs.counts()
+
+        # Searches whose remaining pages were dropped when the budget ran out
+        searches_cut_short = sum(
+            1 for entry in search_history
+            if str(entry.get("error") or "").startswith(DeadlineExceeded.__name__)
         )
+        truncated = None
+        if deadline_exceeded or searches_cut_short:
+            deadline_exceeded = True
+            truncated = {
+                "reason": f"investigation budget of {deadline.budget_secs:.0f}s exhausted",
+                "unsearched_ids": unsearched_ids[:MAX_UNSEARCHED_IDS_REPORTED],
+                "unsearched_id_count": len(unsearched_ids),
+                "searches_cut_short": searches_cut_short,
+                "hint": "results are partial; raise OPENSEARCH_INVESTIGATION_BUDGET_SECS to search further",
+            }
+            logger.warning(f"[{self.name}] Search truncated: {json.dumps(truncated)}")
 
         ctx.session.state["search_summary"] = json.dumps(
             {
-                "total_mobius_logs": len(all_logs["mobius"]),
-                "total_sse_mse_logs": len(all_logs["sse_mse"]),
-                "total_wxcas_logs": len(all_logs["wxcas"]),
+                "total_mobius_logs": log_counts["mobius"],
+                "total_sse_mse_logs": log_counts["sse_mse"],
+                "total_wxcas_logs": log_counts["wxcas"],
                 "max_depth_reached": max_depth_reached,
                 "total_ids_searched": len(all_seen_ids),
                 "search_history": search_history,
+                "environment_probe": environment_probe,
+                "deadline_exceeded": deadline_exceeded,
+                "truncated": truncated,
+                "cluster_health": cluster_registry.snapshot(
+                    list(OPENSEARCH_INDEX_URL_MAP.values())
+                ),
+                "response_cache": response_cache.stats(),
+                "hit_memory": all_logs.stats(),
+                "service_indicators": dict(all_logs.service_indicators),
+                "duplicate_searches_skipped": duplicate_searches_skipped,
+                "negative_cache_skips": sum(
+                    1 for entry in search_history if entry.get("skipped") == "negative_cache"
+                ),
             },
             default=str,
         )
 
-        ctx.session.state["mobius_logs"] = json.dumps(
-            [hit.get("_source", {}) for hit in all_logs["mobius"]], default=str
-        )
-        ctx.session.state["sse_mse_logs"] = json.dumps(
-            [hit.get("_source", {}) for hit in all_logs["sse_mse"]], default=str
-        )
-        ctx.session.state["wxcas_logs"] = json.dumps(
-            [hit.get("_source", {}) for hit in all_logs["wxcas"]], default=str
-        )
+        all_logs.close()
 
         logger.info(
             f"[{self.name}] == Search complete ==\n"
-            f"  Mobius:    {len(all_logs['mobius'])} logs\n"
-            f"  SSE/MSE:  {len(all_logs['sse_mse'])} logs\n"
-            f"  WxCAS:    {len(all_logs['wxcas'])} logs\n"
+            f"  Mobius:    {log_counts['mobius']} logs\n"
+            f"  SSE/MSE:  {log_counts['sse_mse']} logs\n"
+            f"  WxCAS:    {log_counts['wxcas']} logs\n"
             f"  IDs searched: {len(all_seen_ids)}\n"
             f"  Max depth:    {max_depth_reached}"
         )
         print(f"\n{'='*60}")
         print(f"  Search complete!")
-        print(f"  Mobius:      {len(all_logs['mobius'])} logs")
-        print(f"  SSE/MSE:    {len(all_logs['sse_mse'])} logs")
-        print(f"  WxCAS:      {len(all_logs['wxcas'])} logs")
+        print(f"  Mobius:      {log_counts['mobius']} logs")
+        print(f"  SSE/MSE:    {log_counts['sse_mse']} logs")
+        print(f"  WxCAS:      {log_counts['wxcas']} logs")
         print(f"  IDs searched: {len(all_seen_ids)}")
         print(f"  Max depth:    {max_depth_reached}")
         print(f"  All IDs: {all_seen_ids}")
@@ -0,0 +1,147 @@
+"""
+Memory-bounded decoding and retention of OpenSearch hits for search_agent_v2.
+
+Two parts:
+1. Decoding — responses are parsed with orjson when it is installed (falling
+   back to the stdlib), and page requests ask the cluster for only the fields
+   the BFS uses (`HIT_FILTER_PATH`), so `_score`, `_index`, shard info etc.
+   are never decoded into Python objects.
+2. Retention — `PayloadSpool` keeps each accepted hit's `_source` as compact
+   serialized bytes instead of a dict tree, and spills them to a temporary
+   file once the investigation's in-memory bytes exceed
+   `INVESTIGATION_MEMORY_CEILING_BYTES`. `HitStore` (hit_store.py) builds
+   on it.
+"""
+
+import json
+import logging
+import os
+import tempfile
+from array import array
+from typing import IO, Any, Optional
+
+from opensearchpy.serializer import JSONSerializer
+
+try:
+    import orjson
+except ImportError:  # optional speedup
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# Tuning
+# ═══════════════════════════════════════════════════════════════════════════════
+
+# In-memory budget for retained hits per investigation before spilling to disk
+INVESTIGATION_MEMORY_CEILING_BYTES = int(
+    os.getenv("SEARCH_MEMORY_CEILING_MB", "256")
+) * 1024 * 1024
+
+# Server-side projection for page fetches: everything the BFS reads from a page
+HIT_FILTER_PATH = "hits.total,hits.hits._id,hits.hits._source,hits.hits.sort"
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# Decoding
+# ═══════════════════════════════════════════════════════════════════════════════
+
+
+def dumps_bytes(obj: Any) -> bytes:
+    """Compact JSON bytes; non-JSON values (datetimes etc.) become strings."""
+    if orjson is not None:
+        return orjson.dumps(obj, default=str)
+    return json.dumps(obj, default=str, separators=(",", ":")).encode()
+
+
+def loads(data: bytes | str) -> Any:
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+class FastJSONSerializer(JSONSerializer):
+    """opensearch-py serializer that decodes responses with orjson when available."""
+
+    def loads(self, s):
+        if orjson is None:
+            return super().loads(s)
+        try:
+            return orjson.loads(s)
+        except orjson.JSONDecodeError:
+            # Let the stock serializer raise opensearch-py's SerializationError
+            return super().loads(s)
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# Retention
+# ═══════════════════════════════════════════════════════════════════════════════
+
+
+class PayloadSpool:
+    """
+    Row-addressed store of serialized payloads with a memory ceiling.
+
+    Rows are appended in order and never change. Once the in-memory bytes
+    exceed the ceiling, every in-memory payload is written to a temporary
+    file and later read back by offset.
+    """
+
+    def __init__(self, ceiling_bytes: int = INVESTIGATION_MEMORY_CEILING_BYTES):
+        self._ceiling = ceiling_bytes
+        self._memory: dict[int, bytes] = {}
+        # Per row: file offset (-1 while in memory) and payload length
+        self._offsets = array("q")
+        self._lengths = array("I")
+        self._file: Optional[IO[bytes]] = None
+        self.memory_bytes = 0
+        self.spilled_bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._offsets)
+
+    def append(self, payload: bytes) -> int:
+        row = len(self._offsets)
+        self._memory[row] = payload
+        self._offsets.append(-1)
+        self._lengths.append(len(payload))
+        self.memory_bytes += len(payload)
+        if self.memory_bytes > self._ceiling:
+            self.spill()
+        return row
+
+    def get(self, row: int) -> bytes:
+        payload = self._memory.get(row)
+        if payload is not None:
+            return payload
+        self._file.seek(self._offsets[row])
+        return self._file.read(self._lengths[row])
+
+    def spill(self) -> None:
+        if not self._memory:
+            return
+        if self._file is None:
+            self._file = tempfile.TemporaryFile(prefix="search_agent_v2_spool_")
+        self._file.seek(0, os.SEEK_END)
+        for row in sorted(self._memory):
+            self._offsets[row] = self._file.tell()
+            self._file.write(self._memory[row])
+        logger.info(
+            f"[PayloadSpool] Memory ceiling {self._ceiling} bytes exceeded; spilled "
+            f"{self.memory_bytes} bytes ({len(self._memory)} rows) to disk"
+        )
+        self.spilled_bytes += self.memory_bytes
+        self.memory_bytes = 0
+        self._memory.clear()
+
+    def stats(self) -> dict:
+        return {
+            "memory_bytes": self.memory_bytes,
+            "spilled_bytes": self.spilled_bytes,
+            "ceiling_bytes": self._ceiling,
+        }
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
@@ -0,0 +1,177 @@
+"""
+Columnar store of the hits an investigation retains.
+
+Replaces the former `all_logs: dict[str, list[dict]]` of full hit dicts.
+Each accepted hit becomes one row:
+- `_id` → row map, used for dedup (replaces the separate seen-IDs set)
+- category: dictionary-encoded byte column
+- @timestamp: float column (epoch seconds, NaN when missing), for the
+  observed time span
+- `_source`: one compact serialized payload in a `PayloadSpool`, which
+  enforces the per-investigation memory ceiling with spill-to-disk
+
+State JSON is streamed straight from the serialized payloads into the
+artifact store, never assembled in memory.
+"""
+
+import json
+import math
+from array import array
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Any, Iterator, Optional
+
+from search_agent_v2.hit_spool import PayloadSpool, dumps_bytes, loads
+from service_indicators import find_service_indicators
+
+
+def _parse_epoch(ts: Any) -> float:
+    if not ts:
+        return math.nan
+    try:
+        return datetime.fromisoformat(str(ts).replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        return math.nan
+
+
+class _Dictionary:
+    """Value ↔ integer code mapping for a dictionary-encoded column."""
+
+    def __init__(self):
+        self._codes: dict[Any, int] = {}
+        self.values: list[Any] = []
+
+    def code(self, value: Any) -> Optional[int]:
+        return self._codes.get(value)
+
+    def encode(self, value: Any) -> int:
+        code = self._codes.get(value)
+        if code is None:
+            code = self._codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+
+class HitStore:
+    """
+    Append-only, deduplicated, columnar hit store for one investigation.
+
+    Not thread-safe; the BFS mutates it from a single event loop.
+    """
+
+    def __init__(self, categories: tuple[str, ...] = ("mobius", "sse_mse", "wxcas")):
+        self._row_by_id: dict[str, int] = {}
+        self._categories = _Dictionary()
+        for category in categories:
+            self._categories.encode(category)
+        self._category_col = array("B")
+        self._category_counts = dict.fromkeys(categories, 0)
+        self._timestamp_col = array("d")
+        self._payloads = PayloadSpool()
+        # serviceIndicator values seen across all rows (drives analysis routing)
+        self.service_indicators: Counter[str] = Counter()
+
+    # ── Append / dedup ──
+
+    def __len__(self) -> int:
+        return len(self._category_col)
+
+    def __contains__(self, hit_id: str) -> bool:
+        return hit_id in self._row_by_id
+
+    def add(self, category: str, hit: dict) -> bool:
+        """Append a hit unless its `_id` is missing or already stored. Returns True if added."""
+        hit_id = hit.get("_id")
+        if not hit_id or hit_id in self._row_by_id:
+            return False
+        source = hit.get("_source") or {}
+        row = len(self._category_col)
+        self._row_by_id[hit_id] = row
+        self._category_col.append(self._categories.encode(category))
+        self._category_counts[category] = self._category_counts.get(category, 0) + 1
+
+        self._timestamp_col.append(_parse_epoch(source.get("@timestamp")))
+
+        self.service_indicators.update(find_service_indicators(source))
+
+        self._payloads.append(dumps_bytes(source))
+        return True
+
+    # ── Views ──
+
+    @property
+    def categories(self) -> list[str]:
+        return list(self._categories.values)
+
+    def counts(self) -> dict[str, int]:
+        return dict(self._category_counts)
+
+    def count(self, category: str) -> int:
+        return self._category_counts.get(category, 0)
+
+    def rows(self, category: Optional[str] = None) -> list[int]:
+        """Row numbers in arrival order, optionally for one category."""
+        if category is None:
+            return list(range(len(self)))
+        code = self._categories.code(category)
+        return [row for row, c in enumerate(self._category_col) if c == code]
+
+    def source(self, row: int) -> dict:
+        return loads(self._payloads.get(row))
+
+    def tail(self, category: str, n: int) -> list[dict]:
+        """The last `n` sources of a category in arrival order."""
+        if n <= 0:
+            return []
+        return [self.source(row) for row in self.rows(category)[-n:]]
+
+    @property
+    def time_span(self) -> Optional[tuple[str, str]]:
+        """(min, max) @timestamp across all rows, as UTC ISO strings."""
+        stamped = [ts for ts in self._timestamp_col if not math.isnan(ts)]
+        if not stamped:
+            return None
+        return (
+            datetime.fromtimestamp(min(stamped), timezone.utc).isoformat(),
+            datetime.fromtimestamp(max(stamped), timezone.utc).isoformat(),
+        )
+
+    # ── Rendering ──
+
+    def render_chunks(self, category: str) -> Iterator[bytes]:
+        """A category's JSON array of sources in arrival order, as UTF-8 chunks."""
+        yield b"["
+        for i, row in enumerate(self.rows(category)):
+            if i:
+                yield b","
+            yield self._payloads.get(row)
+        yield b"]"
+
+    def render_all_chunks(self) -> Iterator[bytes]:
+        """
+        JSON object {category: [sources...]} as UTF-8 chunks, read from the
+        spool one payload at a time (see `ArtifactStore.offload_chunks`).
+        """
+        yield b"{"
+        for i, category in enumerate(self.categories):
+            if i:
+                yield b","
+            yield json.dumps(category).encode() + b":"
+            yield from self.render_chunks(category)
+        yield b"}"
+
+    def render(self, category: str) -> str:
+        """JSON array of a category's sources in arrival order."""
+        return b"".join(self.render_chunks(category)).decode()
+
+    def render_all(self) -> str:
+        return b"".join(self.render_all_chunks()).decode()
+
+    def stats(self) -> dict:
+        return {
+            "rows": len(self),
+            **self._payloads.stats(),
+        }
+
+    def close(self) -> None:
+        self._payloads.close()
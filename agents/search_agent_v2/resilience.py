@@ -0,0 +1,577 @@
+"""
+Per-cluster resilience for OpenSearch requests issued by search_agent_v2.
+
+Keyed by cluster URL (the values of OPENSEARCH_INDEX_URL_MAP), this module
+provides:
+1. Per-request deadlines derived from the investigation budget, so a hung
+   regional endpoint can no longer block a BFS task indefinitely
+2. Jittered exponential-backoff retries for retryable errors only
+   (connection failures, timeouts, 429/502/503/504)
+3. A circuit breaker per cluster that fails fast while the cluster is unhealthy
+4. Per-cluster health counters, reported in search_summary
+5. Opt-in hedging of first-page requests against the cluster's observed p95
+6. A per-cluster scheduler (max in-flight + token bucket) shared by every
+   investigation in the process, so a wide BFS depth queues behind the
+   cluster's sustainable rate instead of flooding it
+"""
+
+import asyncio
+import logging
+import os
+import random
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+from typing import Callable, Optional, TypeVar
+
+from opensearchpy.exceptions import ConnectionError as OpenSearchConnectionError
+from opensearchpy.exceptions import TransportError
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# Tuning
+# ═══════════════════════════════════════════════════════════════════════════════
+
+# Default wall-clock budget for one investigation's OpenSearch traffic;
+# OPENSEARCH_INVESTIGATION_BUDGET_SECS (agents/.env) overrides it
+INVESTIGATION_BUDGET_SECS = 300
+# Upper bound for a single request, even when the budget has more left
+REQUEST_TIMEOUT_SECS = 30
+# Don't start a request with less than this much budget remaining
+MIN_REQUEST_TIMEOUT_SECS = 1
+
+RETRY_MAX_ATTEMPTS = 3
+RETRY_BASE_DELAY_SECS = 0.5
+RETRY_MAX_DELAY_SECS = 4
+RETRYABLE_STATUS_CODES = frozenset({429, 502, 503, 504})
+
+# Consecutive failures that open the breaker, and how long it stays open
+BREAKER_FAILURE_THRESHOLD = 5
+BREAKER_OPEN_SECS = 30
+
+# Hedged first-page requests (opt-in via OPENSEARCH_HEDGE_FIRST_PAGE): if the
+# first page hasn't returned within the cluster's observed p95, fire one
+# duplicate and take whichever wins.
+# Hedges may add at most this fraction of extra requests per cluster
+HEDGE_BUDGET_FRACTION = 0.1
+# First-page latency samples kept per cluster, and the minimum before p95 is trusted
+LATENCY_WINDOW = 200
+LATENCY_MIN_SAMPLES = 20
+
+# Per-cluster scheduling, process-wide across investigations
+CLUSTER_MAX_IN_FLIGHT = 8
+CLUSTER_RATE_PER_SEC = 20.0
+CLUSTER_BURST = 20
+# On 429 the rate is halved (not below the floor); each success adds back a bit
+CLUSTER_MIN_RATE_PER_SEC = 1.0
+CLUSTER_RATE_RECOVERY_PER_SUCCESS = 0.5
+# Poll interval while waiting for an in-flight slot
+SCHEDULER_POLL_SECS = 0.05
+
+
+class DeadlineExceeded(Exception):
+    """The investigation budget is exhausted; no further requests are issued."""
+
+
+class CircuitOpenError(Exception):
+    """The cluster's circuit breaker is open; the request was not attempted."""
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# Deadlines
+# ═══════════════════════════════════════════════════════════════════════════════
+
+
+class Deadline:
+    """Monotonic deadline for one investigation."""
+
+    def __init__(self, budget_secs: float = INVESTIGATION_BUDGET_SECS):
+        self.budget_secs = budget_secs
+        self._expires_at = time.monotonic() + budget_secs
+
+    def remaining(self) -> float:
+        return max(0.0, self._expires_at - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def request_timeout(self) -> float:
+        """Per-request timeout: the remaining budget, capped at REQUEST_TIMEOUT_SECS."""
+        remaining = self.remaining()
+        if remaining < MIN_REQUEST_TIMEOUT_SECS:
+            raise DeadlineExceeded(
+                f"investigation budget of {self.budget_secs:.0f}s exhausted"
+            )
+        return min(remaining, REQUEST_TIMEOUT_SECS)
+
+
+# One deadline per investigation — set by the agent, inherited by its tasks/threads
+investigation_deadline_var: ContextVar[Optional[Deadline]] = ContextVar(
+    "investigation_deadline", default=None
+)
+
+
+def investigation_budget_secs() -> float:
+    """
+    The configured investigation budget. Read per investigation rather than at
+    import, so the value from agents/.env applies whatever the import order.
+    """
+    raw = os.getenv("OPENSEARCH_INVESTIGATION_BUDGET_SECS", "").strip()
+    if not raw:
+        return INVESTIGATION_BUDGET_SECS
+    try:
+        budget = float(raw)
+    except ValueError:
+        budget = 0.0
+    if budget <= 0:
+        logger.warning(
+            f"[resilience] Ignoring OPENSEARCH_INVESTIGATION_BUDGET_SECS={raw!r}; "
+            f"using {INVESTIGATION_BUDGET_SECS}s"
+        )
+        return INVESTIGATION_BUDGET_SECS
+    return budget
+
+
+def hedge_first_page_enabled() -> bool:
+    """OPENSEARCH_HEDGE_FIRST_PAGE, read per call for the same reason as the budget."""
+    return os.getenv("OPENSEARCH_HEDGE_FIRST_PAGE", "").strip().lower() in ("1", "true", "yes")
+
+
+def start_investigation_deadline(budget_secs: Optional[float] = None) -> Deadline:
+    """Start a new deadline (default: the configured budget) for the current async context."""
+    deadline = Deadline(investigation_budget_secs() if budget_secs is None else budget_secs)
+    investigation_deadline_var.set(deadline)
+    return deadline
+
+
+def current_deadline() -> Deadline:
+    """The current investigation's deadline, or a fresh default one outside an investigation."""
+    return investigation_deadline_var.get() or Deadline()
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# Scheduling per cluster
+# ═══════════════════════════════════════════════════════════════════════════════
+
+
+class ClusterScheduler:
+    """
+    Max in-flight limit plus token bucket for a single cluster URL.
+
+    Thread-safe and event-loop agnostic: waiters sleep until a token refills or
+    a slot frees up, so the backpressure propagates into the awaiting BFS task
+    rather than into retries. The refill rate adapts AIMD-style to throttling.
+    """
+
+    def __init__(
+        self,
+        max_in_flight: int = CLUSTER_MAX_IN_FLIGHT,
+        rate_per_sec: float = CLUSTER_RATE_PER_SEC,
+        burst: int = CLUSTER_BURST,
+    ):
+        self._lock = threading.Lock()
+        self._max_in_flight = max_in_flight
+        self._max_rate = rate_per_sec
+        self._rate = rate_per_sec
+        self._burst = burst
+        self._tokens = float(burst)
+        self._refilled_at = time.monotonic()
+        self.in_flight = 0
+        self.throttled = 0
+        self.queued_secs = 0.0
+
+    def _refill_locked(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self._burst, self._tokens + (now - self._refilled_at) * self._rate)
+        self._refilled_at = now
+
+    def _try_acquire(self) -> float:
+        """Take a slot and a token, returning 0; otherwise return how long to wait."""
+        with self._lock:
+            self._refill_locked()
+            if self.in_flight >= self._max_in_flight:
+                return SCHEDULER_POLL_SECS
+            if self._tokens < 1:
+                return (1 - self._tokens) / self._rate
+            self._tokens -= 1
+            self.in_flight += 1
+            return 0.0
+
+    async def acquire(self, deadline: "Deadline") -> None:
+        """Wait for a slot and a token, or raise DeadlineExceeded if the budget runs out first."""
+        started = time.monotonic()
+        while True:
+            wait = self._try_acquire()
+            if wait == 0:
+                break
+            if deadline.remaining() - wait < MIN_REQUEST_TIMEOUT_SECS:
+                raise DeadlineExceeded("investigation budget exhausted while queued")
+            await asyncio.sleep(wait)
+        waited = time.monotonic() - started
+        if waited:
+            with self._lock:
+                self.queued_secs += waited
+
+    def release(self, throttled: bool = False) -> None:
+        with self._lock:
+            self.in_flight -= 1
+            if throttled:
+                self.throttled += 1
+                self._rate = max(CLUSTER_MIN_RATE_PER_SEC, self._rate / 2)
+                self._tokens = 0.0
+                logger.warning(f"[ClusterScheduler] Throttled; rate reduced to {self._rate:.1f}/s")
+            else:
+                self._rate = min(self._max_rate, self._rate + CLUSTER_RATE_RECOVERY_PER_SUCCESS)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "in_flight": self.in_flight,
+                "rate_per_sec": round(self._rate, 2),
+                "throttled": self.throttled,
+                "queued_secs": round(self.queued_secs, 2),
+            }
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# Circuit breaker + health per cluster
+# ═══════════════════════════════════════════════════════════════════════════════
+
+
+class ClusterState:
+    """Circuit breaker and health counters for a single cluster URL. Thread-safe."""
+
+    def __init__(self, url: str):
+        self.url = url
+        self._lock = threading.Lock()
+        self._consecutive_failures = 0
+        self._opened_at: Optional[float] = None
+        self._half_open_trial = False
+        self.requests = 0
+        self.failures = 0
+        self.retries = 0
+        self.rejected = 0
+        self.last_error: Optional[str] = None
+        self._first_page_latencies: deque[float] = deque(maxlen=LATENCY_WINDOW)
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.scheduler = ClusterScheduler()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state_locked()
+
+    def _state_locked(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at >= BREAKER_OPEN_SECS:
+            return "half_open"
+        return "open"
+
+    def allow_request(self) -> tuple[bool, bool]:
+        """
+        (allowed, is_trial). Closed → allow. Open → reject. Half-open → allow a
+        single trial request, which must end in record_success, record_failure
+        or abandon_trial.
+        """
+        with self._lock:
+            state = self._state_locked()
+            if state == "closed":
+                return True, False
+            if state == "half_open" and not self._half_open_trial:
+                self._half_open_trial = True
+                return True, True
+            self.rejected += 1
+            return False, False
+
+    def abandon_trial(self) -> None:
+        """The half-open trial ended without an outcome (cancelled); let the next request try."""
+        with self._lock:
+            self._half_open_trial = False
+
+    def record_success(self, trial: bool = False) -> None:
+        """
+        Count a successful request. Only the half-open trial closes an open
+        breaker: a success from a request admitted before the breaker opened
+        says nothing about the cluster now.
+        """
+        with self._lock:
+            self.requests += 1
+            if trial:
+                self._half_open_trial = False
+                self._opened_at = None
+                self._consecutive_failures = 0
+            elif self._opened_at is None:
+                self._consecutive_failures = 0
+
+    def record_failure(self, error: BaseException, unhealthy: bool = True, trial: bool = False) -> None:
+        """
+        Count a failed request. Only `unhealthy` failures (connection errors,
+        timeouts, throttling) count towards opening the breaker — a 400 for a
+        bad query says nothing about the cluster's health, so a trial ending
+        in one closes it. While the breaker is open, only the trial's outcome
+        moves it; failures of requests admitted before it opened are counted
+        but leave it as is.
+        """
+        with self._lock:
+            self.requests += 1
+            self.failures += 1
+            self.last_error = f"{type(error).__name__}: {error}"[:300]
+            if trial:
+                self._half_open_trial = False
+                if unhealthy:
+                    logger.warning(f"[ClusterState] Circuit re-OPENED for {self.url}: trial request failed")
+                    self._opened_at = time.monotonic()
+                else:
+                    self._opened_at = None
+                    self._consecutive_failures = 0
+                return
+            if self._opened_at is not None or not unhealthy:
+                return
+            self._consecutive_failures += 1
+            if self._consecutive_failures >= BREAKER_FAILURE_THRESHOLD:
+                logger.warning(
+                    f"[ClusterState] Circuit OPEN for {self.url} after "
+                    f"{self._consecutive_failures} consecutive failure(s)"
+                )
+                self._opened_at = time.monotonic()
+
+    def record_retry(self) -> None:
+        with self._lock:
+            self.retries += 1
+
+    def record_first_page_latency(self, latency_secs: float) -> None:
+        """Sample a successful first-page fetch (retries included) for the hedge threshold."""
+        with self._lock:
+            self._first_page_latencies.append(latency_secs)
+
+    def latency_p95(self) -> Optional[float]:
+        """p95 of recent first-page latencies, or None until enough samples."""
+        with self._lock:
+            if len(self._first_page_latencies) < LATENCY_MIN_SAMPLES:
+                return None
+            ordered = sorted(self._first_page_latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+
+    def try_acquire_hedge(self) -> bool:
+        """Allow a hedge only while hedges stay within HEDGE_BUDGET_FRACTION of requests."""
+        with self._lock:
+            if self.hedges + 1 > HEDGE_BUDGET_FRACTION * self.requests:
+                return False
+            self.hedges += 1
+            return True
+
+    def record_hedge_win(self) -> None:
+        with self._lock:
+            self.hedge_wins += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "state": self._state_locked(),
+                "requests": self.requests,
+                "failures": self.failures,
+                "retries": self.retries,
+                "rejected_while_open": self.rejected,
+                "consecutive_failures": self._consecutive_failures,
+                "last_error": self.last_error,
+                "hedges": self.hedges,
+                "hedge_wins": self.hedge_wins,
+                "scheduler": self.scheduler.snapshot(),
+            }
+
+
+class ClusterRegistry:
+    """Process-wide registry of ClusterState, shared by all investigations."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._clusters: dict[str, ClusterState] = {}
+
+    def get(self, url: str) -> ClusterState:
+        with self._lock:
+            state = self._clusters.get(url)
+            if state is None:
+                state = self._clusters[url] = ClusterState(url)
+            return state
+
+    def snapshot(self, urls: Optional[list[str]] = None) -> dict:
+        with self._lock:
+            clusters = dict(self._clusters)
+        if urls is not None:
+            clusters = {u: s for u, s in clusters.items() if u in urls}
+        return {url: state.snapshot() for url, state in clusters.items()}
+
+
+cluster_registry = ClusterRegistry()
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# Request execution
+# ═══════════════════════════════════════════════════════════════════════════════
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Connection failures/timeouts and throttling/gateway errors are retryable."""
+    # ConnectionTimeout is a subclass of ConnectionError in opensearch-py
+    if isinstance(error, OpenSearchConnectionError):
+        return True
+    if isinstance(error, TransportError):
+        return error.status_code in RETRYABLE_STATUS_CODES
+    return False
+
+
+def is_throttled(error: BaseException) -> bool:
+    return isinstance(error, TransportError) and error.status_code == 429
+
+
+def _release_when_done(worker: asyncio.Future, scheduler: ClusterScheduler) -> None:
+    """Keep an abandoned request's in-flight slot until its thread actually returns."""
+
+    def _release(task: asyncio.Future) -> None:
+        if not task.cancelled():
+            task.exception()  # retrieved: the caller is gone, the outcome is discarded
+        scheduler.release()
+
+    worker.add_done_callback(_release)
+
+
+def _backoff_delay(attempt: int) -> float:
+    """Full-jitter exponential backoff."""
+    return random.uniform(0, min(RETRY_MAX_DELAY_SECS, RETRY_BASE_DELAY_SECS * (2 ** attempt)))
+
+
+async def call_with_resilience(
+    url: str,
+    request: Callable[[float], T],
+    label: str = "",
+) -> T:
+    """
+    Run the blocking `request(timeout_secs)` in a worker thread under the
+    cluster's circuit breaker, scheduler, the investigation deadline and the
+    retry policy. Every attempt, retries included, waits for the scheduler, so
+    a 429 slows the whole cluster down instead of triggering a retry burst.
+
+    Raises CircuitOpenError / DeadlineExceeded without touching the cluster,
+    or the last request error once retries are exhausted.
+    """
+    cluster = cluster_registry.get(url)
+    deadline = current_deadline()
+    last_error: Optional[BaseException] = None
+
+    for attempt in range(RETRY_MAX_ATTEMPTS):
+        # Queue and size the request before taking a half-open trial, so
+        # running out of budget here can't strand the trial
+        await cluster.scheduler.acquire(deadline)
+        try:
+            timeout = deadline.request_timeout()
+        except DeadlineExceeded:
+            cluster.scheduler.release()
+            raise
+        allowed, trial = cluster.allow_request()
+        if not allowed:
+            cluster.scheduler.release()
+            raise CircuitOpenError(f"circuit open for {url}")
+        recorded = False
+        worker = asyncio.ensure_future(asyncio.to_thread(request, timeout))
+        try:
+            result = await asyncio.shield(worker)
+        except asyncio.CancelledError:
+            # The thread can't be interrupted: it keeps its slot until it returns
+            _release_when_done(worker, cluster.scheduler)
+            raise
+        except Exception as e:
+            cluster.scheduler.release(throttled=is_throttled(e))
+            retryable = is_retryable(e)
+            cluster.record_failure(e, unhealthy=retryable, trial=trial)
+            recorded = True
+            last_error = e
+            delay = _backoff_delay(attempt)
+            last_attempt = attempt + 1 >= RETRY_MAX_ATTEMPTS
+            if not retryable or last_attempt or delay >= deadline.remaining():
+                logger.error(
+                    f"[call_with_resilience] {label or url} failed after "
+                    f"{attempt + 1} attempt(s): {type(e).__name__}: {e}"
+                )
+                raise
+            cluster.record_retry()
+            logger.warning(
+                f"[call_with_resilience] {label or url} attempt {attempt + 1} failed "
+                f"({type(e).__name__}: {e}); retrying in {delay:.2f}s"
+            )
+            await asyncio.sleep(delay)
+        except BaseException:
+            cluster.scheduler.release()
+            raise
+        else:
+            cluster.scheduler.release()
+            cluster.record_success(trial=trial)
+            recorded = True
+            return result
+        finally:
+            if trial and not recorded:
+                cluster.abandon_trial()
+
+    raise last_error
+
+
+async def call_hedged(
+    url: str,
+    request: Callable[[float], T],
+    label: str = "",
+) -> T:
+    """
+    `call_with_resilience`, plus a hedge: if the request hasn't returned within
+    the cluster's observed p95 latency, fire one duplicate (budget permitting)
+    and return whichever succeeds first.
+
+    Only used for first pages: each successful call's latency feeds the p95
+    window. No-op unless OPENSEARCH_HEDGE_FIRST_PAGE is enabled and the
+    cluster has enough samples. The losing request is cancelled; its thread
+    runs to completion in the background holding its scheduler slot, and its
+    result is discarded.
+    """
+    cluster = cluster_registry.get(url)
+    threshold = cluster.latency_p95() if hedge_first_page_enabled() else None
+    started = time.monotonic()
+    if threshold is None:
+        result = await call_with_resilience(url, request, label)
+        cluster.record_first_page_latency(time.monotonic() - started)
+        return result
+
+    primary = asyncio.ensure_future(call_with_resilience(url, request, label))
+    pending = {primary}
+    last_error: Optional[BaseException] = None
+    try:
+        done, _ = await asyncio.wait(pending, timeout=threshold)
+        if not done and cluster.try_acquire_hedge():
+            logger.info(
+                f"[call_hedged] {label or url} exceeded p95 ({threshold:.2f}s); sending hedge"
+            )
+            pending.add(asyncio.ensure_future(
+                call_with_resilience(url, request, f"{label} (hedge)")
+            ))
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            # Successes first; every failure's exception is retrieved
+            for task in sorted(done, key=lambda t: t.cancelled() or t.exception() is not None):
+                if task.cancelled():
+                    last_error = last_error or asyncio.CancelledError()
+                    continue
+                if task.exception() is not None:
+                    last_error = task.exception()
+                    continue
+                if task is not primary:
+                    cluster.record_hedge_win()
+                cluster.record_first_page_latency(time.monotonic() - started)
+                return task.result()
+    finally:
+        for task in pending:
+            task.cancel()
+    raise last_error
@@ -0,0 +1,291 @@
+"""
+Response cache for OpenSearch page fetches issued by search_agent_v2.
+
+The BFS issues the same DSL many times: a session ID is searched on the
+wxcalling side from several paths, and repeat investigations rebuild exactly
+the same `build_query` output. This module caches each page response keyed by
+
+    index + canonical DSL hash + search_after cursor
+
+and coalesces concurrent identical requests (single-flight) so only one of
+them reaches the cluster while the others await the same result.
+
+Logs are immutable once ingested, so the TTL depends on the time range the
+query covers: a window that ended well in the past can be cached for hours,
+while relative ("now-7d/d") or still-open windows only get a short TTL.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# Tuning
+# ═══════════════════════════════════════════════════════════════════════════════
+
+# Max cached pages (each page holds up to PAGE_SIZE hits)
+RESPONSE_CACHE_MAX_ENTRIES = 256
+# TTL for queries whose window is relative to "now" or still receiving logs
+RESPONSE_CACHE_RECENT_TTL_SECS = 60
+# TTL for queries whose window ended before the ingestion settle period
+RESPONSE_CACHE_HISTORICAL_TTL_SECS = 6 * 3600
+# Logs older than this are assumed fully ingested and immutable
+RESPONSE_CACHE_SETTLE_SECS = 15 * 60
+
+
+def canonical_query_hash(query: dict) -> str:
+    """Stable SHA-256 of a DSL body (key order independent, cursor excluded)."""
+    body = {k: v for k, v in query.items() if k != "search_after"}
+    canonical = json.dumps(body, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+def _parse_timestamp(value: Any) -> Optional[float]:
+    """Parse an absolute ISO timestamp to epoch seconds. Relative dates → None."""
+    if not isinstance(value, str) or value.startswith("now"):
+        return None
+    try:
+        dt = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.timestamp()
+
+
+def _query_window_end(query: dict) -> Optional[float]:
+    """Return the absolute upper bound of the @timestamp range filter, if any."""
+    filters = query.get("query", {}).get("bool", {}).get("filter", [])
+    for clause in filters:
+        ts_range = clause.get("range", {}).get("@timestamp") if isinstance(clause, dict) else None
+        if ts_range:
+            return _parse_timestamp(ts_range.get("lte") or ts_range.get("lt"))
+    return None
+
+
+class _FlightAbandoned(Exception):
+    """Set on a single-flight future whose leading caller was cancelled."""
+
+
+class OpenSearchResponseCache:
+    """
+    In-process TTL + LRU cache of OpenSearch page responses with single-flight.
+
+    Cached responses are shared between callers and must be treated as
+    read-only. Thread-safe for the storage; in-flight coalescing is tracked
+    per event loop since asyncio futures are loop-bound.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = RESPONSE_CACHE_MAX_ENTRIES,
+        recent_ttl: float = RESPONSE_CACHE_RECENT_TTL_SECS,
+        historical_ttl: float = RESPONSE_CACHE_HISTORICAL_TTL_SECS,
+        settle_secs: float = RESPONSE_CACHE_SETTLE_SECS,
+    ):
+        self._max_entries = max_entries
+        self._recent_ttl = recent_ttl
+        self._historical_ttl = historical_ttl
+        self._settle_secs = settle_secs
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[str, tuple[float, dict]] = OrderedDict()
+        self._inflight: dict[tuple[int, str], asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    @staticmethod
+    def make_key(index: str, query: dict) -> str:
+        cursor = json.dumps(query.get("search_after"), default=str)
+        return f"{index}|{canonical_query_hash(query)}|{cursor}"
+
+    def ttl_for(self, query: dict) -> float:
+        """Longer TTL when the query window closed before the settle period."""
+        window_end = _query_window_end(query)
+        if window_end is not None and window_end < time.time() - self._settle_secs:
+            return self._historical_ttl
+        return self._recent_ttl
+
+    def get(self, key: str) -> Optional[dict]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def put(self, key: str, value: dict, ttl: float) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            size = len(self._entries)
+        return {
+            "entries": size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+        }
+
+    async def get_or_fetch(
+        self,
+        index: str,
+        query: dict,
+        fetch: Callable[[], Awaitable[dict]],
+    ) -> dict:
+        """
+        Return the cached response for (index, query), or run `fetch` once.
+
+        Concurrent callers with the same key await the first caller's fetch
+        instead of issuing their own. Failures are never cached. If the
+        leading caller is cancelled, a waiter takes over the fetch.
+        """
+        key = self.make_key(index, query)
+        while True:
+            cached = self.get(key)
+            if cached is not None:
+                self.hits += 1
+                logger.debug(f"[OpenSearchResponseCache] HIT {key[:80]}")
+                return cached
+
+            loop = asyncio.get_running_loop()
+            flight_key = (id(loop), key)
+            inflight = self._inflight.get(flight_key)
+            if inflight is not None:
+                self.coalesced += 1
+                logger.debug(f"[OpenSearchResponseCache] COALESCED {key[:80]}")
+                try:
+                    return await asyncio.shield(inflight)
+                except _FlightAbandoned:
+                    # The leader was cancelled, not the fetch: first waiter back leads a new flight
+                    continue
+
+            self.misses += 1
+            future: asyncio.Future = loop.create_future()
+            self._inflight[flight_key] = future
+            try:
+                result = await fetch()
+            except asyncio.CancelledError:
+                # Only this caller was cancelled; waiters from other searches retry
+                future.set_exception(_FlightAbandoned())
+                future.exception()
+                raise
+            except BaseException as e:
+                future.set_exception(e)
+                # Mark retrieved so an un-awaited failure doesn't warn at GC
+                future.exception()
+                raise
+            else:
+                self.put(key, result, self.ttl_for(query))
+                future.set_result(result)
+                return result
+            finally:
+                self._inflight.pop(flight_key, None)
+
+
+# ── Singleton shared by all investigations in the process ──
+response_cache = OpenSearchResponseCache()
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# Negative cache — known-empty (index, query, filters, window) searches
+# ═══════════════════════════════════════════════════════════════════════════════
+
+# Zero-hit results are only trusted briefly: logs for a fresh ID may still be
+# arriving, and a wrong "empty" verdict silently drops a whole branch of the BFS.
+NEGATIVE_CACHE_TTL_SECS = 10 * 60
+NEGATIVE_CACHE_MAX_ENTRIES = 4096
+
+
+class NegativeSearchCache:
+    """
+    Short-TTL record of searches that completed successfully with zero hits.
+
+    The BFS planner consults it to skip known-empty searches, e.g. trace_id on
+    wxm_app, or EU indexes for US-only users on broad `unknown` lookups.
+    Failed searches must never be recorded here.
+    """
+
+    def __init__(
+        self,
+        ttl: float = NEGATIVE_CACHE_TTL_SECS,
+        max_entries: int = NEGATIVE_CACHE_MAX_ENTRIES,
+    ):
+        self._ttl = ttl
+        self._max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[tuple, float] = OrderedDict()
+        self.skips = 0
+
+    @staticmethod
+    def make_key(
+        index: str,
+        query_type: str,
+        field: str | None,
+        value: str,
+        tag_filter: str | None,
+        time_range: tuple[str, str] | None,
+    ) -> tuple:
+        """Every filter of the search: a tag-filtered search says nothing about an untagged one."""
+        return (
+            index,
+            query_type,
+            field or "",
+            str(value).strip(),
+            tag_filter or "",
+            tuple(time_range) if time_range else None,
+        )
+
+    def is_known_empty(self, key: tuple) -> bool:
+        """
+        True if this search, or the same search (same index and filters) over
+        the default window, recently came back empty — empty over the default
+        range implies empty within any narrower window.
+        """
+        keys = [key] if key[-1] is None else [key, key[:-1] + (None,)]
+        now = time.monotonic()
+        with self._lock:
+            for candidate in keys:
+                expires_at = self._entries.get(candidate)
+                if expires_at is None:
+                    continue
+                if expires_at <= now:
+                    del self._entries[candidate]
+                    continue
+                self.skips += 1
+                return True
+        return False
+
+    def record_empty(self, key: tuple) -> None:
+        with self._lock:
+            self._entries[key] = time.monotonic() + self._ttl
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+negative_cache = NegativeSearchCache()
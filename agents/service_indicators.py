@@ -0,0 +1,29 @@
+"""
+serviceIndicator detection, shared by the hit store (search_agent_v2) and the
+analysis router (analyze_agent_v2).
+
+A leaf module: no ADK or agent imports, so the search side can count
+indicators per hit without pulling in the analysis stack.
+"""
+
+import re
+from typing import Any, Iterator, Mapping
+
+SERVICE_INDICATOR_PATTERN = re.compile(
+    r"serviceIndicator[\"']?\s*[:=]\s*[\"']?([A-Za-z]+)"
+)
+
+
+def find_service_indicators(source: Mapping[str, Any]) -> Iterator[str]:
+    """serviceIndicator values in a `_source`: structured fields first, then the message."""
+    fields = source.get("fields")
+    for value in (
+        source.get("serviceIndicator"),
+        fields.get("serviceIndicator") if isinstance(fields, Mapping) else None,
+    ):
+        if isinstance(value, str) and value:
+            yield value
+    message = source.get("message")
+    if isinstance(message, str) and "serviceIndicator" in message:
+        for match in SERVICE_INDICATOR_PATTERN.finditer(message):
+            yield match.group(1)
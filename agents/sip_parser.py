@@ -0,0 +1,343 @@
+"""
+Index-based SIP message parser for log `message` text.
+
+SSE/MSE, WxCAS and Mobius logs carry whole SIP messages (start line, headers,
+SDP body) inside `message`, often behind a log prefix and with either real or
+JSON-escaped (`\\r\\n`) line breaks. `parse_sip` walks the message with
+`str.find` offsets and slices out only the values it keeps:
+
+    start line, method / status + reason, Call-ID, CSeq, From/To tags,
+    Via branches, Session-ID (local;remote), the sent/received direction
+    named in the log prefix and an SDP summary
+
+into a compact `SipMessage`. Shared by the search ID extractor, the analysis
+digest and the diagram generator's SIP ladder view.
+"""
+
+import logging
+import re
+from dataclasses import dataclass, field
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+SIP_VERSION = "SIP/2.0"
+SIP_METHODS = frozenset({
+    "INVITE", "ACK", "BYE", "CANCEL", "OPTIONS", "REGISTER", "PRACK", "UPDATE",
+    "INFO", "REFER", "NOTIFY", "SUBSCRIBE", "MESSAGE",
+})
+# Header lines examined per message (guards against runaway non-SIP text)
+MAX_HEADER_LINES = 80
+
+# Compact header forms (RFC 3261 §7.3.3) → full lowercase name
+_COMPACT_HEADERS = {
+    "i": "call-id", "f": "from", "t": "to", "v": "via",
+    "c": "content-type", "l": "content-length", "m": "contact",
+}
+_URI_SCHEMES = ("sip:", "sips:", "tel:")
+# Characters that end a header value inside a logged (quoted/escaped) message
+_VALUE_END = " \t\"\\"
+# Static RTP payload types, for m= lines without a=rtpmap
+_STATIC_PAYLOADS = {"0": "PCMU", "8": "PCMA", "9": "G722", "18": "G729", "13": "CN"}
+_DIRECTIONS = frozenset({"sendrecv", "sendonly", "recvonly", "inactive"})
+# Log-prefix words marking a message as sent or received by the logging service
+_SENT_MARKERS = re.compile(r"\b(?:send|sending|sent|outgoing|outbound|tx)\b", re.IGNORECASE)
+_RECEIVED_MARKERS = re.compile(r"\b(?:recv|receive|received|receiving|incoming|inbound|rx)\b", re.IGNORECASE)
+
+
+@dataclass
+class SdpMedia:
+    kind: str  # audio | video | application
+    port: str
+    proto: str
+    codecs: list[str] = field(default_factory=list)
+    direction: str = ""
+
+
+@dataclass
+class SdpSummary:
+    media: list[SdpMedia] = field(default_factory=list)
+    connection: str = ""
+    direction: str = ""  # session-level direction attribute
+    candidates: int = 0
+    dtls: bool = False  # a=fingerprint present
+    sdes: bool = False  # a=crypto present
+
+    def render(self) -> str:
+        parts = []
+        for media in self.media:
+            codecs = ",".join(dict.fromkeys(media.codecs)) or "-"
+            direction = media.direction or self.direction
+            parts.append(f"{media.kind}:{media.port} {media.proto} {codecs}{' ' + direction if direction else ''}")
+        if self.connection:
+            parts.append(f"c={self.connection}")
+        if self.candidates:
+            parts.append(f"ice={self.candidates}")
+        if self.dtls:
+            parts.append("dtls")
+        if self.sdes:
+            parts.append("sdes")
+        return "; ".join(parts)
+
+
+@dataclass
+class SipMessage:
+    start_line: str
+    method: Optional[str] = None  # requests only
+    request_uri: Optional[str] = None
+    status: Optional[int] = None  # responses only
+    reason: str = ""
+    call_id: Optional[str] = None
+    cseq: Optional[int] = None
+    cseq_method: Optional[str] = None
+    from_tag: Optional[str] = None
+    to_tag: Optional[str] = None
+    via_branches: list[str] = field(default_factory=list)
+    session_id: Optional[str] = None
+    remote_session_id: Optional[str] = None
+    sdp: Optional[SdpSummary] = None
+    start: int = 0  # offset of the start line in the message
+    header_end: int = 0  # offset where the header block ends (blank line or end of message)
+    sdp_span: Optional[tuple[int, int]] = None  # [start, end) of the SDP body; text after it is log suffix
+    direction: str = ""  # "sent" / "received" per the log prefix; "" when it does not say
+
+    @property
+    def is_request(self) -> bool:
+        return self.method is not None
+
+    @property
+    def transaction_method(self) -> Optional[str]:
+        """Method of the transaction: the request's own, or the CSeq method of a response."""
+        return self.method or self.cseq_method
+
+    def label(self) -> str:
+        """`INVITE` for requests, `200 OK` for responses."""
+        return self.method if self.is_request else f"{self.status} {self.reason}".strip()
+
+    def summary(self, uri_chars: int = 80, reason_chars: int = 60) -> str:
+        """One-line form used by the digest: `SIP INVITE <uri> | Call-ID=... | CSeq=... | SDP ...`."""
+        if self.is_request:
+            head = f"SIP {self.method} {(self.request_uri or '')[:uri_chars]}"
+        else:
+            head = f"SIP {self.status} {self.reason[:reason_chars]}".rstrip()
+        parts = [head]
+        if self.call_id:
+            parts.append(f"Call-ID={self.call_id}")
+        if self.cseq is not None:
+            parts.append(f"CSeq={self.cseq} {self.cseq_method or ''}".rstrip())
+        if self.sdp and self.sdp.media:
+            parts.append(f"SDP {self.sdp.render()}")
+        return " | ".join(parts)
+
+    def without_sdp(self, text: str) -> str:
+        """`text` (the parsed message) with the SDP body cut out; any log suffix after it is kept."""
+        if self.sdp_span is None:
+            return text
+        start, end = self.sdp_span
+        return text[:start] + text[end:]
+
+    def to_record(self) -> dict:
+        """Compact dict with only the fields present (for LLM input and state)."""
+        record = {
+            "start_line": self.start_line,
+            "call_id": self.call_id,
+            "cseq": f"{self.cseq} {self.cseq_method or ''}".rstrip() if self.cseq is not None else None,
+            "from_tag": self.from_tag,
+            "to_tag": self.to_tag,
+            "via_branches": self.via_branches,
+            "session_id": self.session_id,
+            "remote_session_id": self.remote_session_id,
+            "sdp": self.sdp.render() if self.sdp else None,
+        }
+        return {k: v for k, v in record.items() if v}
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# Parsing
+# ═══════════════════════════════════════════════════════════════════════════════
+
+
+def _line_break(text: str, start: int) -> str:
+    """The message's line separator: real CRLF/LF, or a JSON-escaped `\\r\\n` / `\\n`."""
+    real = text.find("\n", start)
+    escaped = text.find("\\n", start)
+    if escaped != -1 and (real == -1 or escaped < real):
+        return "\\r\\n" if text.startswith("\\r", escaped - 2) else "\\n"
+    if real != -1:
+        return "\r\n" if real > 0 and text[real - 1] == "\r" else "\n"
+    return ""
+
+
+def _find_start_line(text: str) -> Optional[tuple[int, int, Optional[str], Optional[str], Optional[int]]]:
+    """(line start, offset past `SIP/2.0`/status, method, uri, status) of the first SIP start line."""
+    i = text.find(SIP_VERSION)
+    while i != -1:
+        after = i + len(SIP_VERSION)
+        # Status line: "SIP/2.0 200 OK"
+        if text.startswith(" ", after) and text[after + 1:after + 4].isdigit():
+            return i, after + 4, None, None, int(text[after + 1:after + 4])
+        # Request line: "INVITE sip:bob@example.com SIP/2.0"
+        if i >= 2 and text[i - 1] == " ":
+            uri_start = text.rfind(" ", 0, i - 1) + 1
+            method_end = uri_start - 1
+            method_start = method_end
+            while method_start > 0 and "A" <= text[method_start - 1] <= "Z":
+                method_start -= 1
+            method = text[method_start:method_end] if method_end > 0 else ""
+            if method in SIP_METHODS and text.startswith(_URI_SCHEMES, uri_start):
+                return method_start, after, method, text[uri_start:i - 1], None
+        i = text.find(SIP_VERSION, after)
+    return None
+
+
+def _direction(prefix: str) -> str:
+    """"sent" / "received" from the log prefix before the start line; "" when unmarked or both."""
+    sent = _SENT_MARKERS.search(prefix) is not None
+    received = _RECEIVED_MARKERS.search(prefix) is not None
+    if sent == received:
+        return ""
+    return "sent" if sent else "received"
+
+
+def _token_end(text: str, start: int, end: int, stops: str) -> int:
+    """Offset of the first character in `stops` within [start, end), else `end`."""
+    for j in range(start, end):
+        if text[j] in stops:
+            return j
+    return end
+
+
+def _param(text: str, name: str, start: int, end: int) -> Optional[str]:
+    """Value of `;name=` in the header value at [start, end)."""
+    at = text.find(f";{name}=", start, end)
+    if at == -1:
+        return None
+    value_start = at + len(name) + 2
+    value = text[value_start:_token_end(text, value_start, end, ";,>" + _VALUE_END)]
+    return value or None
+
+
+def _parse_sdp(text: str, start: int, end: int, sep: str) -> tuple[Optional[SdpSummary], int]:
+    """(summary, offset where the SDP body ends) for the body starting at `start`."""
+    sdp = SdpSummary()
+    rtpmap: dict[str, str] = {}
+    payloads: list[str] = []
+    media: Optional[SdpMedia] = None
+
+    def _close_media() -> None:
+        if media is not None:
+            media.codecs = [rtpmap.get(pt) or _STATIC_PAYLOADS.get(pt, pt) for pt in payloads]
+
+    pos = start
+    while pos < end:
+        line_end = text.find(sep, pos, end) if sep else -1
+        if line_end == -1:
+            line_end = end
+        # A quote closes a logged (JSON-quoted) message: the rest is log suffix
+        quote = text.find('"', pos, line_end)
+        if quote != -1:
+            line_end = end = quote
+        kind = text[pos:pos + 2]
+        if kind == "m=":
+            _close_media()
+            tokens = text[pos + 2:line_end].split()
+            media = SdpMedia(*(tokens + ["", "", ""])[:3])
+            payloads, rtpmap = tokens[3:], {}
+            sdp.media.append(media)
+        elif kind == "c=" and not sdp.connection:
+            sdp.connection = text[pos + 2:line_end].rsplit(" ", 1)[-1]
+        elif kind == "a=":
+            attribute = text[pos + 2:_token_end(text, pos + 2, line_end, ": ")]
+            if attribute == "rtpmap":
+                tokens = text[pos + 9:line_end].split()
+                if len(tokens) >= 2:
+                    rtpmap[tokens[0]] = tokens[1].split("/", 1)[0]
+            elif attribute == "candidate":
+                sdp.candidates += 1
+            elif attribute == "fingerprint":
+                sdp.dtls = True
+            elif attribute == "crypto":
+                sdp.sdes = True
+            elif attribute in _DIRECTIONS:
+                if media is None:
+                    sdp.direction = attribute
+                else:
+                    media.direction = attribute
+        elif kind not in ("v=", "o=", "s=", "t=", "b=", "i=", "u=", "e=", "p=", "k=", "r=", "z="):
+            break  # end of the SDP (log suffix)
+        pos = min(line_end + len(sep), end) if sep else end
+    _close_media()
+    return (sdp if sdp.media else None), min(pos, end)
+
+
+def parse_sip(text: str) -> Optional[SipMessage]:
+    """Parse the first SIP message in `text`; None when it holds no SIP start line."""
+    if not text or SIP_VERSION not in text:
+        return None
+    found = _find_start_line(text)
+    if found is None:
+        return None
+    line_start, after, method, uri, status = found
+    sep = _line_break(text, after)
+    line_end = text.find(sep, after) if sep else -1
+    if line_end == -1:
+        line_end = len(text)
+
+    message = SipMessage(start_line="", method=method, request_uri=uri, status=status, start=line_start)
+    message.direction = _direction(text[:line_start])
+    if status is not None:
+        message.reason = text[after:_token_end(text, after, line_end, "\"\\")].strip()
+    message.start_line = text[line_start:_token_end(text, line_start, line_end, "\"\\")].rstrip()
+
+    pos = line_end + len(sep) if sep else len(text)
+    is_sdp = False
+    body_start = -1
+    for _ in range(MAX_HEADER_LINES):
+        if pos >= len(text):
+            break
+        end = text.find(sep, pos)
+        if end == -1:
+            end = len(text)
+        if end == pos:
+            body_start = pos + len(sep)
+            break
+        colon = text.find(":", pos, end)
+        if colon == -1:
+            break
+        name = text[pos:colon].strip().lower()
+        name = _COMPACT_HEADERS.get(name, name)
+        value_start = colon + 1
+        while value_start < end and text[value_start] == " ":
+            value_start += 1
+
+        if name == "call-id" and message.call_id is None:
+            message.call_id = text[value_start:_token_end(text, value_start, end, _VALUE_END)] or None
+        elif name == "cseq" and message.cseq is None:
+            number_end = _token_end(text, value_start, end, _VALUE_END)
+            if text[value_start:number_end].isdigit():
+                message.cseq = int(text[value_start:number_end])
+                method_start = number_end + 1
+                message.cseq_method = text[method_start:_token_end(text, method_start, end, _VALUE_END)] or None
+        elif name == "from":
+            message.from_tag = message.from_tag or _param(text, "tag", value_start, end)
+        elif name == "to":
+            message.to_tag = message.to_tag or _param(text, "tag", value_start, end)
+        elif name == "via":
+            at = text.find(";branch=", value_start, end)
+            while at != -1:
+                branch_start = at + len(";branch=")
+                branch_end = _token_end(text, branch_start, end, ";," + _VALUE_END)
+                message.via_branches.append(text[branch_start:branch_end])
+                at = text.find(";branch=", branch_end, end)
+        elif name == "session-id" and message.session_id is None:
+            message.session_id = text[value_start:_token_end(text, value_start, end, ";" + _VALUE_END)] or None
+            message.remote_session_id = _param(text, "remote", value_start, end)
+        elif name == "content-type":
+            is_sdp = text.startswith("application/sdp", value_start)
+        pos = end + len(sep)
+
+    message.header_end = pos
+    if body_start != -1 and (is_sdp or text.startswith("v=0", body_start)):
+        message.sdp, body_end = _parse_sdp(text, body_start, len(text), sep)
+        message.sdp_span = (body_start, body_end)
+    return message
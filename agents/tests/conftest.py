@@ -0,0 +1,17 @@
+"""
+Shared pytest setup for the agents/ unit tests.
+
+Agent modules import each other as top-level packages (`analyze_agent_v2`,
+`sip_parser`, ...) the way the ADK runner loads them from agents/, so that
+directory goes on sys.path. Agents build their models at import time; no
+model is called in these tests.
+"""
+
+import os
+import sys
+from pathlib import Path
+
+AGENTS_DIR = Path(__file__).resolve().parent.parent
+
+sys.path.insert(0, str(AGENTS_DIR))
+os.environ.setdefault("AZURE_OPENAI_ENDPOINT", "http://localhost")
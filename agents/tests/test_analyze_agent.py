@@ -0,0 +1,44 @@
+import json
+from collections import Counter
+
+import pytest
+
+from analyze_agent_v2.agent import DEFAULT_ROUTE, detect_service_indicators, route_for
+
+
+class TestRouteFor:
+    @pytest.mark.parametrize(
+        "counts, route",
+        [
+            (Counter(), DEFAULT_ROUTE),
+            (Counter({"UNKNOWN": 9}), DEFAULT_ROUTE),
+            (Counter({"CONTACTCENTER": 3, "calling": 1}), "contact_center_agent"),
+            # calling + guestcalling vote together
+            (Counter({"calling": 2, "GuestCalling": 2, "contactCenter": 3}), "calling_agent"),
+        ],
+    )
+    def test_majority_of_recognized_values(self, counts, route):
+        assert route_for(counts) == route
+
+
+class TestDetectServiceIndicators:
+    def test_search_summary_tally_wins(self):
+        state = {
+            "search_summary": json.dumps({"service_indicators": {"contactCenter": 4}}),
+            "all_logs": json.dumps({"mobius": [{"fields": {"serviceIndicator": "calling"}}]}),
+        }
+        assert detect_service_indicators(state) == {"contactCenter": 4}
+
+    def test_scans_logs_without_a_summary(self):
+        state = {
+            "search_summary": "not json",
+            "all_logs": json.dumps({
+                "mobius": [{"fields": {"serviceIndicator": "calling"}}],
+                "wxcas": [{"message": '{"serviceIndicator": "calling"}'}],
+            }),
+            "sdk_logs": "boot\nrequest serviceIndicator=contactCenter\n",
+        }
+        assert detect_service_indicators(state) == {"calling": 2, "contactCenter": 1}
+
+    def test_nothing_found(self):
+        assert detect_service_indicators({}) == Counter()
@@ -0,0 +1,103 @@
+import os
+import time
+import zlib
+
+import pytest
+
+from artifact_store import ARTIFACT_INLINE_MAX_BYTES, ArtifactStore, is_artifact_ref
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ArtifactStore(root=tmp_path)
+
+
+LARGE = "x" * (ARTIFACT_INLINE_MAX_BYTES + 1)
+
+
+class TestRoundTrip:
+    def test_put_get(self, store):
+        ref = store.put("hello")
+        assert is_artifact_ref(ref)
+        assert store.get(ref) == "hello"
+        assert store.put("hello") == ref
+
+    def test_read_back_from_disk(self, store, tmp_path):
+        ref = store.put(LARGE)
+        assert ArtifactStore(root=tmp_path).get(ref) == LARGE
+
+    def test_offload_keeps_small_values_inline(self, store):
+        assert store.offload("small") == "small"
+        assert is_artifact_ref(store.offload(LARGE))
+
+    def test_missing_artifact(self, store):
+        ref = "artifact://sha256/" + "0" * 64
+        with pytest.raises(KeyError):
+            store.get(ref)
+        assert store.resolve(ref) == ""
+        assert store.resolve("plain value") == "plain value"
+
+
+class TestStreamedOffload:
+    def test_small_streams_stay_inline(self, store, tmp_path):
+        assert store.offload_chunks([b"{", b'"a":1', b"}"]) == '{"a":1}'
+        assert not any(tmp_path.iterdir())
+
+    def test_large_stream_matches_put(self, store, tmp_path):
+        chunks = [LARGE[i:i + 1000].encode() for i in range(0, len(LARGE), 1000)]
+        ref = store.offload_chunks(iter(chunks))
+        assert ref == store.put(LARGE)
+        assert ArtifactStore(root=tmp_path).get(ref) == LARGE
+
+    def test_failed_stream_leaves_no_partial_file(self, store, tmp_path):
+        def chunks():
+            yield LARGE.encode()
+            raise RuntimeError("boom")
+
+        with pytest.raises(RuntimeError):
+            store.offload_chunks(chunks())
+        assert [p for p in tmp_path.rglob("*") if p.is_file()] == []
+
+
+def _age(store, ref, secs):
+    path = store._path(ref.rsplit("/", 1)[-1])
+    past = time.time() - secs
+    os.utime(path, (past, past))
+    return path
+
+
+class TestEviction:
+    def test_unused_artifacts_expire(self, tmp_path):
+        store = ArtifactStore(root=tmp_path, max_age_secs=3600)
+        old = _age(store, store.put("old"), 7200)
+        fresh = _age(store, store.put("fresh"), 60)
+        assert store.gc() == (1, len(zlib.compress(b"old", 6)))
+        assert not old.exists() and fresh.exists()
+
+    def test_size_cap_evicts_least_recently_used(self, tmp_path):
+        store = ArtifactStore(root=tmp_path, max_total_bytes=10**9)
+        refs = [store.put(f"value {i}" * 100) for i in range(3)]
+        for i, ref in enumerate(refs):
+            _age(store, ref, 300 - i * 100)
+        # Reading the oldest marks it as used
+        ArtifactStore(root=tmp_path).get(refs[0])
+        sizes = {ref: store._path(ref.rsplit("/", 1)[-1]).stat().st_size for ref in refs}
+        store._max_total_bytes = sizes[refs[0]] + sizes[refs[2]]
+        assert store.gc()[0] == 1
+        assert ArtifactStore(root=tmp_path).resolve(refs[1]) == ""
+        assert ArtifactStore(root=tmp_path).get(refs[0]) == "value 0" * 100
+
+    def test_stale_temp_files_are_removed(self, tmp_path):
+        store = ArtifactStore(root=tmp_path, max_age_secs=3600)
+        stale, in_progress = tmp_path / "incoming.tmp1.1", tmp_path / "incoming.tmp1.2"
+        for path in (stale, in_progress):
+            path.write_bytes(b"partial")
+        os.utime(stale, (time.time() - 7200,) * 2)
+        store.gc()
+        assert not stale.exists() and in_progress.exists()
+
+    def test_first_write_runs_eviction(self, tmp_path):
+        old = ArtifactStore(root=tmp_path)
+        old_path = _age(old, old.put("old"), 30 * 86400)
+        ArtifactStore(root=tmp_path, max_age_secs=86400).put("new")
+        assert not old_path.exists()
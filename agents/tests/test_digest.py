@@ -0,0 +1,122 @@
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from analyze_agent_v2 import digest
+from analyze_agent_v2.digest import build_digest, digest_for_state, get_raw_log_entries, parse_entry
+
+SIP_486 = (
+    "SIP/2.0 486 Busy Here\r\nVia: SIP/2.0/TLS h;branch=z9hG4bKx\r\n"
+    "Call-ID: abc@h\r\nCSeq: 1 INVITE\r\n\r\n"
+)
+
+
+def _doc(ts, message, **fields):
+    doc = {"@timestamp": f"2026-01-01T10:00:{ts:02d}Z", "message": message}
+    if fields:
+        doc["fields"] = fields
+    return doc
+
+
+class TestParseEntry:
+    def test_sip_failure_is_an_error(self):
+        event = parse_entry(SIP_486, "t", "Mobius", "mobius#0")
+        assert (event.kind, event.is_error) == ("sip", True)
+        assert event.ids == ("sip:abc@h",)
+
+    def test_http_request_and_status(self):
+        event = parse_entry("POST /v1/calls status=503", "t", "Mobius", "mobius#0")
+        assert (event.kind, event.http_path, event.http_status, event.is_error) == (
+            "http", "/v1/calls", 503, True,
+        )
+
+    @pytest.mark.parametrize(
+        "message, source, kind",
+        [
+            ("connection refused by peer", {}, "error"),
+            ("all good", {"level": "error"}, "error"),
+            ("all good", {"level": "info"}, "log"),
+        ],
+    )
+    def test_plain_lines(self, message, source, kind):
+        assert parse_entry(message, "t", "Mobius", "mobius#0", source).kind == kind
+
+    def test_tracking_id_is_the_fallback_leg(self):
+        event = parse_entry("x", "t", "Mobius", "mobius#0", {"fields": {"WEBEX_TRACKINGID": "trk"}})
+        assert event.leg == "tracking:trk"
+
+
+class TestBuildDigest:
+    def test_refs_index_the_stored_lists(self):
+        all_logs = {
+            "mobius": [_doc(2, "second"), _doc(1, "first")],
+            "wxcas": [_doc(3, SIP_486)],
+        }
+        text = build_digest(all_logs, ["2026-01-01T10:00:00Z sdk start"])["text"]
+        for ref, needle in [("mobius#1", "first"), ("mobius#0", "second"), ("sdk#0", "sdk start")]:
+            line = next(line for line in text.splitlines() if f"<{ref}>" in line)
+            assert needle in line
+        assert "== ERROR MARKERS ==" in text and "<wxcas#0>" in text
+
+    def test_repeated_lines_collapse(self):
+        all_logs = {"mobius": [_doc(i, f"keepalive seq={i}") for i in range(5)]}
+        result = build_digest(all_logs, [])
+        assert result["stats"]["events"] == 1
+        assert "(x5)" in result["text"]
+
+    def test_sampling_caps_events_and_keeps_errors(self, monkeypatch):
+        monkeypatch.setattr(digest, "DIGEST_MAX_EVENTS", 10)
+        logs = [_doc(i % 60, f"line {chr(65 + i % 26)}{i // 26} unique") for i in range(60)]
+        logs[30] = _doc(30, "fatal failure")
+        result = build_digest({"mobius": logs}, [])
+        assert result["stats"]["events"] == 10
+        assert result["stats"]["dropped_events"] > 0
+        assert "<mobius#30>" in result["text"]
+
+
+class TestRawLookup:
+    def test_resolves_refs(self):
+        state = {"all_logs": '{"mobius": [{"message": "a"}]}', "sdk_logs": "l0\nl1"}
+        refs = ["mobius#0", "sdk#1", "mobius#5", "wxcas#0", "bad"]
+        result = get_raw_log_entries(refs, SimpleNamespace(state=state))
+        assert result == {
+            "entries": {"mobius#0": {"message": "a"}, "sdk#1": "l1"},
+            "missing": ["mobius#5", "wxcas#0", "bad"],
+        }
+
+
+class TestDigestCache:
+    @staticmethod
+    def _state(marker):
+        return {"all_logs": f'{{"mobius": [{{"message": "{marker}"}}]}}', "sdk_logs": ""}
+
+    def test_interleaved_sessions_keep_their_own_digest(self, monkeypatch):
+        builds = []
+        build = digest.build_digest
+        monkeypatch.setattr(digest, "build_digest", lambda *a: builds.append(1) or build(*a))
+        first, second = self._state("session one"), self._state("session two")
+        for _ in range(3):
+            assert "session one" in digest_for_state(first)["text"]
+            assert "session two" in digest_for_state(second)["text"]
+        assert len(builds) == 2
+
+    def test_no_logs_is_cached_as_none(self):
+        assert digest_for_state({}) is None
+        assert digest_for_state({"all_logs": "", "sdk_logs": ""}) is None
+
+    def test_concurrent_sessions(self):
+        states = [self._state(f"thread {i}") for i in range(8)]
+        results = {}
+
+        def run(i):
+            for _ in range(20):
+                results[i] = digest_for_state(states[i])["text"]
+                assert f"thread {i}" in results[i]
+
+        threads = [threading.Thread(target=run, args=(i,)) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert all(f"thread {i}" in results[i] for i in range(8))
@@ -0,0 +1,96 @@
+import json
+
+import pytest
+
+from search_agent_v2.hit_spool import PayloadSpool, dumps_bytes, loads
+from search_agent_v2.hit_store import HitStore
+
+
+def _hit(hit_id, ts, **source):
+    return {"_id": hit_id, "_source": {"@timestamp": ts, **source}}
+
+
+class TestPayloadSpool:
+    def test_rows_stay_in_memory_under_the_ceiling(self):
+        spool = PayloadSpool(ceiling_bytes=100)
+        rows = [spool.append(b"x" * 10) for _ in range(3)]
+        assert rows == [0, 1, 2]
+        assert spool.stats()["memory_bytes"] == 30 and spool.stats()["spilled_bytes"] == 0
+
+    def test_crossing_the_ceiling_spills_every_in_memory_row(self):
+        spool = PayloadSpool(ceiling_bytes=25)
+        payloads = [b"a" * 10, b"b" * 10, b"c" * 10, b"d" * 3]
+        for payload in payloads:
+            spool.append(payload)
+        assert spool.stats() == {"memory_bytes": 3, "spilled_bytes": 30, "ceiling_bytes": 25}
+        assert [spool.get(row) for row in range(len(spool))] == payloads
+        spool.close()
+
+    def test_repeated_spills_append_to_the_file(self):
+        spool = PayloadSpool(ceiling_bytes=5)
+        payloads = [bytes([65 + i]) * 6 for i in range(4)]
+        for payload in payloads:
+            spool.append(payload)
+        assert spool.stats()["memory_bytes"] == 0
+        assert [spool.get(row) for row in reversed(range(4))] == payloads[::-1]
+        spool.close()
+
+    def test_payload_round_trip(self):
+        source = {"message": "héllo", "n": 1, "nested": {"a": [1, 2]}}
+        assert loads(dumps_bytes(source)) == source
+
+
+class TestHitStore:
+    def test_dedup_by_id(self):
+        store = HitStore()
+        assert store.add("mobius", _hit("a", "2026-01-01T10:00:00Z"))
+        assert not store.add("wxcas", _hit("a", "2026-01-01T10:00:00Z"))
+        assert not store.add("mobius", {"_source": {}})
+        assert len(store) == 1 and "a" in store
+        assert store.counts() == {"mobius": 1, "sse_mse": 0, "wxcas": 0}
+
+    def test_render_all_is_the_category_object(self):
+        store = HitStore()
+        store.add("mobius", _hit("a", "2026-01-01T10:00:00Z", message="m"))
+        store.add("wxcas", _hit("b", "2026-01-01T10:00:01Z", message="w"))
+        rendered = json.loads(store.render_all())
+        assert rendered == {
+            "mobius": [{"@timestamp": "2026-01-01T10:00:00Z", "message": "m"}],
+            "sse_mse": [],
+            "wxcas": [{"@timestamp": "2026-01-01T10:00:01Z", "message": "w"}],
+        }
+
+    def test_render_keeps_arrival_order(self):
+        # Positions in the rendered arrays are the `category#N` refs of the digest
+        store = HitStore()
+        store.add("mobius", _hit("late", "2026-01-01T10:00:05Z"))
+        store.add("mobius", _hit("early", "2026-01-01T10:00:01Z"))
+        store.add("mobius", _hit("untimed", ""))
+        timestamps = [source["@timestamp"] for source in json.loads(store.render("mobius"))]
+        assert timestamps == ["2026-01-01T10:00:05Z", "2026-01-01T10:00:01Z", ""]
+        assert [s["@timestamp"] for s in store.tail("mobius", 2)] == timestamps[1:]
+
+    def test_counts_service_indicators(self):
+        store = HitStore()
+        store.add("mobius", _hit("a", "", fields={"serviceIndicator": "EMERGENCY"}))
+        store.add("mobius", _hit("b", "", message='... "serviceIndicator":"EMERGENCY" ...'))
+        store.add("wxcas", _hit("c", "", message="serviceIndicator=PSTN"))
+        assert store.service_indicators == {"EMERGENCY": 2, "PSTN": 1}
+
+    @pytest.mark.parametrize("ceiling", [1, 10**9])
+    def test_chunks_match_the_rendered_text_with_or_without_spill(self, ceiling):
+        store = HitStore()
+        store._payloads = PayloadSpool(ceiling_bytes=ceiling)
+        for i in range(5):
+            store.add("sse_mse", _hit(f"id{i}", f"2026-01-01T10:00:0{i}Z", message=f"m{i}"))
+        assert b"".join(store.render_all_chunks()).decode() == store.render_all()
+        assert len(json.loads(store.render("sse_mse"))) == 5
+        store.close()
+
+    def test_time_span(self):
+        store = HitStore()
+        assert store.time_span is None
+        store.add("mobius", _hit("a", "2026-01-01T10:00:05Z"))
+        store.add("mobius", _hit("b", "2026-01-01T10:00:01Z"))
+        store.add("mobius", _hit("c", ""))
+        assert store.time_span == ("2026-01-01T10:00:01+00:00", "2026-01-01T10:00:05+00:00")
@@ -0,0 +1,101 @@
+from dataclasses import dataclass
+
+import pytest
+
+from analyze_agent_v2.digest import build_digest
+from analyze_agent_v2.legs import UnionFind, assign_legs
+
+
+@dataclass
+class _Event:
+    ids: tuple[str, ...]
+    leg: str = "unassigned"
+
+
+def _legs(*id_sets):
+    events = [_Event(tuple(ids)) for ids in id_sets]
+    count = assign_legs(events)
+    return count, [event.leg for event in events]
+
+
+class TestUnionFind:
+    def test_components(self):
+        uf = UnionFind()
+        for key in "abcd":
+            uf.add(key)
+        uf.union("a", "b")
+        uf.union("c", "b")
+        assert uf.find("a") == uf.find("c") != uf.find("d")
+
+
+class TestAssignLegs:
+    def test_shared_leg_ids_join_transitively(self):
+        count, legs = _legs(
+            ["mobius:m1", "sip:c1"],
+            ["sip:c1"],
+            ["mobius:m1", "call:x"],
+        )
+        assert count == 1
+        assert legs == ["sip:c1"] * 3
+
+    def test_forwarded_call_reusing_the_session_id_is_a_new_leg(self):
+        count, legs = _legs(
+            ["sip:orig", "session:s1", "session:s2"],
+            ["sip:forwarded", "session:s1", "session:s2"],
+        )
+        assert count == 2
+        assert legs == ["sip:orig", "sip:forwarded"]
+
+    def test_session_only_entries_join_their_single_leg(self):
+        count, legs = _legs(
+            ["sip:c1", "session:s1"],
+            ["session:s1"],
+            ["session:s9"],
+        )
+        assert count == 2
+        assert legs == ["sip:c1", "sip:c1", "session:s9"]
+
+    def test_session_shared_by_several_legs_stays_apart(self):
+        count, legs = _legs(
+            ["sip:a", "session:s1"],
+            ["sip:b", "session:s1"],
+            ["session:s1"],
+        )
+        assert count == 3
+        assert legs[2] == "session:s1"
+
+    def test_correlation_id_joins(self):
+        count, legs = _legs(["correlation:k", "mobius:m1"], ["correlation:k", "sip:c1"])
+        assert count == 1 and legs == ["sip:c1", "sip:c1"]
+
+    def test_events_without_ids_keep_their_leg(self):
+        event = _Event((), leg="tracking:t")
+        assert assign_legs([event]) == 0
+        assert event.leg == "tracking:t"
+
+
+def _sip(start_line, call_id):
+    start = f"SIP/2.0 {start_line}" if start_line[0].isdigit() else f"{start_line} sip:b@h SIP/2.0"
+    return f"{start}\r\nCall-ID: {call_id}\r\nCSeq: 1 INVITE\r\n\r\n"
+
+
+@pytest.mark.parametrize("session_field", ["localSessionId", "remoteSessionId"])
+def test_forwarded_call_gets_its_own_digest_section(session_field):
+    session = {session_field: "a1b2c3"}
+    all_logs = {
+        "mobius": [
+            {"@timestamp": "2026-01-01T10:00:00Z", "message": _sip("INVITE", "first@h"),
+             "fields": {"sipCallId": "first@h", **session}},
+            {"@timestamp": "2026-01-01T10:00:20Z", "message": _sip("302 Moved Temporarily", "first@h"),
+             "fields": {"sipCallId": "first@h", **session}},
+            {"@timestamp": "2026-01-01T10:00:21Z", "message": _sip("INVITE", "forward@h"),
+             "fields": {"sipCallId": "forward@h", **session}},
+        ]
+    }
+    digest = build_digest(all_logs, [])
+    assert set(digest["legs"]) == {"sip:first@h", "sip:forward@h"}
+    assert digest["ref_legs"] == {
+        "mobius#0": "sip:first@h",
+        "mobius#1": "sip:first@h",
+        "mobius#2": "sip:forward@h",
+    }
@@ -0,0 +1,109 @@
+import json
+
+import pytest
+
+import log_views
+from artifact_store import ArtifactStore, render_state_template
+from log_views import LOG_VIEWS, category_logs, sip_ladder
+
+ALL_LOGS = {
+    "mobius": [{"@timestamp": "2026-01-01T10:00:00Z", "message": "m"}],
+    "sse_mse": [],
+    "wxcas": [{"@timestamp": "2026-01-01T10:00:01Z", "message": "wé"}],
+}
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    store = ArtifactStore(root=tmp_path)
+    monkeypatch.setattr(log_views, "artifact_store", store)
+    return store
+
+
+class TestCategoryViews:
+    def test_views_from_an_inline_value(self):
+        state = {"all_logs": json.dumps(ALL_LOGS)}
+        assert json.loads(category_logs(state, "mobius")) == ALL_LOGS["mobius"]
+        assert json.loads(category_logs(state, "wxcas")) == ALL_LOGS["wxcas"]
+        assert category_logs(state, "sse_mse") == "[]"
+
+    def test_views_from_an_artifact_reference(self, store):
+        state = {"all_logs": store.put(json.dumps(ALL_LOGS))}
+        assert json.loads(LOG_VIEWS["wxcas_logs"](state)) == ALL_LOGS["wxcas"]
+
+    def test_parsed_once_per_value(self, store, monkeypatch):
+        state = {"all_logs": store.put(json.dumps({**ALL_LOGS, "sse_mse": [{"message": "once"}]}))}
+        calls = []
+        split = log_views._split_categories
+        monkeypatch.setattr(log_views, "_split_categories", lambda text: calls.append(1) or split(text))
+        for key in LOG_VIEWS:
+            LOG_VIEWS[key](state)
+        assert len(calls) == 1
+
+    @pytest.mark.parametrize(
+        "state, expected",
+        [
+            ({}, ""),
+            ({"all_logs": ""}, ""),
+            ({"all_logs": "not json"}, "[]"),
+            ({"all_logs": "[]"}, "[]"),
+        ],
+    )
+    def test_missing_or_malformed(self, state, expected):
+        assert category_logs(state, "mobius") == expected
+
+    def test_views_in_templates(self):
+        state = {"all_logs": json.dumps(ALL_LOGS)}
+        rendered = render_state_template("M={mobius_logs} S={sse_mse_logs}", state, views=LOG_VIEWS)
+        assert rendered == f"M={json.dumps(ALL_LOGS['mobius'], separators=(',', ':'))} S=[]"
+
+
+def _sip(start_line: str, cseq: str) -> str:
+    return f"{start_line}\r\nCall-ID: ladder@h\r\nCSeq: {cseq}\r\n\r\n"
+
+
+LADDER_LOGS = {
+    "mobius": [
+        {"@timestamp": "2026-01-01T10:00:00Z", "message": _sip("INVITE sip:bob@h SIP/2.0", "1 INVITE")},
+        {"@timestamp": "2026-01-01T10:00:03Z", "message": "not sip"},
+    ],
+    "sse_mse": [
+        # Same INVITE logged again on receipt
+        {"@timestamp": "2026-01-01T10:00:01Z", "message": _sip("INVITE sip:bob@h SIP/2.0", "1 INVITE")},
+        {"@timestamp": "2026-01-01T10:00:02Z", "message": _sip("SIP/2.0 480 Temporarily Unavailable", "1 INVITE")},
+    ],
+    "wxcas": [],
+}
+
+
+class TestSipLadder:
+    def test_time_ordered_and_deduplicated(self):
+        lines = sip_ladder({"all_logs": json.dumps(LADDER_LOGS)}).splitlines()
+        assert len(lines) == 2
+        assert lines[0].startswith("2026-01-01T10:00:00Z [Mobius]") and "INVITE" in lines[0]
+        assert lines[1].startswith("2026-01-01T10:00:02Z [SSE/MSE]") and "480" in lines[1]
+
+    def test_caps_lines(self, monkeypatch):
+        monkeypatch.setattr(log_views, "SIP_LADDER_MAX_LINES", 1)
+        state = {"all_logs": json.dumps({**LADDER_LOGS, "wxcas": [{"message": "cap"}]})}
+        assert sip_ladder(state).splitlines()[-1] == "[... 1 later SIP messages omitted ...]"
+
+    def test_empty(self):
+        assert sip_ladder({}) == ""
+        assert sip_ladder({"all_logs": json.dumps({"mobius": [{"message": "no sip"}]})}) == ""
+
+    def test_cached_per_value(self, monkeypatch):
+        calls = []
+        render = log_views._render_ladder
+        monkeypatch.setattr(log_views, "_render_ladder", lambda state: calls.append(1) or render(state))
+        a = {"all_logs": json.dumps({**LADDER_LOGS, "wxcas": [{"message": "a"}]})}
+        b = {"all_logs": json.dumps({**LADDER_LOGS, "wxcas": [{"message": "b"}]})}
+        # Interleaved sessions both stay cached
+        assert sip_ladder(a) == sip_ladder(b) == sip_ladder(a) == sip_ladder(b)
+        assert len(calls) == 2
+
+    def test_cache_is_bounded(self, monkeypatch):
+        monkeypatch.setattr(log_views, "_PARSED_CACHE_MAX_ENTRIES", 2)
+        for i in range(4):
+            sip_ladder({"all_logs": json.dumps({**LADDER_LOGS, "wxcas": [{"message": f"bound{i}"}]})})
+        assert len(log_views._ladders) <= 2
@@ -0,0 +1,91 @@
+import pytest
+
+from analyze_agent_v2.reference_index import (
+    MOBIUS_ERROR_INDEX,
+    MobiusErrorIndex,
+    render_mobius_error_refs,
+    scan_mobius_errors,
+)
+
+
+def _keys(error_id: str) -> list[str]:
+    return [entry.key for entry in MOBIUS_ERROR_INDEX.lookup(error_id)]
+
+
+class TestMobiusErrorLookup:
+    def test_reference_is_indexed(self):
+        assert MOBIUS_ERROR_INDEX.by_code
+        assert MOBIUS_ERROR_INDEX.timers
+
+    @pytest.mark.parametrize(
+        "error_id, expected",
+        [
+            ("101", ["mobius-error 101"]),
+            ("mobius-error 117", ["mobius-error 117"]),
+            ("Mobius_Error 112", ["mobius-error 112"]),
+            ("503 registration", ["503 registration"]),
+            ("503 unregistration", ["503 unregistration"]),
+            ("501 unregistration", ["501 unregistration"]),
+            ("501 registration", ["501 registration"]),
+            ("HTTP 404 unregistration", ["404 unregistration"]),
+            ("400 calls", ["400 calls"]),
+            ("501 call", ["501 calls"]),
+            ("503 service not ready", ["503 service"]),
+            ("429", ["429"]),
+        ],
+    )
+    def test_lookup(self, error_id, expected):
+        assert _keys(error_id) == expected
+
+    def test_http_status_prefix_skips_code_match(self):
+        # "HTTP 101" is a status, not mobius-error 101 (and no 101 status entry exists)
+        assert _keys("HTTP 101") == []
+
+    def test_bare_status_returns_every_context(self):
+        keys = _keys("503")
+        assert {"503 registration", "503 unregistration", "503 service"} <= set(keys)
+
+    def test_unknown_context_word_falls_back_to_status(self):
+        # "preregistration" is not the word "registration"
+        assert _keys("503 preregistration") == _keys("503")
+
+    @pytest.mark.parametrize("error_id", ["", "timeout", "12", "999"])
+    def test_unknown_ids(self, error_id):
+        assert MOBIUS_ERROR_INDEX.lookup(error_id) == []
+
+
+class TestFromMarkdown:
+    def test_parses_codes_contexts_and_fields(self):
+        index = MobiusErrorIndex.from_markdown(
+            "## Registration errors\n"
+            "### 403 FORBIDDEN — mobius-error 101: Per-user device limit exceeded\n"
+            "**What it means:** Too many devices.\n"
+            "**Root cause direction:**\n"
+            "- stale devices\n"
+            "### 503 SERVICE UNAVAILABLE (unregistration)\n"
+            "**What it means:** Backend down.\n"
+            "## Timers (keepalive)\n"
+            "keepalive 30s\n"
+        )
+        assert index.by_code["101"].context == "registration"
+        assert index.by_code["101"].meaning == "Too many devices."
+        assert index.by_code["101"].root_cause == "- stale devices"
+        assert [e.key for e in index.lookup("503 unregistration")] == ["503 unregistration"]
+        assert index.timers == "keepalive 30s"
+
+
+class TestScan:
+    def test_unregistration_messages_resolve_to_unregistration_entries(self):
+        found = scan_mobius_errors([
+            {"message": "DELETE /devices unregistration failed: Error code: 503"},
+            {"message": "POST /devices registration failed", "fields": {"response_status": 503}},
+        ])
+        assert found == {"503 unregistration": 1, "503 registration": 1}
+        refs = render_mobius_error_refs(found)
+        assert "(unregistration)" in refs and "(registration)" in refs
+
+    def test_status_explained_by_code_is_not_repeated(self):
+        found = scan_mobius_errors([
+            {"message": 'call failed {"mobius-error": 117} 503 SERVICE UNAVAILABLE'},
+        ])
+        assert found == {"mobius-error 117": 1}
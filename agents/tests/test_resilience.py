@@ -0,0 +1,342 @@
+import asyncio
+import threading
+import time
+
+import pytest
+from opensearchpy.exceptions import ConnectionError as OpenSearchConnectionError
+from opensearchpy.exceptions import TransportError
+
+from search_agent_v2 import resilience
+from search_agent_v2.resilience import (
+    BREAKER_FAILURE_THRESHOLD,
+    INVESTIGATION_BUDGET_SECS,
+    CircuitOpenError,
+    ClusterScheduler,
+    ClusterState,
+    Deadline,
+    DeadlineExceeded,
+    call_hedged,
+    call_with_resilience,
+    cluster_registry,
+    investigation_budget_secs,
+    start_investigation_deadline,
+)
+
+TIMEOUT = OpenSearchConnectionError("N/A", "timed out", None)
+BAD_QUERY = TransportError(400, "parsing_exception", {})
+
+
+def _open(cluster: ClusterState) -> None:
+    for _ in range(BREAKER_FAILURE_THRESHOLD):
+        assert cluster.allow_request() == (True, False)
+        cluster.record_failure(TIMEOUT)
+
+
+@pytest.fixture
+def half_open(monkeypatch):
+    """The breaker turns half-open as soon as it opens."""
+    monkeypatch.setattr(resilience, "BREAKER_OPEN_SECS", 0)
+
+
+class TestCircuitBreaker:
+    def test_opens_after_consecutive_unhealthy_failures(self):
+        cluster = ClusterState("u")
+        for _ in range(BREAKER_FAILURE_THRESHOLD - 1):
+            cluster.record_failure(TIMEOUT)
+        assert cluster.state == "closed"
+        cluster.record_failure(TIMEOUT)
+        assert cluster.state == "open"
+        assert cluster.allow_request() == (False, False)
+        assert cluster.snapshot()["rejected_while_open"] == 1
+
+    def test_success_resets_the_failure_count(self):
+        cluster = ClusterState("u")
+        for _ in range(BREAKER_FAILURE_THRESHOLD - 1):
+            cluster.record_failure(TIMEOUT)
+        cluster.record_success()
+        cluster.record_failure(TIMEOUT)
+        assert cluster.state == "closed"
+
+    def test_bad_query_is_not_a_health_signal(self):
+        cluster = ClusterState("u")
+        for _ in range(BREAKER_FAILURE_THRESHOLD - 1):
+            cluster.record_failure(TIMEOUT)
+        cluster.record_failure(BAD_QUERY, unhealthy=False)
+        cluster.record_failure(TIMEOUT)
+        assert cluster.state == "open"
+        assert cluster.snapshot()["failures"] == BREAKER_FAILURE_THRESHOLD + 1
+
+    @pytest.mark.parametrize(
+        "outcome",
+        [
+            lambda c: c.record_success(),
+            lambda c: c.record_failure(BAD_QUERY, unhealthy=False),
+            lambda c: c.record_failure(TIMEOUT),
+        ],
+    )
+    def test_requests_admitted_before_opening_leave_it_open(self, outcome):
+        cluster = ClusterState("u")
+        _open(cluster)
+        outcome(cluster)
+        assert cluster.state == "open"
+
+    def test_single_trial_when_half_open(self, half_open):
+        cluster = ClusterState("u")
+        _open(cluster)
+        assert cluster.state == "half_open"
+        assert cluster.allow_request() == (True, True)
+        assert cluster.allow_request() == (False, False)
+
+    @pytest.mark.parametrize(
+        "outcome, state",
+        [
+            (lambda c: c.record_success(trial=True), "closed"),
+            # The cluster answered: it is reachable again
+            (lambda c: c.record_failure(BAD_QUERY, unhealthy=False, trial=True), "closed"),
+        ],
+    )
+    def test_trial_outcome_closes(self, half_open, outcome, state):
+        cluster = ClusterState("u")
+        _open(cluster)
+        cluster.allow_request()
+        outcome(cluster)
+        assert cluster.state == state
+        assert cluster.allow_request() == (True, False)
+
+    def test_failed_trial_reopens(self, monkeypatch):
+        cluster = ClusterState("u")
+        _open(cluster)
+        monkeypatch.setattr(resilience, "BREAKER_OPEN_SECS", 0)
+        assert cluster.allow_request() == (True, True)
+        monkeypatch.setattr(resilience, "BREAKER_OPEN_SECS", 30)
+        cluster.record_failure(TIMEOUT, trial=True)
+        assert cluster.state == "open"
+
+    def test_straggler_outcomes_do_not_settle_the_trial(self, half_open):
+        cluster = ClusterState("u")
+        _open(cluster)
+        assert cluster.allow_request() == (True, True)
+        cluster.record_success()
+        cluster.record_failure(TIMEOUT)
+        # The trial is still out: no second trial, breaker not closed
+        assert cluster.allow_request() == (False, False)
+        assert cluster.state == "half_open"
+
+    def test_abandoned_trial_lets_the_next_request_try(self, half_open):
+        cluster = ClusterState("u")
+        _open(cluster)
+        cluster.allow_request()
+        cluster.abandon_trial()
+        assert cluster.allow_request() == (True, True)
+
+
+class TestDeadline:
+    def test_request_timeout_is_capped(self):
+        assert Deadline(1000).request_timeout() == resilience.REQUEST_TIMEOUT_SECS
+        assert 4 < Deadline(5).request_timeout() <= 5
+
+    def test_exhausted_budget_raises(self):
+        deadline = Deadline(0)
+        assert deadline.expired
+        with pytest.raises(DeadlineExceeded):
+            deadline.request_timeout()
+
+    @pytest.mark.parametrize(
+        "value, budget",
+        [
+            ("", INVESTIGATION_BUDGET_SECS),
+            ("900", 900),
+            ("12.5", 12.5),
+            ("0", INVESTIGATION_BUDGET_SECS),
+            ("x", INVESTIGATION_BUDGET_SECS),
+        ],
+    )
+    def test_budget_from_env(self, monkeypatch, value, budget):
+        monkeypatch.setenv("OPENSEARCH_INVESTIGATION_BUDGET_SECS", value)
+        assert investigation_budget_secs() == budget
+
+    def test_investigation_deadline_uses_the_configured_budget(self, monkeypatch):
+        monkeypatch.setenv("OPENSEARCH_INVESTIGATION_BUDGET_SECS", "900")
+
+        async def run():
+            start_investigation_deadline()
+            return resilience.current_deadline().budget_secs
+
+        assert asyncio.run(run()) == 900
+
+
+class TestClusterScheduler:
+    def test_in_flight_limit(self):
+        async def run():
+            scheduler = ClusterScheduler(max_in_flight=2, rate_per_sec=1000, burst=10)
+            await scheduler.acquire(Deadline(10))
+            await scheduler.acquire(Deadline(10))
+            third = asyncio.create_task(scheduler.acquire(Deadline(10)))
+            await asyncio.sleep(resilience.SCHEDULER_POLL_SECS * 2)
+            blocked = not third.done()
+            scheduler.release()
+            await asyncio.wait_for(third, 1)
+            return scheduler, blocked
+
+        scheduler, blocked = asyncio.run(run())
+        assert blocked
+        assert scheduler.in_flight == 2
+
+    def test_token_bucket_paces_past_the_burst(self):
+        async def run():
+            scheduler = ClusterScheduler(max_in_flight=10, rate_per_sec=20, burst=2)
+            started = time.monotonic()
+            for _ in range(3):
+                await scheduler.acquire(Deadline(10))
+            return time.monotonic() - started
+
+        # Third request waits for a token at 20/s
+        assert asyncio.run(run()) >= 0.04
+
+    def test_throttling_halves_the_rate_then_recovers(self):
+        scheduler = ClusterScheduler(max_in_flight=10, rate_per_sec=20, burst=2)
+        scheduler.in_flight = 2
+        scheduler.release(throttled=True)
+        assert scheduler.snapshot()["rate_per_sec"] == 10
+        scheduler.release()
+        assert scheduler.snapshot()["rate_per_sec"] == 10 + resilience.CLUSTER_RATE_RECOVERY_PER_SUCCESS
+        assert scheduler.throttled == 1
+
+    def test_queue_wait_respects_the_deadline(self):
+        async def run():
+            scheduler = ClusterScheduler(max_in_flight=1, rate_per_sec=1000, burst=10)
+            await scheduler.acquire(Deadline(10))
+            await scheduler.acquire(Deadline(0.5))
+
+        with pytest.raises(DeadlineExceeded):
+            asyncio.run(run())
+
+
+class _Request:
+    """Blocking request that raises the queued errors, then returns "ok"."""
+
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.timeouts = []
+
+    def __call__(self, timeout):
+        self.timeouts.append(timeout)
+        if self.errors:
+            raise self.errors.pop(0)
+        return "ok"
+
+
+class TestCallWithResilience:
+    @pytest.fixture(autouse=True)
+    def _no_backoff(self, monkeypatch):
+        monkeypatch.setattr(resilience, "_backoff_delay", lambda attempt: 0)
+
+    @staticmethod
+    def _call(url, request):
+        return asyncio.run(call_with_resilience(url, request))
+
+    def test_retries_retryable_errors(self):
+        request = _Request(TIMEOUT, TransportError(503, "unavailable", {}))
+        assert self._call("https://retry.example/", request) == "ok"
+        snapshot = cluster_registry.get("https://retry.example/").snapshot()
+        assert (snapshot["requests"], snapshot["failures"], snapshot["retries"]) == (3, 2, 2)
+        assert snapshot["scheduler"]["in_flight"] == 0
+
+    def test_does_not_retry_a_bad_query(self):
+        request = _Request(BAD_QUERY)
+        with pytest.raises(TransportError):
+            self._call("https://bad-query.example/", request)
+        assert len(request.timeouts) == 1
+
+    def test_raises_the_last_error_when_retries_run_out(self):
+        request = _Request(*[TIMEOUT] * resilience.RETRY_MAX_ATTEMPTS)
+        with pytest.raises(OpenSearchConnectionError):
+            self._call("https://down.example/", request)
+
+    def test_open_breaker_fails_fast(self):
+        url = "https://open.example/"
+        _open(cluster_registry.get(url))
+        request = _Request()
+        with pytest.raises(CircuitOpenError):
+            self._call(url, request)
+        assert request.timeouts == []
+        assert cluster_registry.get(url).scheduler.in_flight == 0
+
+    def test_trial_success_closes_the_breaker(self, half_open):
+        url = "https://recovered.example/"
+        _open(cluster_registry.get(url))
+        assert self._call(url, _Request()) == "ok"
+        assert cluster_registry.get(url).state == "closed"
+
+
+class _SlowFirst:
+    """Request whose first call blocks until released; later calls return at once."""
+
+    def __init__(self):
+        self.calls = 0
+        self.release = threading.Event()
+
+    def __call__(self, timeout):
+        self.calls += 1
+        if self.calls == 1:
+            self.release.wait(5)
+            return "primary"
+        return "hedge"
+
+
+class TestHedging:
+    @staticmethod
+    def _warm(url, requests=20, latency=0.01):
+        cluster = cluster_registry.get(url)
+        for _ in range(max(requests, resilience.LATENCY_MIN_SAMPLES)):
+            cluster.record_first_page_latency(latency)
+        for _ in range(requests):
+            cluster.record_success()
+        return cluster
+
+    @staticmethod
+    def _call(url, request):
+        async def run():
+            try:
+                return await call_hedged(url, request)
+            finally:
+                request.release.set()
+
+        return asyncio.run(run())
+
+    def test_p95_needs_enough_samples(self):
+        cluster = ClusterState("u")
+        for _ in range(resilience.LATENCY_MIN_SAMPLES - 1):
+            cluster.record_first_page_latency(1.0)
+        assert cluster.latency_p95() is None
+        cluster.record_first_page_latency(2.0)
+        assert cluster.latency_p95() == 2.0
+
+    def test_disabled_by_default(self, monkeypatch):
+        monkeypatch.delenv("OPENSEARCH_HEDGE_FIRST_PAGE", raising=False)
+        url = "https://hedge-off.example/"
+        cluster = self._warm(url)
+        request = _SlowFirst()
+        request.release.set()
+        assert asyncio.run(call_hedged(url, request)) == "primary"
+        assert request.calls == 1 and cluster.hedges == 0
+
+    def test_slow_first_page_is_hedged(self, monkeypatch):
+        monkeypatch.setenv("OPENSEARCH_HEDGE_FIRST_PAGE", "true")
+        url = "https://hedge-on.example/"
+        cluster = self._warm(url)
+        request = _SlowFirst()
+        assert self._call(url, request) == "hedge"
+        assert (cluster.hedges, cluster.hedge_wins) == (1, 1)
+
+    def test_hedges_stay_within_budget(self, monkeypatch):
+        monkeypatch.setenv("OPENSEARCH_HEDGE_FIRST_PAGE", "true")
+        url = "https://hedge-budget.example/"
+        # Too few requests for even one hedge at HEDGE_BUDGET_FRACTION
+        cluster = self._warm(url, requests=int(1 / resilience.HEDGE_BUDGET_FRACTION) - 1)
+        request = _SlowFirst()
+        started = time.monotonic()
+        threading.Timer(0.2, request.release.set).start()
+        assert self._call(url, request) == "primary"
+        assert time.monotonic() - started >= 0.2
+        assert cluster.hedges == 0
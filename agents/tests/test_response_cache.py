@@ -0,0 +1,175 @@
+import asyncio
+
+import pytest
+
+from search_agent_v2.agent import negative_search_key
+from search_agent_v2.response_cache import NegativeSearchCache, OpenSearchResponseCache, canonical_query_hash
+
+
+def _window(gte: str, lte: str) -> dict:
+    return {"query": {"bool": {"filter": [{"range": {"@timestamp": {"gte": gte, "lte": lte}}}]}}}
+
+
+PAST_WINDOW = _window("2020-01-01T00:00:00Z", "2020-01-02T00:00:00Z")
+RELATIVE_WINDOW = _window("now-7d/d", "now")
+
+
+class _Fetch:
+    """Counting fetch whose result is released by `gate`."""
+
+    def __init__(self, result=None, error=None):
+        self.calls = 0
+        self.gate = asyncio.Event()
+        self.result = result if result is not None else {"hits": {"hits": []}}
+        self.error = error
+
+    async def __call__(self):
+        self.calls += 1
+        await self.gate.wait()
+        if self.error:
+            raise self.error
+        return self.result
+
+
+class TestKeys:
+    def test_hash_ignores_key_order_and_cursor(self):
+        a = {"size": 10, "query": {"term": {"x": 1}}, "search_after": [1]}
+        b = {"query": {"term": {"x": 1}}, "size": 10}
+        assert canonical_query_hash(a) == canonical_query_hash(b)
+
+    def test_key_separates_index_and_cursor(self):
+        query = {"query": {"term": {"x": 1}}}
+        keys = {
+            OpenSearchResponseCache.make_key("logstash-a", query),
+            OpenSearchResponseCache.make_key("logstash-b", query),
+            OpenSearchResponseCache.make_key("logstash-a", {**query, "search_after": [5, "id"]}),
+        }
+        assert len(keys) == 3
+
+    @pytest.mark.parametrize(
+        "query, ttl",
+        [(PAST_WINDOW, 600), (RELATIVE_WINDOW, 5), ({"query": {"match_all": {}}}, 5)],
+    )
+    def test_ttl_by_window(self, query, ttl):
+        cache = OpenSearchResponseCache(recent_ttl=5, historical_ttl=600)
+        assert cache.ttl_for(query) == ttl
+
+
+class TestStorage:
+    def test_expired_entries_are_dropped(self):
+        cache = OpenSearchResponseCache()
+        cache.put("k", {"v": 1}, ttl=0)
+        assert cache.get("k") is None
+        assert cache.stats()["entries"] == 0
+
+    def test_lru_eviction(self):
+        cache = OpenSearchResponseCache(max_entries=2)
+        cache.put("a", {}, 60)
+        cache.put("b", {}, 60)
+        cache.get("a")
+        cache.put("c", {}, 60)
+        assert cache.get("b") is None
+        assert cache.get("a") is not None and cache.get("c") is not None
+
+
+class TestSingleFlight:
+    def test_concurrent_callers_share_one_fetch(self):
+        async def run():
+            cache = OpenSearchResponseCache()
+            fetch = _Fetch()
+            callers = [asyncio.create_task(cache.get_or_fetch("i", PAST_WINDOW, fetch)) for _ in range(3)]
+            await asyncio.sleep(0)
+            fetch.gate.set()
+            results = await asyncio.gather(*callers)
+            # Served from the cache afterwards
+            again = await cache.get_or_fetch("i", PAST_WINDOW, fetch)
+            return fetch, cache, results, again
+
+        fetch, cache, results, again = asyncio.run(run())
+        assert fetch.calls == 1
+        assert all(result is fetch.result for result in results) and again is fetch.result
+        assert cache.stats() == {"entries": 1, "hits": 1, "misses": 1, "coalesced": 2}
+
+    def test_failures_reach_every_waiter_and_are_not_cached(self):
+        async def run():
+            cache = OpenSearchResponseCache()
+            fetch = _Fetch(error=RuntimeError("boom"))
+            callers = [asyncio.create_task(cache.get_or_fetch("i", PAST_WINDOW, fetch)) for _ in range(2)]
+            await asyncio.sleep(0)
+            fetch.gate.set()
+            outcomes = await asyncio.gather(*callers, return_exceptions=True)
+            return cache, outcomes
+
+        cache, outcomes = asyncio.run(run())
+        assert [type(outcome) for outcome in outcomes] == [RuntimeError, RuntimeError]
+        assert cache.stats()["entries"] == 0
+
+    def test_cancelled_leader_hands_the_fetch_to_a_waiter(self):
+        async def run():
+            cache = OpenSearchResponseCache()
+            fetch = _Fetch()
+            leader = asyncio.create_task(cache.get_or_fetch("i", PAST_WINDOW, fetch))
+            await asyncio.sleep(0)
+            waiter = asyncio.create_task(cache.get_or_fetch("i", PAST_WINDOW, fetch))
+            await asyncio.sleep(0)
+            leader.cancel()
+            await asyncio.sleep(0)
+            fetch.gate.set()
+            result = await waiter
+            return fetch, leader, result
+
+        fetch, leader, result = asyncio.run(run())
+        assert leader.cancelled()
+        assert result is fetch.result
+        assert fetch.calls == 2
+
+
+WINDOW = ("2026-01-01T00:00:00Z", "2026-01-01T01:00:00Z")
+
+
+class TestNegativeCache:
+    def test_recorded_search_is_known_empty(self):
+        cache = NegativeSearchCache()
+        key = negative_search_key("wxcalling", "session_id", None, "abc", "sse_mse", WINDOW)
+        cache.record_empty(key)
+        assert cache.is_known_empty(key)
+        assert cache.skips == 1
+
+    @pytest.mark.parametrize(
+        "other",
+        [
+            # Same value and window, no tag filter
+            ("wxcalling", "session_id", None, "abc", None, WINDOW),
+            # Same field through a different query type
+            ("wxcalling", "match_phrase", "message", "abc", "sse_mse", WINDOW),
+            ("wxcalling-eu", "session_id", None, "abc", "sse_mse", WINDOW),
+            ("wxcalling", "session_id", None, "abd", "sse_mse", WINDOW),
+        ],
+    )
+    def test_other_filters_are_not_suppressed(self, other):
+        cache = NegativeSearchCache()
+        cache.record_empty(negative_search_key("wxcalling", "session_id", None, "abc", "sse_mse", WINDOW))
+        assert not cache.is_known_empty(negative_search_key(*other))
+
+    def test_equivalent_configs_share_a_key(self):
+        # trace_id/unknown both search match_phrase on message
+        assert negative_search_key("i", "match_phrase", None, " abc ", None, None) == negative_search_key(
+            "i", "match_phrase", "message", "abc", None, None,
+        )
+
+    def test_empty_over_the_default_window_covers_narrower_windows(self):
+        cache = NegativeSearchCache()
+        cache.record_empty(negative_search_key("i", "term", "callId.keyword", "abc", "mobius", None))
+        assert cache.is_known_empty(negative_search_key("i", "term", "callId.keyword", "abc", "mobius", WINDOW))
+        assert not cache.is_known_empty(negative_search_key("i", "term", "callId.keyword", "abc", None, WINDOW))
+
+    def test_empty_within_a_window_says_nothing_about_the_default_range(self):
+        cache = NegativeSearchCache()
+        cache.record_empty(negative_search_key("i", "term", "callId.keyword", "abc", None, WINDOW))
+        assert not cache.is_known_empty(negative_search_key("i", "term", "callId.keyword", "abc", None, None))
+
+    def test_entries_expire(self):
+        cache = NegativeSearchCache(ttl=0)
+        key = negative_search_key("i", "term", "callId.keyword", "abc", None, None)
+        cache.record_empty(key)
+        assert not cache.is_known_empty(key)
@@ -0,0 +1,364 @@
+import asyncio
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import pytest
+
+from search_agent_v2 import agent as search_agent
+from search_agent_v2.agent import (
+    ExhaustiveSearchAgent,
+    BOUNDED_EXPANSION_MAX_HITS,
+    ID_TYPE_SEARCH_CONFIG,
+    activity_window_from_buckets,
+    build_expansion_probe,
+    build_query,
+    extract_id_fields_for_llm,
+    negative_search_key,
+    normalize_search_key,
+    pad_time_span,
+    probe_opensearch,
+    resolve_target_indexes,
+    shape_time_range,
+)
+from search_agent_v2.response_cache import negative_cache
+
+
+def _ms(iso: str) -> int:
+    return int(datetime.fromisoformat(iso.replace("Z", "+00:00")).astimezone(timezone.utc).timestamp() * 1000)
+
+
+def _probe_response(count: int, buckets: dict[str, int] | None = None) -> dict:
+    return {
+        "hits": {"total": {"value": count}},
+        "aggregations": {"activity": {"buckets": [
+            {"key": _ms(ts), "doc_count": n} for ts, n in (buckets or {}).items()
+        ]}},
+    }
+
+
+@pytest.fixture(autouse=True)
+def _clear_negative_cache():
+    negative_cache.clear()
+    yield
+    negative_cache.clear()
+
+
+class TestPreflightProbe:
+    SEEDS = [("sess-1", "session_id")]
+
+    def _run(self, monkeypatch, responses: dict[str, dict | None]):
+        requested = []
+
+        async def fake_probe(index, body, preference=None):
+            requested.append(index)
+            return responses.get(index, _probe_response(0))
+
+        monkeypatch.setattr(search_agent, "probe_opensearch", fake_probe)
+        result = asyncio.run(ExhaustiveSearchAgent._preflight_probe(
+            SimpleNamespace(name="test"), self.SEEDS, ["prod"], ["us", "eu"],
+        ))
+        return requested, result
+
+    def test_probes_every_candidate_index_once_per_search(self, monkeypatch):
+        requested, _ = self._run(monkeypatch, {})
+        assert sorted(requested) == [
+            "logstash-wxcalling", "logstash-wxcallingeuc1", "logstash-wxm-app", "logstash-wxm-app-eu1",
+        ]
+
+    def test_restricts_to_regions_with_hits(self, monkeypatch):
+        _, (targets, windows, report) = self._run(monkeypatch, {
+            "logstash-wxm-app": _probe_response(12, {"2026-01-01T10:00:00Z": 12}),
+        })
+        assert targets == [("prod", "us")]
+        assert report["applied"] and report["selected"] == ["prod/us"]
+        assert windows == {"sess-1": ("2026-01-01T08:00:00Z", "2026-01-01T13:00:00Z")}
+
+    def test_failed_probe_keeps_its_targets(self, monkeypatch):
+        _, (targets, _, report) = self._run(monkeypatch, {
+            "logstash-wxm-app": _probe_response(12),
+            "logstash-wxcallingeuc1": None,
+        })
+        assert targets == [("prod", "us"), ("prod", "eu")]
+        assert not report["applied"] and report["failed_indexes"] == ["logstash-wxcallingeuc1"]
+
+    def test_nothing_found_keeps_all_targets_and_records_empty_searches(self, monkeypatch):
+        _, (targets, windows, report) = self._run(monkeypatch, {})
+        assert targets == [("prod", "us"), ("prod", "eu")] and windows == {} and not report["applied"]
+        assert negative_cache.is_known_empty(
+            negative_search_key("logstash-wxcalling", "match_phrase", "message", "sess-1", "sse_mse", None)
+        )
+        # The probe was tag-filtered: an untagged search for the value is still run
+        assert not negative_cache.is_known_empty(
+            negative_search_key("logstash-wxcalling", "match_phrase", "message", "sess-1", None, None)
+        )
+
+    def test_single_candidate_is_kept(self, monkeypatch):
+        async def fake_probe(index, body, preference=None):
+            return _probe_response(0)
+
+        monkeypatch.setattr(search_agent, "probe_opensearch", fake_probe)
+        targets, _, report = asyncio.run(ExhaustiveSearchAgent._preflight_probe(
+            SimpleNamespace(name="test"), self.SEEDS, ["prod"], ["us"],
+        ))
+        assert targets == [("prod", "us")] and not report["applied"]
+
+
+class TestActivityWindow:
+    @staticmethod
+    def _window(buckets: dict[str, int]):
+        start, end = activity_window_from_buckets({_ms(ts): n for ts, n in buckets.items()})
+        return start[:16], end[:16]
+
+    def test_pads_one_cluster(self):
+        assert self._window({"2026-01-01T10:00:00Z": 5, "2026-01-01T11:00:00Z": 7}) == (
+            "2026-01-01T08:00", "2026-01-01T14:00",
+        )
+
+    def test_keeps_a_separate_retry_cluster(self):
+        # Call at 10:00, retried at 18:00: both are searched
+        assert self._window({"2026-01-01T10:00:00Z": 40, "2026-01-01T18:00:00Z": 6}) == (
+            "2026-01-01T08:00", "2026-01-01T21:00",
+        )
+
+    def test_ignores_a_stray_log(self):
+        assert self._window({"2025-12-28T03:00:00Z": 1, "2026-01-01T10:00:00Z": 40}) == (
+            "2026-01-01T08:00", "2026-01-01T13:00",
+        )
+
+    def test_busiest_cluster_is_kept_even_when_small(self):
+        assert self._window({"2026-01-01T10:00:00Z": 1, "2026-01-01T20:00:00Z": 2}) == (
+            "2026-01-01T18:00", "2026-01-01T23:00",
+        )
+
+    def test_no_activity(self):
+        assert activity_window_from_buckets({}) is None
+        assert activity_window_from_buckets({_ms("2026-01-01T10:00:00Z"): 0}) is None
+
+
+def _hit(ts: str, message: str = "", fields: dict | None = None, **top_level) -> dict:
+    return {"_source": {"@timestamp": ts, "message": message, "fields": fields or {}, **top_level}}
+
+
+class TestIdTimeSpans:
+    HITS = [
+        _hit(
+            "2026-01-01T10:00:00Z",
+            fields={"localSessionId": "sess-a", "USER_ID": "00000000-0000-0000-0000-000000000000"},
+        ),
+        _hit("2026-01-01T10:05:00Z", fields={"localSessionId": ["sess-a"], "mobiusCallId": "mc-1"}),
+        _hit("2026-01-01T12:00:00Z", callId="SSE01@10.0.0.1"),
+        _hit(
+            "2026-01-01T11:00:00Z",
+            "INVITE sip:b@h SIP/2.0\r\nCall-ID: sip-1@h\r\nSession-ID: sess-b;remote=sess-c\r\n\r\n",
+        ),
+        _hit("2026-01-01T11:30:00Z", "trace ab12cd in text only"),
+    ]
+
+    def test_extracts_ids_and_drops_dummies(self):
+        first, second, wxcalling, sip, _ = extract_id_fields_for_llm(self.HITS)
+        assert first["localSessionId"] == "sess-a" and "USER_ID" not in first
+        assert second["localSessionId"] == "sess-a" and second["mobiusCallId"] == "mc-1"
+        assert wxcalling["callId"] == "SSE01@10.0.0.1"
+        assert sip["sip"]["call_id"] == "sip-1@h" and sip["sip"]["remote_session_id"] == "sess-c"
+
+    def test_each_id_gets_the_span_of_its_own_entries(self):
+        spans = {}
+        extracted = {
+            "session_ids": ["sess-a", "sess-c"],
+            "sse_call_ids": ["SSE01@10.0.0.1"],
+            "trace_ids": ["ab12cd"],
+        }
+        ExhaustiveSearchAgent._record_id_time_spans(extract_id_fields_for_llm(self.HITS), extracted, spans)
+        assert spans == {
+            "sess-a": ("2026-01-01T10:00:00Z", "2026-01-01T10:05:00Z"),
+            "sess-c": ("2026-01-01T11:00:00Z", "2026-01-01T11:00:00Z"),
+            "SSE01@10.0.0.1": ("2026-01-01T12:00:00Z", "2026-01-01T12:00:00Z"),
+            # Found only in message text: the page's span
+            "ab12cd": ("2026-01-01T10:00:00Z", "2026-01-01T12:00:00Z"),
+        }
+
+    def test_spans_widen_across_pages(self):
+        spans = {"sess-a": ("2026-01-01T09:00:00Z", "2026-01-01T09:30:00Z")}
+        ExhaustiveSearchAgent._record_id_time_spans(
+            extract_id_fields_for_llm(self.HITS[:2]), {"session_ids": ["sess-a"]}, spans,
+        )
+        assert spans["sess-a"] == ("2026-01-01T09:00:00Z", "2026-01-01T10:05:00Z")
+
+    def test_entries_without_timestamps_record_nothing(self):
+        spans = {}
+        ExhaustiveSearchAgent._record_id_time_spans([{"localSessionId": "x"}], {"session_ids": ["x"]}, spans)
+        assert spans == {}
+
+    def test_pad_time_span(self):
+        start, end = pad_time_span(("2026-01-01T10:00:00Z", "2026-01-01T10:05:00Z"))
+        assert (start[:16], end[:16]) == ("2026-01-01T08:00", "2026-01-01T12:05")
+        assert pad_time_span(("yesterday", "today")) is None
+
+
+class TestBoundedExpansion:
+    TASK = {
+        "index": "logstash-wxm-app",
+        "id_val": "user-1",
+        "query": build_query("user-1", "term", "fields.USER_ID.keyword", "mobius"),
+    }
+
+    @staticmethod
+    def _bucket(key, first=None, last=None):
+        bucket = {"key": key, "doc_count": 1}
+        if first:
+            bucket["first_seen"] = {"value_as_string": first}
+            bucket["last_seen"] = {"value_as_string": last}
+        return bucket
+
+    def _run(self, monkeypatch, response, spans=None):
+        sent = []
+
+        async def fake_probe(index, body, preference=None):
+            sent.append(body)
+            return response
+
+        monkeypatch.setattr(search_agent, "probe_opensearch", fake_probe)
+        spans = {} if spans is None else spans
+        result = asyncio.run(ExhaustiveSearchAgent._run_bounded_expansion(
+            SimpleNamespace(name="test"), self.TASK, spans,
+        ))
+        return sent, spans, result
+
+    def test_probe_fetches_no_hits(self):
+        probe = build_expansion_probe(self.TASK["query"])
+        assert probe["size"] == 0 and probe["query"] == self.TASK["query"]["query"]
+        assert "fields.mobiusCallId.keyword" in probe["aggs"]
+
+    def test_discovers_ids_with_their_own_windows(self, monkeypatch):
+        response = {
+            "hits": {"total": {"value": 40}},
+            "aggregations": {
+                "fields.mobiusCallId.keyword": {"buckets": [
+                    self._bucket("mc-1", "2026-01-01T10:00:00Z", "2026-01-01T10:02:00Z"),
+                    self._bucket("null"),
+                ]},
+                "fields.localSessionId.keyword": {"buckets": [
+                    self._bucket("sess-1", "2026-01-01T10:00:00Z", "2026-01-01T10:01:00Z"),
+                ]},
+                "fields.remoteSessionId.keyword": {"buckets": [
+                    self._bucket("sess-1", "2026-01-01T09:59:00Z", "2026-01-01T10:03:00Z"),
+                ]},
+            },
+        }
+        sent, spans, (extracted, total, skip) = self._run(monkeypatch, response)
+        assert sent[0]["size"] == 0
+        assert (total, skip) == (40, None)
+        # Local and remote session IDs merge under one key (deduplicated by _merge_extracted_ids)
+        assert extracted["mobius_call_ids"] == ["mc-1"] and set(extracted["session_ids"]) == {"sess-1"}
+        assert spans == {
+            "mc-1": ("2026-01-01T10:00:00Z", "2026-01-01T10:02:00Z"),
+            "sess-1": ("2026-01-01T09:59:00Z", "2026-01-01T10:03:00Z"),
+        }
+
+    def test_too_broad_ids_are_not_expanded(self, monkeypatch):
+        response = {
+            "hits": {"total": {"value": BOUNDED_EXPANSION_MAX_HITS + 1}},
+            "aggregations": {"fields.mobiusCallId.keyword": {"buckets": [self._bucket("mc-1")]}},
+        }
+        _, spans, result = self._run(monkeypatch, response)
+        assert result == ({}, BOUNDED_EXPANSION_MAX_HITS + 1, "hit_cap") and spans == {}
+
+    def test_failed_probe(self, monkeypatch):
+        _, _, result = self._run(monkeypatch, None)
+        assert result == ({}, 0, "probe_failed")
+
+
+class TestNormalizeSearchKey:
+    @staticmethod
+    def _plan_keys(id_type: str, value: str = "abc", time_range=None) -> set[tuple]:
+        return {
+            normalize_search_key(index, c["query_type"], c.get("field"), value, c["tag_filter"], time_range)
+            for c in ID_TYPE_SEARCH_CONFIG[id_type]
+            for index in resolve_target_indexes(c["service"], [("prod", "us")])
+        }
+
+    @pytest.mark.parametrize("a, b", [("call_id", "sse_call_id"), ("trace_id", "unknown")])
+    def test_equivalent_id_types_collapse(self, a, b):
+        assert self._plan_keys(a) == self._plan_keys(b)
+
+    def test_match_phrase_defaults_to_message(self):
+        assert normalize_search_key("i", "match_phrase", None, " abc ", None, None) == normalize_search_key(
+            "i", "match_phrase", "message", "abc", None, None,
+        )
+
+    def test_unknown_query_type_falls_back_like_build_query(self):
+        assert normalize_search_key("i", "regex", "x", "abc", None, None) == normalize_search_key(
+            "i", "match_phrase", "message", "abc", None, None,
+        )
+        assert build_query("abc", "regex", "x", None)["query"] == build_query("abc", "match_phrase", None, None)["query"]
+
+    @pytest.mark.parametrize(
+        "other",
+        [
+            ("i", "term", "callId.keyword", "abc", "mobius", None, "fetch"),
+            ("i", "term", "callId.keyword", "abc", None, ("2026-01-01T00:00:00Z", "2026-01-01T01:00:00Z"), "fetch"),
+            ("i", "term", "callId.keyword", "abc", None, None, "bounded"),
+            ("i", "term", "sipCallId.keyword", "abc", None, None, "fetch"),
+        ],
+    )
+    def test_different_searches_stay_distinct(self, other):
+        assert normalize_search_key("i", "term", "callId.keyword", "abc", None, None) != normalize_search_key(*other)
+
+    def test_int_regions_sharing_an_index_collapse(self):
+        config = ID_TYPE_SEARCH_CONFIG["call_id"][0]
+        indexes = resolve_target_indexes(config["service"], [("int", "us"), ("int", "eu")])
+        keys = {
+            normalize_search_key(index, config["query_type"], config["field"], "abc", config["tag_filter"], None)
+            for index in indexes
+        }
+        assert indexes == ["logstash-wxcalling-int", "logstash-wxcalling-int"] and len(keys) == 1
+
+
+class _RecordingClient:
+    def __init__(self, response: dict):
+        self.response = response
+        self.calls: list[dict] = []
+
+    def search(self, **kwargs):
+        self.calls.append(kwargs)
+        return self.response
+
+
+class TestQueryShaping:
+    @pytest.mark.parametrize(
+        "window, shaped",
+        [
+            (
+                ("2026-01-01T10:07:13.412Z", "2026-01-01T10:52:00.001+00:00"),
+                ("2026-01-01T10:00:00Z", "2026-01-01T11:00:00Z"),
+            ),
+            # Already on boundaries: unchanged
+            (("2026-01-01T10:00:00Z", "2026-01-01T10:15:00Z"), ("2026-01-01T10:00:00Z", "2026-01-01T10:15:00Z")),
+            # Naive timestamps are UTC
+            (("2026-01-01T10:14:59", "2026-01-01T10:15:01"), ("2026-01-01T10:00:00Z", "2026-01-01T10:30:00Z")),
+            (("now-7d/d", "now"), ("now-7d/d", "now")),
+            (None, None),
+        ],
+    )
+    def test_shape_time_range(self, window, shaped):
+        assert shape_time_range(window) == shaped
+
+    def test_nearby_windows_share_one_range_filter(self):
+        a = shape_time_range(("2026-01-01T10:01:00Z", "2026-01-01T10:20:00Z"))
+        b = shape_time_range(("2026-01-01T10:03:30Z", "2026-01-01T10:29:59Z"))
+        assert build_query("abc", "term", "callId.keyword", None, a) == build_query("abc", "term", "callId.keyword", None, b)
+
+    def test_filters_only_no_scoring(self):
+        query = build_query("abc", "session_id", None, "sse_mse")
+        assert list(query["query"]) == ["bool"] and list(query["query"]["bool"]) == ["filter"]
+        assert {"terms": {"tags": ["sse", "mse"]}} in query["query"]["bool"]["filter"]
+
+    def test_probe_uses_request_cache_and_preference(self, monkeypatch):
+        client = _RecordingClient(_probe_response(3))
+        monkeypatch.setattr(search_agent, "get_opensearch_token", lambda is_int: "token")
+        monkeypatch.setattr(search_agent, "_make_client", lambda url, token: client)
+        body = {"query": {"match_all": {}}, "size": 0}
+        response = asyncio.run(probe_opensearch("logstash-wxm-app", body, preference="investigation-1"))
+        assert response["hits"]["total"]["value"] == 3
+        [call] = client.calls
+        assert call["request_cache"] is True and call["preference"] == "investigation-1" and call["body"] is body
@@ -0,0 +1,86 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from analyze_agent_v2 import section_index
+from analyze_agent_v2.section_index import SectionIndex, lookup_reference_sections, split_sections
+
+DOC = """# SIP
+intro
+## Responses
+| Code | Meaning |
+|------|---------|
+| 486 | Busy Here |
+| 487 | Request Terminated |
+## Hold
+INVITE with a=sendonly, sent by Mobius
+```
+# not a heading
+```
+"""
+
+
+def _context(state=None):
+    return SimpleNamespace(state=state or {})
+
+
+class TestSplitSections:
+    def test_one_section_per_heading(self):
+        sections = split_sections("doc.md", DOC)
+        assert [s.heading for s in sections] == ["SIP", "SIP > Responses", "SIP > Hold"]
+        hold = sections[2]
+        assert "# not a heading" in hold.text
+        assert {"method:INVITE", "endpoint:mobius"} <= hold.keys
+        assert {"code:486", "code:487"} <= sections[1].keys
+
+    def test_excerpt_keeps_only_matching_code_rows(self):
+        responses = split_sections("doc.md", DOC)[1]
+        excerpt = responses.excerpt({"486"})
+        assert "| 486 |" in excerpt and "| 487 |" not in excerpt and "| Code |" in excerpt
+        assert responses.excerpt(set()) == responses.text
+
+
+class TestSearch:
+    def test_ranked_by_matched_keys(self):
+        index = SectionIndex()
+        index.add_document("doc.md", DOC)
+        ranked = [s.heading for s, _ in index.search({"486"}, set(), set(), set())]
+        assert ranked[0] == "SIP > Responses"
+        topics = [s.heading for s, _ in index.search(set(), set(), set(), {"hold"})]
+        assert topics == ["SIP > Hold"]
+
+
+class TestLookup:
+    @pytest.fixture
+    def index(self, monkeypatch):
+        index = SectionIndex()
+        index.add_document("doc.md", DOC)
+        index.add_document("long.md", "# Hold timers\n" + "hold details line\n" * 200)
+        monkeypatch.setattr(section_index, "REFERENCE_SECTION_INDEX", index)
+        return index
+
+    def test_explicit_query(self, index):
+        result = lookup_reference_sections(_context(), sip_codes=["486", "x"], sip_methods=["invite"])
+        assert result["query"]["sip_codes"] == ["486"] and result["query"]["sip_methods"] == ["INVITE"]
+        assert result["sections"][0]["heading"] == "SIP > Responses"
+
+    def test_total_text_is_capped(self, index, monkeypatch):
+        monkeypatch.setattr(section_index, "LOOKUP_MAX_CHARS", 500)
+        result = lookup_reference_sections(_context(), topics=["hold"])
+        assert sum(len(s["text"]) for s in result["sections"]) <= 500
+
+    def test_oversized_first_section_is_truncated(self, index, monkeypatch):
+        monkeypatch.setattr(section_index, "LOOKUP_MAX_CHARS", 300)
+        result = lookup_reference_sections(_context(), topics=["hold timers"])
+        first = result["sections"][0]
+        assert first["source"] == "long.md"
+        assert len(first["text"]) == 300
+        assert first["text"].endswith("[... section truncated ...]")
+
+    def test_no_arguments_uses_the_observed_digest(self, index):
+        busy = "SIP/2.0 486 Busy Here\r\nCall-ID: a@h\r\nCSeq: 1 INVITE\r\n\r\n"
+        state = {"all_logs": json.dumps({"mobius": [{"message": busy}]})}
+        result = lookup_reference_sections(_context(state))
+        assert "486" in result["query"]["sip_codes"]
+        assert result["sections"][0]["heading"] == "SIP > Responses"
@@ -0,0 +1,160 @@
+import pytest
+
+from analyze_agent_v2.signatures import (
+    SIGNATURE_ENGINE,
+    AhoCorasick,
+    Signature,
+    SignatureEngine,
+    normalize,
+    render_verdict,
+)
+
+INVITE = "INVITE sip:bob@example.com SIP/2.0"
+
+
+def _ids(entries) -> list[str]:
+    return [issue["id"] for issue in SIGNATURE_ENGINE.match(entries)]
+
+
+class TestAhoCorasick:
+    @pytest.mark.parametrize(
+        "patterns, text, expected",
+        [
+            (["he", "she", "his", "hers"], "ushers", {0, 1, 3}),
+            (["abc", "bc", "c"], "xabcx", {0, 1, 2}),
+            (["aa"], "a", set()),
+            (["a", "aa", "aaa"], "aa", {0, 1}),
+            ([], "anything", set()),
+        ],
+    )
+    def test_search(self, patterns, text, expected):
+        assert AhoCorasick(patterns).search(text) == expected
+
+
+class TestNormalize:
+    @pytest.mark.parametrize(
+        "text, expected",
+        [
+            ('"iceConnectionState" : "failed"', "iceconnectionstate:failed"),
+            ("Status = 429", "status=429"),
+            ("SIP/2.0   480\tTemporarily", "sip/2.0 480 temporarily"),
+        ],
+    )
+    def test_normalize(self, text, expected):
+        assert normalize(text) == expected
+
+
+class TestSipSignatures:
+    @pytest.mark.parametrize(
+        "response, expected",
+        [
+            ("SIP/2.0 480 Temporarily Unavailable", ["sip-480-unavailable"]),
+            ("SIP/2.0 486 Busy Here", ["sip-486-busy"]),
+            ("SIP/2.0 403 Forbidden", ["sip-403-forbidden"]),
+            ("SIP/2.0 603 Decline", ["sip-603-declined"]),
+            ("SIP/2.0 503 Service Unavailable", ["sip-503-unavailable"]),
+            ("SIP/2.0 200 OK", []),
+        ],
+    )
+    def test_final_response_after_invite(self, response, expected):
+        entries = [
+            (INVITE, "2024-05-01T10:00:00Z", "sse_mse#0", "leg-1"),
+            (response, "2024-05-01T10:00:02Z", "sse_mse#1", "leg-1"),
+        ]
+        assert _ids(entries) == expected
+
+    def test_response_without_invite_does_not_match(self):
+        assert _ids([("SIP/2.0 480 Temporarily Unavailable", "2024-05-01T10:00:02Z", "sse_mse#1", "leg-1")]) == []
+
+    def test_steps_must_be_in_time_order(self):
+        entries = [
+            ("SIP/2.0 480 Temporarily Unavailable", "2024-05-01T10:00:00Z", "sse_mse#0", "leg-1"),
+            (INVITE, "2024-05-01T10:00:02Z", "sse_mse#1", "leg-1"),
+        ]
+        assert _ids(entries) == []
+
+    def test_steps_must_share_a_leg(self):
+        entries = [
+            (INVITE, "2024-05-01T10:00:00Z", "sse_mse#0", "leg-1"),
+            ("SIP/2.0 480 Temporarily Unavailable", "2024-05-01T10:00:02Z", "sse_mse#1", "leg-2"),
+        ]
+        assert _ids(entries) == []
+
+    @pytest.mark.parametrize(
+        "response, expected",
+        [
+            ("SIP/2.0 480 Temporarily Unavailable", ["sip-480-unavailable"]),
+            ("SIP/2.0 408 Request Timeout", ["sip-408-timer-b"]),
+            # Busy is immediate, not after ringing
+            ("SIP/2.0 486 Busy Here", []),
+        ],
+    )
+    def test_no_answer_timeouts_match_after_ringing(self, response, expected):
+        entries = [
+            (INVITE, "2024-05-01T10:00:00Z", "sse_mse#0", "leg-1"),
+            (response, "2024-05-01T10:01:30Z", "sse_mse#1", "leg-1"),
+        ]
+        assert _ids(entries) == expected
+
+    def test_steps_must_fall_within_the_window(self):
+        entries = [
+            (INVITE, "2024-05-01T10:00:00Z", "sse_mse#0", "leg-1"),
+            ("SIP/2.0 480 Temporarily Unavailable", "2024-05-01T10:05:00Z", "sse_mse#1", "leg-1"),
+        ]
+        assert _ids(entries) == []
+
+
+class TestEngine:
+    def setup_method(self):
+        self.engine = SignatureEngine((
+            Signature(
+                id="two-step", title="t", severity="major", verdict="v", remediation="r",
+                steps=(("alpha",), ("beta",)), within_secs=10, unless=("gamma",),
+            ),
+            Signature(
+                id="one-step", title="t", severity="critical", verdict="v", remediation="",
+                steps=(("boom",),), same_leg=False,
+            ),
+        ))
+
+    def test_occurrences_evidence_and_severity_order(self):
+        issues = self.engine.match([
+            ("alpha", "2024-05-01T10:00:00Z", "m#0", "a"),
+            ("beta", "2024-05-01T10:00:01Z", "m#1", "a"),
+            ("alpha", "2024-05-01T10:00:20Z", "m#2", "a"),
+            ("BETA", "2024-05-01T10:00:21Z", "m#3", "a"),
+            ("boom", "2024-05-01T10:00:30Z", "m#4", "b"),
+        ])
+        assert [i["id"] for i in issues] == ["one-step", "two-step"]
+        two_step = issues[1]
+        assert two_step["occurrences"] == 2
+        assert two_step["evidence"] == ["m#0", "m#1", "m#2", "m#3"]
+        assert two_step["first_seen"] == "2024-05-01T10:00:01Z"
+
+    def test_unless_suppresses_anywhere(self):
+        issues = self.engine.match([
+            ("alpha", "2024-05-01T10:00:00Z", "m#0", "a"),
+            ("beta", "2024-05-01T10:00:01Z", "m#1", "a"),
+            ("gamma", "2024-05-01T11:00:00Z", "m#2", "z"),
+        ])
+        assert issues == []
+
+    def test_untimed_entries_match_by_position(self):
+        issues = self.engine.match([("alpha", "", "sdk#0", "a"), ("beta", "", "sdk#1", "a")])
+        assert [i["id"] for i in issues] == ["two-step"]
+
+    def test_empty_input(self):
+        assert self.engine.match([]) == []
+
+
+class TestRenderVerdict:
+    def test_empty(self):
+        assert render_verdict([]) == ""
+
+    def test_renders_next_step(self):
+        text = render_verdict([{
+            "id": "x", "title": "Title", "severity": "minor", "verdict": "Verdict.",
+            "remediation": "Do this.", "occurrences": 1, "first_seen": None, "evidence": ["m#1"],
+        }])
+        assert "[MINOR] **Title** — Verdict. (x1, first n/a; refs: m#1)" in text
+        assert "  - Next step: Do this." in text
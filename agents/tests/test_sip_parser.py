@@ -0,0 +1,119 @@
+import pytest
+
+from sip_parser import parse_sip
+
+SDP = (
+    "v=0\r\no=- 1 1 IN IP4 10.0.0.1\r\ns=-\r\nc=IN IP4 10.0.0.9\r\nt=0 0\r\n"
+    "m=audio 49170 RTP/SAVPF 111 0 101\r\na=rtpmap:111 opus/48000/2\r\n"
+    "a=rtpmap:101 telephone-event/8000\r\na=sendrecv\r\n"
+    "a=candidate:1 1 udp 1 1.1.1.1 1 typ host\r\na=fingerprint:sha-256 AA\r\n"
+)
+INVITE = (
+    "2026-01-01 INFO Sending: INVITE sip:+14085551234@10.1.1.1:5060;transport=tls SIP/2.0\r\n"
+    "Via: SIP/2.0/TLS 10.0.0.1:5061;branch=z9hG4bK-abc;rport, SIP/2.0/TLS 10.0.0.2;branch=z9hG4bK-def\r\n"
+    "v: SIP/2.0/UDP 1.2.3.4;branch=z9hG4bK-ghi\r\n"
+    "From: <sip:alice@x>;tag=fromtag1\r\n"
+    "To: <sip:bob@y>\r\n"
+    "Call-ID: SSE0520080392201261106889615@10.249.187.80\r\n"
+    "CSeq: 102 INVITE\r\n"
+    "Session-ID: aaaabbbb;remote=ccccdddd\r\n"
+    "Content-Type: application/sdp\r\n"
+    "\r\n" + SDP
+)
+# JSON-escaped line breaks inside a logged document
+ESCAPED_480 = (
+    '{"msg":"SIP/2.0 480 Temporarily Unavailable\\r\\nVia: SIP/2.0/TLS h;branch=z9hG4bKx\\r\\n'
+    'To: <sip:b>;tag=tt\\r\\ni: abc@h\\r\\nCSeq: 1 INVITE\\r\\n\\r\\n"}'
+)
+
+
+class TestParseSip:
+    def test_request_with_sdp(self):
+        sip = parse_sip(INVITE)
+        assert sip.is_request and sip.method == "INVITE"
+        assert sip.request_uri == "sip:+14085551234@10.1.1.1:5060;transport=tls"
+        assert sip.start_line.startswith("INVITE sip:")
+        assert sip.call_id == "SSE0520080392201261106889615@10.249.187.80"
+        assert (sip.cseq, sip.cseq_method) == (102, "INVITE")
+        assert sip.from_tag == "fromtag1" and sip.to_tag is None
+        assert sip.via_branches == ["z9hG4bK-abc", "z9hG4bK-def", "z9hG4bK-ghi"]
+        assert (sip.session_id, sip.remote_session_id) == ("aaaabbbb", "ccccdddd")
+        assert sip.sdp.render() == "audio:49170 RTP/SAVPF opus,PCMU,telephone-event sendrecv; c=10.0.0.9; ice=1; dtls"
+
+    def test_escaped_response_with_compact_headers(self):
+        sip = parse_sip(ESCAPED_480)
+        assert not sip.is_request
+        assert (sip.status, sip.reason) == (480, "Temporarily Unavailable")
+        assert sip.label() == "480 Temporarily Unavailable"
+        assert sip.call_id == "abc@h" and sip.to_tag == "tt"
+        assert sip.transaction_method == "INVITE"
+        assert sip.sdp is None and sip.sdp_span is None
+
+    @pytest.mark.parametrize(
+        "text",
+        ["", "hello", "Via: SIP/2.0/TLS foo", "FOO sip:x SIP/2.0", "INVITE http://x SIP/2.0"],
+    )
+    def test_not_sip(self, text):
+        assert parse_sip(text) is None
+
+    def test_bare_status_line(self):
+        sip = parse_sip("SIP/2.0 200 OK")
+        assert sip.summary() == "SIP 200 OK"
+        assert sip.to_record() == {"start_line": "SIP/2.0 200 OK"}
+
+    def test_summary(self):
+        assert parse_sip(INVITE).summary().startswith(
+            "SIP INVITE sip:+14085551234@10.1.1.1:5060;transport=tls | "
+            "Call-ID=SSE0520080392201261106889615@10.249.187.80 | CSeq=102 INVITE | SDP audio:49170"
+        )
+
+
+class TestWithoutSdp:
+    def test_drops_only_the_sdp_body(self):
+        sip = parse_sip(INVITE)
+        stripped = sip.without_sdp(INVITE)
+        assert stripped == INVITE[:INVITE.index("v=0")]
+        assert "Session-ID: aaaabbbb" in stripped
+
+    @pytest.mark.parametrize(
+        "suffix",
+        [" trackingId=XYZ_123", "[mobius] trackingId=XYZ_123"],
+    )
+    def test_keeps_log_suffix_after_a_line_break(self, suffix):
+        sip = parse_sip(INVITE + suffix)
+        assert sip.without_sdp(INVITE + suffix).endswith("\r\n\r\n" + suffix)
+
+    def test_keeps_suffix_after_a_quoted_message(self):
+        logged = '{"message":"' + INVITE.replace("\r\n", "\\r\\n") + 'a=sendrecv"} sessionId=abc-123'
+        sip = parse_sip(logged)
+        assert sip.sdp is not None
+        stripped = sip.without_sdp(logged)
+        assert "m=audio" not in stripped
+        assert stripped.endswith('\\r\\n\\r\\n"} sessionId=abc-123')
+
+    def test_message_without_sdp_is_unchanged(self):
+        assert parse_sip(ESCAPED_480).without_sdp(ESCAPED_480) == ESCAPED_480
+
+
+class TestDirection:
+    @pytest.mark.parametrize(
+        "prefix, direction",
+        [
+            ("2026-01-01 INFO Sending: ", "sent"),
+            ("outgoing SIP message to 10.0.0.2: ", "sent"),
+            ("[TX] ", "sent"),
+            ("Received from 10.0.0.2: ", "received"),
+            ("INCOMING ", "received"),
+            ("2026-01-01 INFO ", ""),
+            ("", ""),
+            # Both markers: the prefix does not say which
+            ("received request, sending ", ""),
+            # Whole words only
+            ("sender=mobius resent ", ""),
+        ],
+    )
+    def test_direction_from_log_prefix(self, prefix, direction):
+        assert parse_sip(prefix + "SIP/2.0 200 OK\r\nCSeq: 1 INVITE\r\n\r\n").direction == direction
+
+    def test_words_after_the_start_line_are_ignored(self):
+        assert parse_sip("SIP/2.0 200 OK\r\nX-Note: received\r\n\r\n").direction == ""
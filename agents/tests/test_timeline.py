@@ -0,0 +1,93 @@
+import pytest
+
+from timeline import SDK_SOURCE, TimelineMerger, merge_timeline, sdk_events, server_events
+
+
+def _doc(ts, message="m"):
+    return {"@timestamp": ts, "message": message}
+
+
+def _refs(events):
+    return [event.ref for event in events]
+
+
+class TestSdkEvents:
+    def test_timestamp_stripped_and_inherited(self):
+        events = list(sdk_events(["2026-01-01 10:00:00.500 start", "  continued", "", "2026-01-01T10:00:01Z next"]))
+        assert [(e.index, e.ts, e.message) for e in events] == [
+            (0, "2026-01-01T10:00:00.500", " start"),
+            (1, "2026-01-01T10:00:00.500", "  continued"),
+            (3, "2026-01-01T10:00:01Z", " next"),
+        ]
+
+    def test_lines_before_the_first_timestamp_are_untimed(self):
+        [header] = sdk_events(["SDK version 1.2"])
+        assert header.ts == "" and header.epoch != header.epoch
+
+
+class TestMergeTimeline:
+    def test_interleaves_sources(self):
+        all_logs = {
+            "mobius": [_doc("2026-01-01T10:00:01Z"), _doc("2026-01-01T10:00:03Z")],
+            "wxcas": [_doc("2026-01-01T10:00:02Z")],
+        }
+        sdk = ["2026-01-01T10:00:00Z a", "2026-01-01T10:00:04Z b"]
+        assert _refs(merge_timeline(all_logs, sdk)) == ["sdk#0", "mobius#0", "wxcas#0", "mobius#1", "sdk#1"]
+
+    def test_untimed_sdk_header_does_not_pin_the_stream(self):
+        all_logs = {"mobius": [_doc("2026-01-01T10:00:05Z"), _doc("2026-01-01T10:00:20Z")]}
+        sdk = ["header", "2026-01-01T10:00:00Z a", "2026-01-01T10:00:10Z b"]
+        assert _refs(merge_timeline(all_logs, sdk)) == ["sdk#0", "sdk#1", "mobius#0", "sdk#2", "mobius#1"]
+
+    def test_untimed_document_keeps_its_position(self):
+        all_logs = {
+            "mobius": [_doc("2026-01-01T10:00:01Z"), _doc(""), _doc("2026-01-01T10:00:05Z")],
+            "wxcas": [_doc("2026-01-01T10:00:02Z")],
+        }
+        assert _refs(merge_timeline(all_logs)) == ["mobius#0", "mobius#1", "wxcas#0", "mobius#2"]
+
+    def test_stepped_back_entry_keeps_its_position(self):
+        all_logs = {
+            "mobius": [_doc("2026-01-01T10:00:05Z"), _doc("2026-01-01T10:00:01Z"), _doc("2026-01-01T10:00:06Z")],
+            "wxcas": [_doc("2026-01-01T10:00:03Z")],
+        }
+        assert _refs(merge_timeline(all_logs)) == ["wxcas#0", "mobius#0", "mobius#1", "mobius#2"]
+
+    def test_identical_documents_at_one_instant_are_emitted_once(self):
+        doc = _doc("2026-01-01T10:00:01Z", "same")
+        all_logs = {"mobius": [doc, dict(doc), _doc("2026-01-01T10:00:01Z", "other")]}
+        assert _refs(merge_timeline(all_logs)) == ["mobius#0", "mobius#2"]
+        assert _refs(merge_timeline(all_logs, dedup=False)) == ["mobius#0", "mobius#1", "mobius#2"]
+
+    def test_repeated_sdk_lines_are_kept(self):
+        sdk = ["2026-01-01T10:00:00Z x", "2026-01-01T10:00:00Z x"]
+        assert _refs(merge_timeline({}, sdk)) == ["sdk#0", "sdk#1"]
+
+    @pytest.mark.parametrize(
+        "all_logs, sdk",
+        [({}, []), ({"mobius": []}, []), ({"mobius": ["not a doc"]}, ["", "  "])],
+    )
+    def test_empty_input(self, all_logs, sdk):
+        assert list(merge_timeline(all_logs, sdk)) == []
+
+
+class TestTimelineMerger:
+    def test_incremental_push_and_drain(self):
+        merger = TimelineMerger()
+        merger.push(SDK_SOURCE, [])
+        merger.push("mobius", server_events("mobius", [_doc("2026-01-01T10:00:01Z"), _doc("2026-01-01T10:00:04Z")]))
+        # The SDK source has pushed nothing yet: nothing can be emitted
+        assert list(merger.drain()) == []
+        merger.push(SDK_SOURCE, sdk_events(["2026-01-01T10:00:02Z a"]))
+        # mobius#1 waits: the open SDK source may still add earlier lines
+        assert _refs(merger.drain()) == ["mobius#0", "sdk#0"]
+        merger.push(SDK_SOURCE, sdk_events(["2026-01-01T10:00:03Z b"]))
+        assert _refs(merger.drain()) == ["sdk#0"]
+        assert _refs(merger.finish()) == ["mobius#1"]
+
+    def test_push_after_close_raises(self):
+        merger = TimelineMerger()
+        merger.push("mobius", [])
+        merger.close("mobius")
+        with pytest.raises(ValueError):
+            merger.push("mobius", [])
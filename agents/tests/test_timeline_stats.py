@@ -0,0 +1,142 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from analyze_agent_v2 import timeline_stats
+from analyze_agent_v2.digest import DigestEvent
+from analyze_agent_v2.timeline_stats import attach_timeline_stats, compute_timeline_stats
+from sip_parser import parse_sip
+
+CALL_ID = "call-1@10.0.0.1"
+
+
+def _ts(seconds: float) -> str:
+    return f"2026-01-01T10:00:{seconds:06.3f}Z"
+
+
+def _sip(seconds, start_line, cseq="1 INVITE", branch="z9hG4bK-1", prefix="", service="SSE", leg="sip:call-1"):
+    message = (
+        f"{prefix}{start_line}\r\nVia: SIP/2.0/TLS 10.0.0.1;branch={branch}\r\n"
+        f"Call-ID: {CALL_ID}\r\nCSeq: {cseq}\r\n\r\n"
+    )
+    sip = parse_sip(message)
+    return DigestEvent(_ts(seconds), service, "sip", sip.summary(), f"sse#{seconds}", leg=leg, sip=sip)
+
+
+def _http(seconds, tracking_id, path=None, status=None):
+    text = f"HTTP POST {path}" if path else f"-> {status}"
+    return DigestEvent(
+        _ts(seconds), "Mobius", "http", text, f"mobius#{seconds}",
+        tracking_id=tracking_id, http_path=path, http_status=status,
+    )
+
+
+def _log(seconds, leg):
+    return DigestEvent(_ts(seconds), "Mobius", "log", "INFO: x", f"mobius#{seconds}", leg=leg)
+
+
+INVITE = "INVITE sip:bob@10.0.0.2 SIP/2.0"
+
+
+class TestEmptyInput:
+    def test_full_shape(self):
+        stats = compute_timeline_stats([])
+        assert stats["legs"] == []
+        assert stats["sip"] == {"transactions": [], "response_ms": {}, "call_setup": [], "retransmissions": 0}
+        assert stats["http"] == {"exchanges": 0, "latency": {"count": 0}, "slowest": []}
+
+    @pytest.mark.parametrize("digest", [None, {"events": []}])
+    def test_attach_writes_empty_string(self, monkeypatch, digest):
+        monkeypatch.setattr(timeline_stats, "digest_for_state", lambda state: digest)
+        context = SimpleNamespace(state={})
+        attach_timeline_stats(context)
+        assert context.state["timeline_stats"] == ""
+
+    def test_attach_writes_json(self, monkeypatch):
+        monkeypatch.setattr(timeline_stats, "digest_for_state", lambda state: {"events": [_log(1, "a")]})
+        context = SimpleNamespace(state={})
+        attach_timeline_stats(context)
+        assert json.loads(context.state["timeline_stats"])["legs"][0]["leg"] == "a"
+
+
+class TestLegMetrics:
+    def test_duration_and_gaps(self):
+        events = [_log(0, "a"), _log(1, "a"), _log(4.5, "a"), _log(5, "a"), _log(2, "b")]
+        a, b = compute_timeline_stats(events)["legs"]
+        assert (a["leg"], a["events"], a["duration_ms"]) == ("a", 4, 5000)
+        assert (a["max_gap_ms"], a["max_gap_after"], a["gaps_over_threshold"]) == (3500, "2026-01-01T10:00:01.000000Z", 1)
+        assert (b["leg"], b["events"], b["duration_ms"], b["max_gap_ms"]) == ("b", 1, 0, 0)
+
+    def test_untimed_events_are_skipped(self):
+        event = _log(0, "a")
+        event.ts = ""
+        assert compute_timeline_stats([event, _log(1, "a")])["legs"][0]["events"] == 1
+
+
+class TestSipMetrics:
+    def test_call_setup(self):
+        events = [
+            _sip(0, INVITE),
+            _sip(0.1, "SIP/2.0 100 Trying"),
+            _sip(1.5, "SIP/2.0 180 Ringing"),
+            _sip(4, "SIP/2.0 200 OK"),
+            _sip(4.2, "ACK sip:bob@10.0.0.2 SIP/2.0", cseq="1 ACK", branch="z9hG4bK-2"),
+        ]
+        sip = compute_timeline_stats(events)["sip"]
+        assert sip["call_setup"] == [
+            {"call_id": CALL_ID, "cseq": 1, "final_status": 200, "setup_ms": 4000, "post_dial_delay_ms": 1500},
+        ]
+        [transaction] = sip["transactions"]
+        assert (transaction["cseq"], transaction["first_response_ms"], transaction["final_ms"]) == ("1 INVITE", 100, 4000)
+        assert sip["response_ms"]["INVITE"]["count"] == 1 and "ACK" not in sip["response_ms"]
+
+    def test_failed_call_has_no_setup_time(self):
+        events = [_sip(0, INVITE), _sip(2, "SIP/2.0 486 Busy Here")]
+        [setup] = compute_timeline_stats(events)["sip"]["call_setup"]
+        assert (setup["final_status"], setup["setup_ms"]) == (486, None)
+
+    def test_retransmissions_counted(self):
+        events = [_sip(0, INVITE), _sip(0.5, INVITE), _sip(1.5, INVITE), _sip(2, "SIP/2.0 200 OK")]
+        sip = compute_timeline_stats(events)["sip"]
+        assert sip["retransmissions"] == 2
+        assert sip["transactions"][0]["retransmissions"] == 2
+
+    @pytest.mark.parametrize(
+        "copies, expected",
+        [
+            # One message logged as sent and as received by the same service
+            (["Sending: ", "Received: "], 0),
+            # Retransmitted, each copy logged in both directions
+            (["Sending: ", "Received: ", "Sending: ", "Received: "], 1),
+            # A new branch is a new request, not a retransmission
+            ([("Sending: ", "z9hG4bK-1"), ("Sending: ", "z9hG4bK-9")], 0),
+        ],
+    )
+    def test_sent_and_received_copies_count_once(self, copies, expected):
+        events = []
+        for n, copy in enumerate(copies):
+            prefix, branch = copy if isinstance(copy, tuple) else (copy, "z9hG4bK-1")
+            events.append(_sip(n * 0.1, INVITE, branch=branch, prefix=prefix))
+        assert compute_timeline_stats(events)["sip"]["retransmissions"] == expected
+
+    def test_other_services_copies_are_not_retransmissions(self):
+        events = [_sip(0, INVITE, service="SSE"), _sip(0.05, INVITE, service="WxCAS")]
+        assert compute_timeline_stats(events)["sip"]["retransmissions"] == 0
+
+
+class TestHttpMetrics:
+    def test_request_to_first_later_response(self):
+        events = [
+            _http(0, "t1", status=200),  # response before the request: ignored
+            _http(1, "t1", path="/v1/calling"),
+            _http(1.25, "t1", status=503),
+            _http(3, "t1", status=200),
+            _http(2, "t2", path="/v1/devices"),
+            _http(2.5, "t2", status=200),
+            _http(4, "t3", path="/v1/unanswered"),
+        ]
+        http = compute_timeline_stats(events)["http"]
+        assert http["exchanges"] == 2
+        assert [(s["status"], s["latency_ms"]) for s in http["slowest"]] == [(200, 500), (503, 250)]
+        assert http["latency"]["max_ms"] == 500
@@ -0,0 +1,118 @@
+import json
+import re
+from types import SimpleNamespace
+
+import pytest
+
+import token_budget
+from analyze_agent_v2.digest import digest_text, get_raw_log_entries
+from artifact_store import render_state_template
+from log_views import LOG_VIEWS
+from token_budget import BudgetedValue, estimate_tokens, fit_values
+
+
+@pytest.fixture(autouse=True)
+def _char_estimate(monkeypatch):
+    # Deterministic token counts whether or not tiktoken is installed
+    monkeypatch.setattr(token_budget, "tiktoken", None)
+
+
+def _doc(i, message=None, **extra):
+    return {
+        "@timestamp": f"2026-01-01T10:{i // 60:02d}:{i % 60:02d}Z",
+        "message": message or f"request {i} handled for user-{i}",
+        "kubernetes": {"pod": "mobius-abc", "node": "n1"},
+        **extra,
+    }
+
+
+def _value(name, logs, **kwargs):
+    text = json.dumps(logs)
+    return BudgetedValue(name=name, text=text, tokens=estimate_tokens(text), **kwargs)
+
+
+class TestEstimate:
+    def test_chars_per_token_fallback(self):
+        assert estimate_tokens("") == 0
+        assert estimate_tokens("x" * 30) == 10
+
+
+class TestLadder:
+    def test_rungs_apply_in_order(self):
+        value = _value("all_logs", {"mobius": [_doc(i, "keepalive ok") for i in range(300)]})
+        value.degrade(1)
+        assert "kubernetes" not in value.text
+        value.degrade(1)
+        assert json.loads(value.text)["mobius"][0]["_repeats"] == 300
+        value.degrade(1)
+        # No digester: the last rung falls back to an excerpt
+        assert value.applied == ["projection", "template_collapse", "sampling"]
+        assert not value.degrade(10**9)
+
+    def test_sampling_keeps_edges_and_errors(self):
+        logs = [_doc(i) for i in range(1000)]
+        logs[500] = _doc(500, "upstream timeout")
+        value = _value("all_logs", {"mobius": logs}, step=2)
+        value.degrade(100)
+        sampled = json.loads(value.text)["mobius"]
+        messages = [entry["message"] for entry in sampled]
+        assert len(sampled) < 1000
+        assert messages[0] == logs[0]["message"] and messages[-1] == logs[-1]["message"]
+        assert "upstream timeout" in messages
+
+    def test_text_values_get_an_excerpt(self):
+        value = BudgetedValue(name="analysis", text="a" * 3000, tokens=1000)
+        assert value.degrade(100)
+        assert value.applied == ["excerpt"] and value.tokens <= 100
+        assert "characters omitted" in value.text
+
+
+class TestDigestRung:
+    def test_view_digests_under_its_category_from_the_original_logs(self):
+        seen = []
+        logs = [_doc(i) for i in range(5)]
+        value = _value("mobius_logs", logs, category="mobius", digester=lambda l, s: seen.append(l) or "D")
+        while value.degrade(1) and value.text != "D":
+            pass
+        assert seen == [{"mobius": logs}]
+        assert value.applied[-1] == "digest"
+
+    def test_sdk_lines_digest_directly(self):
+        seen = []
+        value = BudgetedValue(
+            name="sdk_logs", text="a\nb", tokens=10, digester=lambda l, s: seen.append((l, s)) or "D"
+        )
+        assert value.degrade(1) and value.text == "D"
+        assert seen == [({}, ["a", "b"])]
+
+    @pytest.mark.parametrize("template", ["{mobius_logs}", "{all_logs}"])
+    def test_digest_refs_resolve_against_all_logs(self, template):
+        mobius = [_doc(i, f"unique event {chr(65 + i % 26)}{'x' * (i % 7)}") for i in range(200)]
+        mobius[150] = _doc(150, "SIP/2.0 503 Service Unavailable\r\nCall-ID: c1@h\r\nCSeq: 1 INVITE\r\n\r\n")
+        state = {"all_logs": json.dumps({"mobius": mobius, "sse_mse": [], "wxcas": [_doc(0)]})}
+
+        text = render_state_template(template, state, views=LOG_VIEWS, budget=2000, digester=digest_text)
+
+        assert text.startswith("LOG DIGEST")
+        refs = re.findall(r"<((?:mobius|wxcas)#\d+)>", text)
+        assert "mobius#150" in refs
+        lookup = get_raw_log_entries(refs, SimpleNamespace(state=state))
+        assert lookup["missing"] == []
+        assert lookup["entries"]["mobius#150"] == mobius[150]
+
+
+class TestFitValues:
+    def test_under_budget_is_untouched(self):
+        values = {"a": "x" * 30}
+        assert fit_values(values, 0, 100) is values
+
+    def test_largest_value_degrades_first(self):
+        values = {"small": "s" * 30, "big": "b" * 3000}
+        fitted = fit_values(values, 0, 500)
+        assert fitted["small"] == values["small"]
+        assert estimate_tokens(fitted["big"]) < 500
+
+    def test_repeated_placeholders_count_per_use(self):
+        values = {"v": "x" * 600}
+        assert fit_values(values, 0, 300, uses={"v": 1}) == values
+        assert fit_values(values, 0, 300, uses={"v": 2}) != values
@@ -0,0 +1,225 @@
+"""
+Unified, time-ordered event stream across log sources.
+
+`all_logs` keeps one list per category (Mobius, SSE/MSE, WxCAS), each already
+in @timestamp order (see hit_store.render), and SDK logs arrive as text lines
+in file order. Instead of every consumer concatenating and re-sorting them,
+`TimelineMerger` k-way merges the per-source streams into one ascending
+stream of `TimelineEvent`s tagged with their source:
+
+- O(k) memory for k sources: streams are consumed lazily, one pending head
+  per source on a heap
+- incremental: `push` more (ascending) items for a source at any time and
+  `drain` emits everything no open source can still precede; `finish` closes
+  all sources and emits the rest
+- identical server documents of one source at the same instant (the same
+  log line indexed twice) are emitted once
+- entries without a timestamp (SDK lines before the first timestamped one,
+  server documents without @timestamp) and entries that step back in time
+  within their own stream keep their stream position: right after the
+  previous timed entry, or first when none precedes them
+
+`merge_timeline` is the one-shot form used by the digest, the signature
+scan and the SIP ladder view.
+"""
+
+import heapq
+import json
+import logging
+import math
+import re
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Iterable, Iterator, Mapping, Optional
+
+logger = logging.getLogger(__name__)
+
+# Source tag of uploaded SDK/client log lines
+SDK_SOURCE = "sdk"
+
+_ISO_TIMESTAMP = re.compile(
+    r"\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}:\d{2}(?:\.\d+)?(?:Z|[+-]\d{2}:?\d{2})?"
+)
+
+
+@dataclass(slots=True)
+class TimelineEvent:
+    epoch: float  # seconds; NaN when the entry has no timestamp
+    ts: str  # timestamp as logged ("" when none)
+    source: str  # category ("mobius", "sse_mse", "wxcas") or SDK_SOURCE
+    index: int  # position in its source list / SDK line number
+    message: str  # message text (SDK: the line without its timestamp)
+    entry: Optional[dict] = None  # the `_source` document (server logs)
+
+    @property
+    def ref(self) -> str:
+        """Digest ref, e.g. `mobius#12` or `sdk#40`."""
+        return f"{self.source}#{self.index}"
+
+
+def parse_epoch(ts: str) -> float:
+    if not ts:
+        return math.nan
+    try:
+        return datetime.fromisoformat(ts.replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        return math.nan
+
+
+def server_events(category: str, sources: Iterable[Any]) -> Iterator[TimelineEvent]:
+    """Events for one all_logs category, in list order."""
+    for index, source in enumerate(sources):
+        if not isinstance(source, dict):
+            continue
+        message = source.get("message") or ""
+        if not isinstance(message, str):
+            message = json.dumps(message, default=str)
+        ts = str(source.get("@timestamp") or "")
+        yield TimelineEvent(parse_epoch(ts), ts, category, index, message, source)
+
+
+def sdk_events(lines: Iterable[str]) -> Iterator[TimelineEvent]:
+    """Events for SDK log lines; lines without a timestamp inherit the last one seen."""
+    last_ts, last_epoch = "", math.nan
+    for number, line in enumerate(lines):
+        if not line.strip():
+            continue
+        match = _ISO_TIMESTAMP.search(line)
+        if match:
+            last_ts = match.group().replace(" ", "T")
+            last_epoch = parse_epoch(last_ts)
+            line = line[:match.start()] + line[match.end():]
+        yield TimelineEvent(last_epoch, last_ts, SDK_SOURCE, number, line)
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# K-way merge
+# ═══════════════════════════════════════════════════════════════════════════════
+
+
+class _Stream:
+    __slots__ = ("rank", "chunks", "head", "head_key", "last_key", "open", "stepped_back")
+
+    def __init__(self, rank: int):
+        self.rank = rank
+        self.chunks: deque[Iterator[TimelineEvent]] = deque()
+        self.head: Optional[TimelineEvent] = None
+        self.head_key: tuple = ()
+        self.last_key: tuple = ()  # key of the latest event pulled from this stream
+        self.open = True
+        self.stepped_back = 0
+
+    def advance(self) -> bool:
+        """Pull the next event into `head`. False when no buffered items are left."""
+        while self.chunks:
+            event = next(self.chunks[0], None)
+            if event is None:
+                self.chunks.popleft()
+                continue
+            # Untimed and out-of-order entries keep their stream position: never re-sorted
+            if math.isnan(event.epoch):
+                key = (self.last_key[0] if self.last_key else -math.inf, self.rank, event.index)
+            else:
+                key = (event.epoch, self.rank, event.index)
+                if self.last_key and key < self.last_key:
+                    self.stepped_back += 1
+                    key = (self.last_key[0], self.rank, event.index)
+            self.head, self.head_key, self.last_key = event, key, key
+            return True
+        self.head = None
+        return False
+
+
+class TimelineMerger:
+    """Incremental k-way merge of per-source ascending event streams."""
+
+    def __init__(self, dedup: bool = True):
+        self._streams: dict[str, _Stream] = {}
+        self._heap: list[tuple[tuple, str]] = []
+        self._dedup = dedup
+        # Documents emitted at the current instant, by (source, message)
+        self._instant: Any = None
+        self._seen: dict[tuple[str, str], list[dict]] = {}
+        self.emitted = 0
+        self.duplicates = 0
+
+    def push(self, source: str, events: Iterable[TimelineEvent]) -> None:
+        """Append events (ascending, after anything pushed before) to a source."""
+        stream = self._streams.get(source)
+        if stream is None:
+            stream = self._streams[source] = _Stream(len(self._streams))
+        if not stream.open:
+            raise ValueError(f"timeline source {source!r} is closed")
+        stream.chunks.append(iter(events))
+        if stream.head is None and stream.advance():
+            heapq.heappush(self._heap, (stream.head_key, source))
+
+    def close(self, source: str) -> None:
+        """No more events will be pushed for `source`."""
+        stream = self._streams.get(source)
+        if stream is not None:
+            stream.open = False
+
+    def _watermark(self) -> Optional[tuple]:
+        """Key below which no open, currently idle source can still add events."""
+        idle = [s.last_key for s in self._streams.values() if s.open and s.head is None]
+        if any(not key for key in idle):
+            return ()  # a source has pushed nothing yet
+        return min(idle) if idle else None
+
+    def drain(self) -> Iterator[TimelineEvent]:
+        """Emit, in order, every event that no open source can still precede."""
+        while self._heap:
+            watermark = self._watermark()
+            key, source = self._heap[0]
+            if watermark is not None and key > watermark:
+                return
+            heapq.heappop(self._heap)
+            stream = self._streams[source]
+            event = stream.head
+            if stream.advance():
+                heapq.heappush(self._heap, (stream.head_key, source))
+            if self._is_duplicate(key, event):
+                continue
+            self.emitted += 1
+            yield event
+
+    def finish(self) -> Iterator[TimelineEvent]:
+        """Close every source and emit everything left."""
+        for source in self._streams:
+            self.close(source)
+        yield from self.drain()
+        stepped_back = {name: s.stepped_back for name, s in self._streams.items() if s.stepped_back}
+        if self.duplicates or stepped_back:
+            logger.debug(
+                f"[timeline] {self.emitted} events, {self.duplicates} duplicates dropped, "
+                f"out-of-order kept in place: {stepped_back}"
+            )
+
+    def _is_duplicate(self, key: tuple, event: TimelineEvent) -> bool:
+        # SDK lines come from one file: repeats there are real and kept
+        if not self._dedup or math.isnan(event.epoch) or event.entry is None:
+            return False
+        if key[0] != self._instant:
+            self._instant = key[0]
+            self._seen.clear()
+        same = self._seen.setdefault((event.source, event.message), [])
+        if any(entry == event.entry for entry in same):
+            self.duplicates += 1
+            return True
+        same.append(event.entry)
+        return False
+
+
+def merge_timeline(
+    all_logs: Mapping[str, Iterable[Any]],
+    sdk: Iterable[str] = (),
+    dedup: bool = True,
+) -> Iterator[TimelineEvent]:
+    """One ascending, deduplicated stream over every all_logs category plus SDK lines."""
+    merger = TimelineMerger(dedup=dedup)
+    for category, sources in all_logs.items():
+        merger.push(category, server_events(category, sources))
+    merger.push(SDK_SOURCE, sdk_events(sdk))
+    return merger.finish()
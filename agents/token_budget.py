@@ -0,0 +1,341 @@
+"""
+Token accounting and budgeting for state injected into prompts.
+
+`render_state_template` (artifact_store.py) measures every `{var}` value
+before the prompt is built and, when the instruction would not fit the
+model's prompt budget, degrades the largest values first along a ladder:
+
+    1. projection        log documents keep only the fields analysis uses
+    2. template collapse repeated message templates fold into one entry
+                         with a `_repeats` count
+    3. sampling          errors, head and tail are kept; the middle is
+                         evenly sampled
+    4. digest            the value becomes the deterministic log digest,
+                         built by the `digester` the caller passes in
+                         (analyze_agent_v2.digest.digest_text); without
+                         one, a head/tail excerpt. The digest is built from
+                         the value as first parsed, under its source
+                         category (a `{mobius_logs}` view digests as
+                         `mobius`), so its refs resolve against all_logs
+
+Values that are not logs (analysis text, diagrams) skip straight to a
+head/tail excerpt. `SessionLiteLlm` checks the final request against the
+model window and refuses oversized calls up front instead of sending them.
+"""
+
+import json
+import logging
+import math
+import os
+import re
+from dataclasses import dataclass, field
+from typing import Any, Callable, Mapping, Optional
+
+try:
+    import tiktoken
+except ImportError:  # optional; a conservative chars/token ratio is used instead
+    tiktoken = None
+
+logger = logging.getLogger(__name__)
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# Budgets
+# ═══════════════════════════════════════════════════════════════════════════════
+
+# Model every agent in this repo uses
+DEFAULT_MODEL = "openai/gpt-4.1"
+# Context window per model (tokens); unknown models use the default
+MODEL_CONTEXT_TOKENS = {
+    "openai/gpt-4.1": 1_047_576,
+    "openai/gpt-4o": 128_000,
+}
+DEFAULT_CONTEXT_TOKENS = 128_000
+# Override for deployments with a smaller window than the public model
+CONTEXT_TOKENS_OVERRIDE = int(os.getenv("LLM_CONTEXT_TOKENS", "0") or 0)
+# Tokens reserved for the completion
+OUTPUT_RESERVE_TOKENS = 32_768
+# Share of the remaining window an instruction may use; the rest is left
+# for conversation history and tool results
+INSTRUCTION_WINDOW_FRACTION = 0.6
+
+# Fallback estimate for log/JSON text when tiktoken is unavailable (conservative)
+CHARS_PER_TOKEN = 3.0
+# Longer texts are estimated from an evenly spread sample of this many chars
+ESTIMATE_SAMPLE_CHARS = 256 * 1024
+
+# Fields kept by the projection step (top level and under `fields`)
+PROJECTED_FIELDS = frozenset({
+    "@timestamp", "message", "level", "tags", "serviceIndicator",
+    "callId", "sessionId", "traceId",
+})
+PROJECTED_NESTED_FIELDS = frozenset({
+    "localSessionId", "remoteSessionId", "mobiusCallId", "sipCallId",
+    "WEBEX_TRACKINGID", "USER_ID", "DEVICE_ID", "level", "serviceIndicator",
+})
+# Entries always kept at each end by the sampling step
+SAMPLE_EDGE_ENTRIES = 50
+
+_TEMPLATE_NOISE = re.compile(r"[0-9a-fA-F]{8,}|\d+")
+_ERROR_HINT = re.compile(r"error|exception|fail|timeout|refused|\b[456]\d\d\b", re.IGNORECASE)
+
+_encoding = None
+
+# (logs by category, SDK lines) → digest text, for the ladder's last rung
+LogDigester = Callable[[dict[str, list], list[str]], str]
+
+
+def context_window(model: str) -> int:
+    if CONTEXT_TOKENS_OVERRIDE:
+        return CONTEXT_TOKENS_OVERRIDE
+    return MODEL_CONTEXT_TOKENS.get(model, DEFAULT_CONTEXT_TOKENS)
+
+
+def prompt_limit(model: str) -> int:
+    """Most tokens a request may carry and still leave room for the completion."""
+    return context_window(model) - OUTPUT_RESERVE_TOKENS
+
+
+def instruction_budget(model: str) -> int:
+    return int(prompt_limit(model) * INSTRUCTION_WINDOW_FRACTION)
+
+
+def estimate_tokens(text: str) -> int:
+    """Token estimate: tiktoken when installed (sampled for long texts), else chars/ratio."""
+    if not text:
+        return 0
+    if tiktoken is None:
+        return math.ceil(len(text) / CHARS_PER_TOKEN)
+    global _encoding
+    if _encoding is None:
+        _encoding = tiktoken.get_encoding("o200k_base")
+    if len(text) <= ESTIMATE_SAMPLE_CHARS:
+        return len(_encoding.encode(text, disallowed_special=()))
+    chunk = ESTIMATE_SAMPLE_CHARS // 8
+    stride = len(text) // 8
+    sample = "".join(text[i * stride:i * stride + chunk] for i in range(8))
+    return math.ceil(len(_encoding.encode(sample, disallowed_special=())) * len(text) / len(sample))
+
+
+def estimate_request_tokens(llm_request: Any) -> int:
+    """Estimate an ADK LlmRequest: system instruction, text, function calls/responses."""
+    config = getattr(llm_request, "config", None)
+    system = getattr(config, "system_instruction", None) if config is not None else None
+    texts = []
+    if isinstance(system, str):
+        texts.append(system)
+    elif system is not None:
+        texts.extend(p.text or "" for p in getattr(system, "parts", None) or [])
+    for content in getattr(llm_request, "contents", None) or []:
+        for part in getattr(content, "parts", None) or []:
+            if part.text:
+                texts.append(part.text)
+            if part.function_call is not None:
+                texts.append(_dumps(part.function_call.args))
+            if part.function_response is not None:
+                texts.append(_dumps(part.function_response.response))
+    return sum(estimate_tokens(text) for text in texts)
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# Degradation ladder
+# ═══════════════════════════════════════════════════════════════════════════════
+
+LADDER = ("projection", "template_collapse", "sampling", "digest")
+
+
+def _dumps(value: Any) -> str:
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False, default=str)
+
+
+def _project(source: Any) -> Any:
+    if not isinstance(source, dict):
+        return source
+    projected = {k: v for k, v in source.items() if k in PROJECTED_FIELDS}
+    nested = source.get("fields")
+    if isinstance(nested, dict):
+        kept = {k: v for k, v in nested.items() if k in PROJECTED_NESTED_FIELDS}
+        if kept:
+            projected["fields"] = kept
+    return projected
+
+
+def _message(source: Any) -> str:
+    message = source.get("message") if isinstance(source, dict) else source
+    return message if isinstance(message, str) else _dumps(message)
+
+
+def _collapse(sources: list) -> list:
+    kept: list = []
+    first_by_template: dict[str, dict] = {}
+    for source in sources:
+        template = _TEMPLATE_NOISE.sub("#", _message(source))[:200]
+        first = first_by_template.get(template)
+        if first is not None:
+            first["_repeats"] = first.get("_repeats", 1) + 1
+            continue
+        entry = dict(source) if isinstance(source, dict) else {"message": source}
+        first_by_template[template] = entry
+        kept.append(entry)
+    return kept
+
+
+def _sample(sources: list, keep_fraction: float) -> list:
+    target = max(2 * SAMPLE_EDGE_ENTRIES, int(len(sources) * keep_fraction))
+    if len(sources) <= target:
+        return sources
+    keep = set(range(SAMPLE_EDGE_ENTRIES)) | set(range(len(sources) - SAMPLE_EDGE_ENTRIES, len(sources)))
+    keep.update(i for i, s in enumerate(sources) if _ERROR_HINT.search(_message(s)))
+    remaining = target - len(keep)
+    if remaining > 0:
+        stride = max(1, len(sources) // remaining)
+        keep.update(range(0, len(sources), stride))
+    return [sources[i] for i in sorted(keep)]
+
+
+def _excerpt(text: str, tokens: int, max_tokens: int) -> str:
+    # Leave room for the omission marker
+    max_chars = max(0, int(len(text) * max_tokens / max(1, tokens)) - 100)
+    if len(text) <= max_chars:
+        return text
+    head = max_chars * 2 // 3
+    tail = max_chars - head
+    omitted = len(text) - head - tail
+    return f"{text[:head]}\n[... {omitted} characters omitted to fit the context window ...]\n{text[len(text) - tail:]}"
+
+
+@dataclass
+class BudgetedValue:
+    """One placeholder value and how far down the ladder it has been degraded."""
+
+    name: str
+    text: str
+    tokens: int
+    uses: int = 1  # occurrences in the template
+    category: Optional[str] = None  # all_logs category an array value was derived from
+    logs: Optional[dict[str, list]] = None  # parsed log documents by category
+    original: Optional[dict[str, list]] = None  # `logs` before any rung, for the digest
+    shape: str = ""  # text | array | object | lines; detected on first degrade
+    digester: Optional[LogDigester] = None
+    step: int = 0  # next LADDER rung to apply
+    applied: list[str] = field(default_factory=list)
+
+    @property
+    def cost(self) -> int:
+        return self.tokens * self.uses
+
+    def _detect_shape(self) -> None:
+        self.shape = "text"
+        if self.text.lstrip()[:1] in ("[", "{"):
+            try:
+                parsed = json.loads(self.text)
+            except ValueError:
+                return
+            if isinstance(parsed, list):
+                self.logs, self.shape = {self.category or self.name: parsed}, "array"
+            elif isinstance(parsed, dict) and parsed and all(isinstance(v, list) for v in parsed.values()):
+                self.logs, self.shape = parsed, "object"
+            self.original = self.logs
+        elif self.name == "sdk_logs":
+            self.shape = "lines"
+
+    def _set_text(self, text: str) -> None:
+        self.text = text
+        self.tokens = estimate_tokens(text)
+
+    def degrade(self, target_tokens: int) -> bool:
+        """Apply the next rung of the ladder. Returns False once nothing is left to try."""
+        if not self.shape:
+            self._detect_shape()
+        if self.shape in ("array", "object"):
+            rung = LADDER[self.step]
+            self.step += 1
+            if rung == "digest":
+                self.shape = "text"
+                logs, self.logs, self.original = self.original, None, None
+                if self.digester is None:
+                    return self.degrade(target_tokens)
+                self.applied.append(rung)
+                self._set_text(self.digester(logs, []))
+                return True
+            self.applied.append(rung)
+            if rung == "projection":
+                self.logs = {k: [_project(s) for s in v] for k, v in self.logs.items()}
+            elif rung == "template_collapse":
+                self.logs = {k: _collapse(v) for k, v in self.logs.items()}
+            elif rung == "sampling":
+                fraction = min(1.0, target_tokens / max(1, self.tokens))
+                self.logs = {k: _sample(v, fraction) for k, v in self.logs.items()}
+            self._set_text(_dumps(next(iter(self.logs.values())) if self.shape == "array" else self.logs))
+            return True
+        if self.shape == "lines":
+            self.shape = "text"
+            if self.digester is not None:
+                self.applied.append("digest")
+                self._set_text(self.digester({}, self.text.splitlines()))
+                return True
+        if self.tokens > target_tokens:
+            excerpt = _excerpt(self.text, self.tokens, target_tokens)
+            if len(excerpt) >= len(self.text):
+                return False
+            if "excerpt" not in self.applied:
+                self.applied.append("excerpt")
+            self._set_text(excerpt)
+            return True
+        return False
+
+
+def fit_values(
+    values: dict[str, str],
+    fixed_tokens: int,
+    budget: int,
+    label: str = "",
+    uses: Optional[Mapping[str, int]] = None,
+    digester: Optional[LogDigester] = None,
+    categories: Optional[Mapping[str, str]] = None,
+) -> dict[str, str]:
+    """
+    Degrade placeholder values, largest first, until the template's fixed text
+    plus every value (times its `uses` in the template) fits `budget` tokens.
+    Log values reach the digest rung only with a `digester`; `categories`
+    maps per-category views to their all_logs category. Logs per-variable
+    accounting.
+    """
+    uses = uses or {}
+    categories = categories or {}
+    items = [
+        BudgetedValue(
+            name=name,
+            text=text,
+            tokens=estimate_tokens(text),
+            uses=max(1, uses.get(name, 1)),
+            category=categories.get(name),
+            digester=digester,
+        )
+        for name, text in values.items()
+    ]
+    total = fixed_tokens + sum(v.cost for v in items)
+    accounting = {v.name: v.cost for v in items if v.tokens}
+    if total <= budget:
+        logger.debug(f"[token_budget] {label} ~{total}/{budget} tokens: {accounting}")
+        return values
+
+    logger.warning(
+        f"[token_budget] {label} needs ~{total} tokens, budget {budget}; degrading. "
+        f"Per variable: {accounting}"
+    )
+    exhausted: set[str] = set()
+    while total > budget:
+        candidates = [v for v in items if v.name not in exhausted and v.tokens]
+        if not candidates:
+            break
+        largest = max(candidates, key=lambda v: v.cost)
+        room = budget - (total - largest.cost)
+        if not largest.degrade(max(0, room // largest.uses)):
+            exhausted.add(largest.name)
+        total = fixed_tokens + sum(v.cost for v in items)
+
+    logger.warning(
+        f"[token_budget] {label} now ~{total}/{budget} tokens: "
+        + ", ".join(f"{v.name}={v.cost} ({' > '.join(v.applied)})" for v in items if v.applied)
+    )
+    return {v.name: v.text for v in items}
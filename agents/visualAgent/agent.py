@@ -3,6 +3,8 @@ from pathlib import Path
 from dotenv import load_dotenv
 from google.adk.agents import Agent
 
+from artifact_store import state_instruction
+from log_views import sip_ladder
 from oauth_context import SessionLiteLlm
 
 # Load environment variables from agents/.env
@@ -18,7 +20,7 @@ sequence_diagram_agent = Agent(
     ),
     name="sequence_diagram_agent",
     output_key="sequence_diagram",
-    instruction='''You are a PlantUML sequence diagram expert specialized in Webex microservice architecture and VoIP communications.
+    instruction=state_instruction('''You are a PlantUML sequence diagram expert specialized in Webex microservice architecture and VoIP communications.
 
 ====================
 MANDATORY SYSTEM COMPONENTS (ALWAYS ANALYZE AND INCLUDE IF PRESENT IN LOGS)
@@ -330,6 +332,13 @@ From {analyze_results}, extract and diagram:
 4. **All Component Interactions**: Every request-response pair
 5. **Session/Call/Device IDs**: Include in notes for traceability
 
+**SIP ladder (parsed from the raw logs, time-ordered):**
+{sip_ladder}
+
+Use the SIP ladder for the exact order, response codes, Call-IDs, CSeq and SDP
+(codecs, direction) of every SIP message; take services, HTTP flows and errors
+from the analysis.
+
 ====================
 OUTPUT FORMAT (STRICTLY ENFORCE)
 ====================
@@ -448,5 +457,5 @@ Generate a PlantUML sequence diagram showing ALL components and interactions fro
 3. Breaking IDs/URLs with line breaks
 4. Using actual line breaks instead of \n for display wrapping
 
-Return the PlantUML diagram now.'''
+Return the PlantUML diagram now.''', views={"sip_ladder": sip_ladder}),
 )
@@ -55,6 +55,13 @@ function extractChatResponse(events: any[]): string {
   return ""
 }
 
+// Verdict emitted by the analysis router when known-issue signatures match
+function extractKnownIssues(events: any[]): string {
+  if (!Array.isArray(events)) return ""
+  const event = events.find((e: any) => e.author === "analyze_agent_v2")
+  return event?.content?.parts?.[0]?.text || ""
+}
+
 function isAbortError(error: unknown): boolean {
   return error instanceof DOMException && error.name === "AbortError"
 }
@@ -146,6 +153,8 @@ export default function HomePage() {
       const events = await sessionManager.sendMessage(
         JSON.stringify(restParams)
       )
+      const knownIssues = extractKnownIssues(events)
+      if (knownIssues) appendMessage("assistant", knownIssues)
       const response = extractChatResponse(events)
       appendMessage(
         "assistant",
@@ -8,11 +8,13 @@ function generateId(prefix: string): string {
 }
 
 const PIPELINE_STATE_DEFAULTS: Record<string, string> = {
-  mobius_logs: "",
-  sse_mse_logs: "",
-  wxcas_logs: "",
   all_logs: "",
   search_summary: "",
+  log_digest: "",
+  leg_analyses: "",
+  mobius_error_refs: "",
+  known_issues: "",
+  timeline_stats: "",
   parsed_query: "",
   extracted_ids: "",
   latest_search_results: "",